@@ -22,14 +22,12 @@ Gst.init(None)
 GstPbutils.pb_utils_init()
 
 from threading import current_thread
-from pickle import dump
 from signal import signal, SIGINT, SIGTERM
 
 from scarlatti.utils import init_proxy_from_gnome
 from scarlatti.application_actions import ApplicationActions
 from scarlatti.application_cmdline import ApplicationCmdline
 from scarlatti.utils_file import install_youtube_dl
-from scarlatti.define import SCARLATTI_DATA_PATH, StorageType
 from scarlatti.database import Database
 from scarlatti.player import Player
 from scarlatti.inhibitor import Inhibitor
@@ -49,7 +47,9 @@ from scarlatti.notification import NotificationManager
 from scarlatti.playlists import Playlists
 from scarlatti.helper_task import TaskHelper
 from scarlatti.helper_art import ArtHelper
+from scarlatti.artwork_prerender import ArtworkPrerender
 from scarlatti.collection_scanner import CollectionScanner
+from scarlatti.library_model import LibraryModel
 
 
 class Application(Gtk.Application, ApplicationActions, ApplicationCmdline):
@@ -153,11 +153,20 @@ class Application(Gtk.Application, ApplicationActions, ApplicationCmdline):
         self.scanner = CollectionScanner()
         self.notify = NotificationManager()
         self.task_helper = TaskHelper()
-        self.art_helper = ArtHelper()
+        if self.settings.get_value("library-model"):
+            self.db.model = LibraryModel(self.db)
+            self.scanner.connect("updated",
+                                 self.db.model.on_collection_updated)
+            self.scanner.connect(
+                "scan-finished",
+                lambda s, t: self.task_helper.run(self.db.model.load))
+            self.task_helper.run(self.db.model.load)
         self.art = Artwork()
         self.art.update_art_size()
         self.album_art = AlbumArtwork()
         self.artist_art = ArtistArtwork()
+        self.art_helper = ArtHelper()
+        self.art_prerender = ArtworkPrerender()
         self.ws_director = DirectorWebService()
         self.ws_director.start()
         if not self.settings.get_value("disable-mpris"):
@@ -211,12 +220,15 @@ class Application(Gtk.Application, ApplicationActions, ApplicationCmdline):
             return
         self.album_art.cancellable.cancel()
         self.artist_art.cancellable.cancel()
+        self.album_art.save_cache()
         if self.settings.get_value("save-state"):
             self.__window.container.stack.save_history()
         # Then vacuum db
         if vacuum:
             self.__vacuum()
             self.art.clean_artwork()
+        # Close pooled connections
+        SqlCursor.clear()
         Gio.Application.quit(self)
         if GLib.environ_getenv(GLib.get_environ(), "DEBUG_LEAK") is not None:
             import gc
@@ -316,28 +328,7 @@ class Application(Gtk.Application, ApplicationActions, ApplicationCmdline):
             Save player state
         """
         if self.settings.get_value("save-state"):
-            if self.player.current_track.id is None or\
-                    self.player.current_track.storage_type &\
-                    StorageType.EPHEMERAL:
-                track_id = None
-            else:
-                track_id = self.player.current_track.id
-                # Save albums context
-                try:
-                    with open(SCARLATTI_DATA_PATH + "/Albums.bin", "wb") as f:
-                        dump(self.player.albums, f)
-                except Exception as e:
-                    Logger.error("Application::__save_state(): %s" % e)
-            dump(track_id, open(SCARLATTI_DATA_PATH + "/track_id.bin", "wb"))
-            dump([self.player.is_playing, self.player.is_party],
-                 open(SCARLATTI_DATA_PATH + "/player.bin", "wb"))
-            dump(self.player.queue,
-                 open(SCARLATTI_DATA_PATH + "/queue.bin", "wb"))
-            if self.player.current_track.id is not None:
-                position = self.player.position
-            else:
-                position = 0
-            dump(position, open(SCARLATTI_DATA_PATH + "/position.bin", "wb"))
+            self.player.save_state()
         self.player.stop_all()
 
     def __vacuum(self):
@@ -358,7 +349,7 @@ class Application(Gtk.Application, ApplicationActions, ApplicationCmdline):
             SqlCursor.remove(self.db)
             self.cache.clean(True)
 
-            with SqlCursor(self.db) as sql:
+            with SqlCursor(self.db, True) as sql:
                 sql.isolation_level = None
                 sql.execute("VACUUM")
                 sql.isolation_level = ""
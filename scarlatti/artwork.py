@@ -17,7 +17,7 @@ from hashlib import md5
 from scarlatti.artwork_manager import ArtworkManager
 from scarlatti.logger import Logger
 from scarlatti.define import CACHE_PATH, ALBUMS_WEB_PATH, ALBUMS_PATH
-from scarlatti.define import ARTISTS_PATH, TimeStamp
+from scarlatti.define import ARTISTS_PATH, TimeStamp, App
 from scarlatti.utils import emit_signal
 from scarlatti.utils_file import remove_oldest, create_dir
 
@@ -122,6 +122,7 @@ class Artwork(ArtworkManager):
         """
         try:
             remove_oldest(CACHE_PATH, TimeStamp.ONE_YEAR)
+            App().album_art.clean_cache(TimeStamp.ONE_YEAR)
             remove_oldest(ARTISTS_PATH, TimeStamp.THREE_YEAR)
             remove_oldest(ALBUMS_PATH, TimeStamp.THREE_YEAR)
             remove_oldest(ALBUMS_WEB_PATH, TimeStamp.ONE_YEAR)
@@ -149,5 +150,6 @@ class Artwork(ArtworkManager):
             extension = self.extension_str
             for p in Path(CACHE_PATH).glob("*.%s" % extension):
                 p.unlink()
+            App().album_art.clear_cache()
         except Exception as e:
             Logger.error("Art::clean_all_cache(): %s", e)
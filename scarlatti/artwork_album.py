@@ -19,6 +19,7 @@ from time import time
 from scarlatti.helper_task import TaskHelper
 from scarlatti.tagreader import Discoverer
 from scarlatti.artwork_manager import ArtworkManager
+from scarlatti.artwork_store import ArtworkStore
 from scarlatti.artwork_downloader_album import AlbumArtworkDownloader
 from scarlatti.logger import Logger
 from scarlatti.define import CACHE_PATH, ALBUMS_WEB_PATH, ALBUMS_PATH
@@ -34,6 +35,8 @@ class AlbumArtwork(ArtworkManager, AlbumArtworkDownloader):
     """
 
     __MIMES = ("jpeg", "jpg", "png", "gif")
+    # Cached thumbnails kept before evicting least recently used
+    __STORE_SIZE = 512 * 1024 * 1024
 
     def __init__(self):
         """
@@ -43,6 +46,8 @@ class AlbumArtwork(ArtworkManager, AlbumArtworkDownloader):
         AlbumArtworkDownloader.__init__(self)
         create_dir(ALBUMS_PATH)
         create_dir(ALBUMS_WEB_PATH)
+        self.__store = ArtworkStore("%s/albums.pack" % CACHE_PATH,
+                                    self.__STORE_SIZE)
         self.__favorite = App().settings.get_value(
             "favorite-cover").get_string()
         if not self.__favorite:
@@ -67,8 +72,10 @@ class AlbumArtwork(ArtworkManager, AlbumArtworkDownloader):
             if f.query_exists():
                 return cache_path
             else:
-                self.get(album, width, height, 1)
-                if f.query_exists():
+                # Cache is packed, export a file for external users
+                pixbuf = self.get(album, width, height, 1)
+                if pixbuf is not None:
+                    self.save_pixbuf(pixbuf, cache_path)
                     return cache_path
         except Exception as e:
             Logger.error("AlbumArtwork::get_cache_path(): %s" % e)
@@ -182,14 +189,12 @@ class AlbumArtwork(ArtworkManager, AlbumArtworkDownloader):
         else:
             w = width
             h = height
-        cache_path = "%s/%s_%s_%s" % (CACHE_PATH, album.lp_album_id, w, h)
-        cache_path = self.add_extension(cache_path)
         pixbuf = None
         try:
             # Look in cache
-            f = Gio.File.new_for_path(cache_path)
-            if not behaviour & ArtBehaviour.NO_CACHE and f.query_exists():
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file(cache_path)
+            if not behaviour & ArtBehaviour.NO_CACHE:
+                pixbuf = self.__get_from_store(album.lp_album_id, w, h)
+            if pixbuf is not None:
                 if optimized_blur:
                     pixbuf = self.load_behaviour(pixbuf,
                                                  width, height, behaviour)
@@ -232,12 +237,13 @@ class AlbumArtwork(ArtworkManager, AlbumArtworkDownloader):
                         stream, None)
                     stream.close()
             if pixbuf is None:
-                self.download(album.id)
+                if not behaviour & ArtBehaviour.NO_DOWNLOAD:
+                    self.download(album.id)
                 return None
             pixbuf = self.load_behaviour(pixbuf,
                                          width, height, behaviour)
             if behaviour & ArtBehaviour.CACHE:
-                self.save_pixbuf(pixbuf, cache_path)
+                self.__add_to_store(album.lp_album_id, w, h, pixbuf)
             return pixbuf
         except Exception as e:
             Logger.warning("AlbumArtwork::get(): %s -> %s" % (uri, e))
@@ -287,6 +293,8 @@ class AlbumArtwork(ArtworkManager, AlbumArtworkDownloader):
             @param width as int
             @param height as int
         """
+        self.__store.remove(album.lp_album_id, width, height)
+        # Files exported by get_cache_path()
         try:
             from pathlib import Path
             if width == -1 or height == -1:
@@ -295,7 +303,7 @@ class AlbumArtwork(ArtworkManager, AlbumArtworkDownloader):
                 else:
                     extension = "jpg"
                 for p in Path(CACHE_PATH).glob(
-                        "%s*.%s" % (album.lp_album_id, extension)):
+                        "%s_*.%s" % (album.lp_album_id, extension)):
                     p.unlink()
             else:
                 cache_path = "%s/%s_%s_%s" % (CACHE_PATH,
@@ -308,9 +316,64 @@ class AlbumArtwork(ArtworkManager, AlbumArtworkDownloader):
         except Exception as e:
             Logger.error("AlbumArtwork::clean(): %s" % e)
 
+    def clean_cache(self, max_age):
+        """
+            Remove cached covers not used since max_age
+            @param max_age as int
+        """
+        self.__store.clean(max_age)
+
+    def clear_cache(self):
+        """
+            Remove all cached covers
+        """
+        self.__store.clear()
+
+    def save_cache(self):
+        """
+            Save cache index
+        """
+        self.__store.save()
+
 #######################
 # PRIVATE             #
 #######################
+    def __get_from_store(self, lp_album_id, width, height):
+        """
+            Get cached cover
+            @param lp_album_id as str
+            @param width as int
+            @param height as int
+            @return GdkPixbuf.Pixbuf/None
+        """
+        item = self.__store.get(lp_album_id, width, height)
+        if item is None:
+            return None
+        (fmt, data) = item
+        bytes = GLib.Bytes.new(data)
+        stream = Gio.MemoryInputStream.new_from_bytes(bytes)
+        pixbuf = GdkPixbuf.Pixbuf.new_from_stream(stream, None)
+        stream.close()
+        return pixbuf
+
+    def __add_to_store(self, lp_album_id, width, height, pixbuf):
+        """
+            Cache cover
+            @param lp_album_id as str
+            @param width as int
+            @param height as int
+            @param pixbuf as GdkPixbuf.Pixbuf
+        """
+        if self.extension == StoreExtention.PNG:
+            (status, data) = pixbuf.save_to_bufferv("png", [None], [None])
+            fmt = ArtworkStore.PNG
+        else:
+            (status, data) = pixbuf.save_to_bufferv("jpeg", ["quality"],
+                                                    ["100"])
+            fmt = ArtworkStore.JPG
+        if status:
+            self.__store.add(lp_album_id, width, height, fmt, data)
+
     def __get_first(self, album):
         """
             Get first locally available artwork for album
@@ -0,0 +1,157 @@
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+from os import cpu_count, setpriority, PRIO_PROCESS
+from threading import Thread, Lock, get_native_id
+from time import sleep, time
+
+from scarlatti.define import App, ArtSize, ArtBehaviour, ScanUpdate
+from scarlatti.objects_album import Album
+from scarlatti.logger import Logger
+from scarlatti.utils import emit_signal
+
+
+class ArtworkPrerender:
+    """
+        Fill album artwork cache after scans, so views do not have to
+        look for artwork, crop and scale it
+        Pending albums are saved in settings, job resumes on next start
+    """
+
+    # Lowest thread priority
+    __NICE = 19
+    # Seconds to wait between albums while playing
+    __THROTTLE = 0.5
+    # Save pending albums every n albums
+    __CHECKPOINT = 50
+    # Seconds to wait after startup before resuming
+    __RESUME_DELAY = 30
+
+    def __init__(self):
+        """
+            Init job, resume pending albums
+        """
+        self.__lock = Lock()
+        # Ordered album ids, True if cached artwork is outdated
+        self.__pending = dict.fromkeys(
+            App().settings.get_value("artwork-prerender-pending"), False)
+        self.__running = 0
+        self.__done = 0
+        self.__start_time = 0
+        App().scanner.connect("updated", self.__on_scanner_updated)
+        App().scanner.connect("scan-finished", self.__on_scan_finished)
+        if self.__pending:
+            GLib.timeout_add_seconds(self.__RESUME_DELAY, self.start)
+
+    def start(self):
+        """
+            Start rendering pending albums
+        """
+        with self.__lock:
+            if self.__running or not self.__pending:
+                return
+            workers = min(2, cpu_count() or 1, len(self.__pending))
+            self.__running = workers
+            self.__done = 0
+            self.__start_time = time()
+        window = App().window
+        scale_factor = 1 if window is None else window.get_scale_factor()
+        Logger.info("ArtworkPrerender::start(): %s albums",
+                    len(self.__pending))
+        for i in range(workers):
+            thread = Thread(target=self.__run, args=(scale_factor,))
+            thread.daemon = True
+            thread.start()
+
+#######################
+# PRIVATE             #
+#######################
+    def __run(self, scale_factor):
+        """
+            Render pending albums until none is left
+            @param scale_factor as int
+        """
+        try:
+            setpriority(PRIO_PROCESS, get_native_id(), self.__NICE)
+        except Exception as e:
+            Logger.warning("ArtworkPrerender::__run(): %s", e)
+        sizes = [ArtSize.SMALL, ArtSize.MEDIUM, ArtSize.BANNER, ArtSize.BIG]
+        behaviour = ArtBehaviour.CACHE | ArtBehaviour.CROP_SQUARE |\
+            ArtBehaviour.NO_DOWNLOAD
+        while True:
+            with self.__lock:
+                if not self.__pending:
+                    break
+                (album_id, uncache) = self.__pending.popitem()
+                self.__done += 1
+                if self.__done % self.__CHECKPOINT == 0:
+                    GLib.idle_add(self.__save_pending)
+            # Leave CPU and disk to playback
+            if App().player.is_playing:
+                sleep(self.__THROTTLE)
+            try:
+                album = Album(album_id)
+                if album.id is None:
+                    continue
+                if uncache:
+                    App().album_art.uncache(album)
+                    emit_signal(App().album_art, "album-artwork-changed",
+                                album_id)
+                for size in sizes:
+                    # Artwork found in cache or not found at all
+                    if App().album_art.get(album, size, size, scale_factor,
+                                           behaviour) is None:
+                        break
+            except Exception as e:
+                Logger.error("ArtworkPrerender::__run(): %s", e)
+        with self.__lock:
+            self.__running -= 1
+            if self.__running:
+                return
+        Logger.info("ArtworkPrerender::__run(): %s albums in %.1fs",
+                    self.__done, time() - self.__start_time)
+        GLib.idle_add(self.__save_pending)
+
+    def __save_pending(self):
+        """
+            Save pending albums in settings
+        """
+        with self.__lock:
+            pending = list(self.__pending)
+        App().settings.set_value("artwork-prerender-pending",
+                                 GLib.Variant("ai", pending))
+
+    def __on_scanner_updated(self, scanner, item, scan_update):
+        """
+            Add album to pending albums
+            @param scanner as CollectionScanner
+            @param item as CollectionItem
+            @param scan_update as ScanUpdate
+        """
+        if item.album_id is None or scan_update == ScanUpdate.REMOVED:
+            return
+        # Called for each track: artwork may come from new tracks, album is
+        # uncached once by workers
+        with self.__lock:
+            self.__pending[item.album_id] =\
+                self.__pending.get(item.album_id, False) or\
+                scan_update == ScanUpdate.MODIFIED
+
+    def __on_scan_finished(self, scanner, *ignore):
+        """
+            Start rendering when idle
+            @param scanner as CollectionScanner
+        """
+        self.__save_pending()
+        GLib.idle_add(self.start, priority=GLib.PRIORITY_LOW)
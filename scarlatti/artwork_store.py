@@ -0,0 +1,446 @@
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from threading import Lock
+from time import time
+
+from scarlatti.logger import Logger
+
+
+class ArtworkStore:
+    """
+        Packed artwork cache: one append only data file plus an index
+        Records are keyed by (name, width, height, effect)
+        Index is a checkpoint, records appended after it are replayed on load
+    """
+
+    # Record formats, same values as StoreExtention
+    JPG = 0
+    PNG = 1
+    __DELETED = 255
+
+    # magic, key length, data length, format, width, height
+    __RECORD = Struct("<4sHIBHH")
+    __RECORD_MAGIC = b"SCA1"
+    # magic, pack length covered by index, entries count
+    __INDEX = Struct("<4sQI")
+    __INDEX_MAGIC = b"SCI1"
+    # key length, offset, data length, format, width, height, atime
+    __ENTRY = Struct("<HQIBHHI")
+    # Write index after this many appends
+    __CHECKPOINT = 1024
+
+    def __init__(self, path, max_size):
+        """
+            Open store at path, create it if missing
+            @param path as str: data file, index is path + ".idx"
+            @param max_size as int: bytes kept before evicting
+        """
+        self.__path = path
+        self.__index_path = path + ".idx"
+        self.__max_size = max_size
+        self.__lock = Lock()
+        self.__mmap = None
+        # {name: {(width, height, effect): entry}}
+        self.__entries = {}
+        self.__live_size = 0
+        self.__size = 0
+        self.__appends = 0
+        with self.__lock:
+            try:
+                self.__load()
+            except Exception as e:
+                Logger.error("ArtworkStore::__init__(): %s", e)
+                self.__reset()
+
+    def get(self, name, width, height, effect=""):
+        """
+            Get artwork data
+            @param name as str
+            @param width as int
+            @param height as int
+            @param effect as str
+            @return (format as int, data as bytes)/None
+            @thread safe
+        """
+        with self.__lock:
+            sizes = self.__entries.get(name, {})
+            entry = sizes.get((width, height, effect))
+            if entry is None:
+                return None
+            (offset, length, fmt, atime) = entry
+            try:
+                if self.__mmap is None or offset + length > len(self.__mmap):
+                    self.__map()
+                data = self.__mmap[offset:offset + length]
+                sizes[(width, height, effect)] =\
+                    (offset, length, fmt, int(time()))
+                return (fmt, data)
+            except Exception as e:
+                Logger.error("ArtworkStore::get(): %s", e)
+                return None
+
+    def exists(self, name, width, height, effect=""):
+        """
+            True if artwork is in store
+            @param name as str
+            @param width as int
+            @param height as int
+            @param effect as str
+            @return bool
+        """
+        with self.__lock:
+            return (width, height, effect) in self.__entries.get(name, {})
+
+    def add(self, name, width, height, fmt, data, effect=""):
+        """
+            Add artwork data, replace previous one
+            @param name as str
+            @param width as int
+            @param height as int
+            @param fmt as int: JPG/PNG
+            @param data as bytes
+            @param effect as str
+            @thread safe
+        """
+        with self.__lock:
+            try:
+                key = (name, width, height, effect)
+                offset = self.__append(key, fmt, data)
+                self.__forget(key)
+                self.__set(key, (offset, len(data), fmt, int(time())))
+                if self.__live_size > self.__max_size:
+                    self.__evict(int(self.__max_size * 0.9))
+                # Bound disk usage to twice max size
+                if self.__size > 2 * self.__max_size:
+                    self.__compact()
+                elif self.__appends >= self.__CHECKPOINT:
+                    self.__save_index()
+            except Exception as e:
+                Logger.error("ArtworkStore::add(): %s", e)
+
+    def remove(self, name, width=-1, height=-1):
+        """
+            Remove artwork for name, all sizes and effects by default
+            @param name as str
+            @param width as int
+            @param height as int
+            @thread safe
+        """
+        with self.__lock:
+            try:
+                if width == -1 or height == -1:
+                    (width, height) = (0, 0)
+                keys = self.__get_keys(name, width, height)
+                if not keys:
+                    return
+                # Record removal, replayed if index is not saved
+                self.__append((name, width, height, ""), self.__DELETED, b"")
+                for key in keys:
+                    self.__forget(key)
+            except Exception as e:
+                Logger.error("ArtworkStore::remove(): %s", e)
+
+    def clean(self, max_age):
+        """
+            Remove artwork not used since max_age and compact store
+            @param max_age as int: seconds
+            @thread safe
+        """
+        with self.__lock:
+            try:
+                limit = int(time()) - max_age
+                for key in [key for (key, entry) in self.__get_items()
+                            if entry[3] < limit]:
+                    self.__forget(key)
+                self.__compact()
+            except Exception as e:
+                Logger.error("ArtworkStore::clean(): %s", e)
+
+    def clear(self):
+        """
+            Remove all artwork
+            @thread safe
+        """
+        with self.__lock:
+            try:
+                self.__reset()
+            except Exception as e:
+                Logger.error("ArtworkStore::clear(): %s", e)
+
+    def save(self):
+        """
+            Write index, next load will not replay records
+            @thread safe
+        """
+        with self.__lock:
+            try:
+                if self.__appends:
+                    self.__save_index()
+            except Exception as e:
+                Logger.error("ArtworkStore::save(): %s", e)
+
+#######################
+# PRIVATE             #
+#######################
+    def __load(self):
+        """
+            Load index and replay records appended after it
+        """
+        if not os.path.exists(self.__path):
+            self.__reset()
+            return
+        self.__size = os.path.getsize(self.__path)
+        covered = self.__load_index()
+        if covered > self.__size:
+            Logger.warning("ArtworkStore::__load(): index newer than data")
+            self.__entries = {}
+            self.__live_size = 0
+            covered = 0
+        if covered < self.__size:
+            self.__replay(covered)
+
+    def __load_index(self):
+        """
+            Load index file
+            @return pack length covered by index as int
+        """
+        try:
+            with open(self.__index_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        (magic, covered, count) = self.__INDEX.unpack_from(data, 0)
+        if magic != self.__INDEX_MAGIC:
+            return 0
+        pos = self.__INDEX.size
+        self.__entries = {}
+        self.__live_size = 0
+        for i in range(count):
+            (key_length, offset, length, fmt, width, height, atime) =\
+                self.__ENTRY.unpack_from(data, pos)
+            pos += self.__ENTRY.size
+            (name, effect) = self.__decode_key(data[pos:pos + key_length])
+            pos += key_length
+            self.__set((name, width, height, effect),
+                       (offset, length, fmt, atime))
+        return covered
+
+    def __replay(self, offset):
+        """
+            Add records from offset to index, drop a torn last record
+            @param offset as int
+        """
+        self.__map()
+        atime = int(time())
+        while offset + self.__RECORD.size <= self.__size:
+            (magic, key_length, length, fmt, width, height) =\
+                self.__RECORD.unpack_from(self.__mmap, offset)
+            start = offset + self.__RECORD.size + key_length
+            if magic != self.__RECORD_MAGIC or start + length > self.__size:
+                break
+            (name, effect) = self.__decode_key(
+                self.__mmap[offset + self.__RECORD.size:start])
+            if fmt == self.__DELETED:
+                for key in self.__get_keys(name, width, height):
+                    self.__forget(key)
+            else:
+                key = (name, width, height, effect)
+                self.__forget(key)
+                self.__set(key, (start, length, fmt, atime))
+            offset = start + length
+        if offset < self.__size:
+            Logger.warning("ArtworkStore::__replay(): truncating at %s",
+                           offset)
+            self.__unmap()
+            os.truncate(self.__path, offset)
+            self.__size = offset
+        self.__appends = 1
+        self.__save_index()
+
+    def __append(self, key, fmt, data):
+        """
+            Append a record to data file
+            @param key as (str, int, int, str)
+            @param fmt as int
+            @param data as bytes
+            @return data offset as int
+        """
+        encoded = self.__encode_key(key[0], key[3])
+        header = self.__RECORD.pack(self.__RECORD_MAGIC, len(encoded),
+                                    len(data), fmt, key[1], key[2])
+        fd = os.open(self.__path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                     0o644)
+        try:
+            # One write, a reader never sees a partial record
+            os.write(fd, header + encoded + data)
+        finally:
+            os.close(fd)
+        offset = self.__size + len(header) + len(encoded)
+        self.__size += len(header) + len(encoded) + len(data)
+        self.__appends += 1
+        return offset
+
+    def __set(self, key, entry):
+        """
+            Add key to index
+            @param key as (str, int, int, str)
+            @param entry as (int, int, int, int)
+        """
+        self.__entries.setdefault(key[0], {})[key[1:]] = entry
+        self.__live_size += entry[1]
+
+    def __forget(self, key):
+        """
+            Remove key from index
+            @param key as (str, int, int, str)
+        """
+        sizes = self.__entries.get(key[0])
+        if sizes is None:
+            return
+        entry = sizes.pop(key[1:], None)
+        if entry is not None:
+            self.__live_size -= entry[1]
+        if not sizes:
+            del self.__entries[key[0]]
+
+    def __get_keys(self, name, width, height):
+        """
+            Get keys for name
+            @param name as str
+            @param width as int: 0 for all sizes
+            @param height as int
+            @return [(str, int, int, str)]
+        """
+        return [(name,) + size for size in self.__entries.get(name, {})
+                if width == 0 or size[0:2] == (width, height)]
+
+    def __get_items(self):
+        """
+            Get all index entries
+            @return [((str, int, int, str), (int, int, int, int))]
+        """
+        return [((name,) + size, entry)
+                for (name, sizes) in self.__entries.items()
+                for (size, entry) in sizes.items()]
+
+    def __evict(self, size):
+        """
+            Remove least recently used artwork until live size < size
+            @param size as int
+        """
+        for (key, entry) in sorted(self.__get_items(),
+                                   key=lambda item: item[1][3]):
+            if self.__live_size < size:
+                break
+            self.__forget(key)
+
+    def __compact(self):
+        """
+            Rewrite data file with live records only
+        """
+        tmp_path = self.__path + ".tmp"
+        self.__map()
+        items = []
+        offset = 0
+        with open(tmp_path, "wb") as f:
+            for (key, (start, length, fmt, atime)) in sorted(
+                    self.__get_items(), key=lambda item: item[1][0]):
+                encoded = self.__encode_key(key[0], key[3])
+                f.write(self.__RECORD.pack(self.__RECORD_MAGIC,
+                                           len(encoded), length,
+                                           fmt, key[1], key[2]))
+                f.write(encoded)
+                offset += self.__RECORD.size + len(encoded)
+                f.write(self.__mmap[start:start + length])
+                items.append((key, (offset, length, fmt, atime)))
+                offset += length
+            f.flush()
+            os.fsync(f.fileno())
+        self.__unmap()
+        os.replace(tmp_path, self.__path)
+        self.__entries = {}
+        self.__live_size = 0
+        for (key, entry) in items:
+            self.__set(key, entry)
+        self.__size = offset
+        self.__save_index()
+
+    def __save_index(self):
+        """
+            Write index atomically
+        """
+        tmp_path = self.__index_path + ".tmp"
+        items = self.__get_items()
+        chunks = [self.__INDEX.pack(self.__INDEX_MAGIC, self.__size,
+                                    len(items))]
+        for (key, (offset, length, fmt, atime)) in items:
+            encoded = self.__encode_key(key[0], key[3])
+            chunks.append(self.__ENTRY.pack(len(encoded), offset, length,
+                                            fmt, key[1], key[2], atime))
+            chunks.append(encoded)
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.__index_path)
+        self.__appends = 0
+
+    def __reset(self):
+        """
+            Empty store
+        """
+        self.__unmap()
+        with open(self.__path, "wb"):
+            pass
+        self.__entries = {}
+        self.__live_size = 0
+        self.__size = 0
+        self.__save_index()
+
+    def __map(self):
+        """
+            Map data file, needed after appends
+        """
+        self.__unmap()
+        if self.__size:
+            with open(self.__path, "rb") as f:
+                self.__mmap = mmap(f.fileno(), 0, access=ACCESS_READ)
+
+    def __unmap(self):
+        """
+            Unmap data file
+        """
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+    def __encode_key(self, name, effect):
+        """
+            Encode key strings
+            @param name as str
+            @param effect as str
+            @return bytes
+        """
+        return ("%s\t%s" % (name, effect)).encode("utf-8")
+
+    def __decode_key(self, data):
+        """
+            Decode key strings
+            @param data as bytes
+            @return (str, str)
+        """
+        (name, sep, effect) = bytes(data).decode("utf-8").partition("\t")
+        return (name, effect)
@@ -22,20 +22,25 @@ from gi.repository.Gio import FILE_ATTRIBUTE_STANDARD_NAME, \
                               FILE_ATTRIBUTE_STANDARD_CONTENT_TYPE
 
 from gettext import gettext as _
-from time import time, sleep
+from time import time
 from urllib.parse import urlparse
 from multiprocessing import cpu_count
+from queue import Queue, Empty, Full
 
 from scarlatti.collection_item import CollectionItem
+from scarlatti.collection_writer import CollectionWriter
 from scarlatti.inotify import Inotify
 from scarlatti.define import App, ScanType, Type, StorageType, ScanUpdate
-from scarlatti.define import FileType
+from scarlatti.define import FileType, SmartDependency
 from scarlatti.sqlcursor import SqlCursor
 from scarlatti.tagreader import TagReader, Discoverer
+from scarlatti.tagreader_pool import TagReaderPool
 from scarlatti.logger import Logger
 from scarlatti.database_history import History
+from scarlatti.database_directories import DirectoriesDatabase
 from scarlatti.objects_track import Track
 from scarlatti.utils_file import is_audio, is_pls, get_mtime, get_file_type
+from scarlatti.utils_file import get_uri_basename
 from scarlatti.utils_album import tracks_to_albums
 from scarlatti.utils import emit_signal, profile, split_list
 from scarlatti.utils import get_scarlatti_album_id, get_scarlatti_track_id
@@ -60,17 +65,33 @@ class CollectionScanner(GObject.GObject, TagReader):
                     (GObject.TYPE_PYOBJECT, int))
     }
 
+    # Tracks written to DB per transaction, also read tags waiting to be
+    # written: readers are paused when writer is late
+    __SAVE_BATCH = 1000
+    # Write a partial batch when readers are slow, seconds
+    __SAVE_DELAY = 1
+    # Tracks looked up together when restoring stats
+    __RESTORE_BATCH = 256
+    # Directory mtimes more recent than scan start minus this are not
+    # trusted: directory may change again within mtime resolution
+    __MTIME_RESOLUTION = 2
+
     def __init__(self):
         """
             Init collection scanner
         """
         GObject.GObject.__init__(self)
         self.__thread = None
-        self.__tags = {}
         self.__items = []
-        self.__notified_ids = []
+        self.__notified_ids = set()
         self.__pending_new_artist_ids = []
         self.__history = History()
+        self.__directories = DirectoriesDatabase(App().db)
+        self.__manifest = None
+        self.__failed_uris = set()
+        self.__unlisted_dirs = set()
+        # Files found by current scan
+        self.__scanned_uris = set()
         self.__progress_total = 1
         self.__progress_count = 0
         self.__progress_fraction = 0
@@ -82,11 +103,12 @@ class CollectionScanner(GObject.GObject, TagReader):
             self.__inotify = None
         App().albums.update_max_count()
 
-    def update(self, scan_type, uris=[]):
+    def update(self, scan_type, uris=[], prune=False):
         """
             Update database
             @param scan_type as ScanType
             @param uris as [str]
+            @param prune as bool: do not list files of unchanged directories
         """
         self.__disable_compilations = not App().settings.get_value(
                 "show-compilations")
@@ -94,11 +116,11 @@ class CollectionScanner(GObject.GObject, TagReader):
         # Stop previous scan
         if self.is_locked() and scan_type != ScanType.EXTERNAL:
             self.stop()
-            GLib.timeout_add(250, self.update, scan_type, uris)
+            GLib.timeout_add(250, self.update, scan_type, uris, prune)
             return
         elif App().ws_director.collection_ws is not None and\
                 not App().ws_director.collection_ws.stop():
-            GLib.timeout_add(250, self.update, scan_type, uris)
+            GLib.timeout_add(250, self.update, scan_type, uris, prune)
             return
         else:
             if scan_type == ScanType.FULL:
@@ -110,8 +132,37 @@ class CollectionScanner(GObject.GObject, TagReader):
                 App().window.container.progress.add(self)
                 App().window.container.progress.set_fraction(0, self)
             Logger.info("Scan started")
+            SqlCursor.reset_read_stats()
+            # Saved tracks are skipped on next scan, only remember what to
+            # scan if interrupted
+            if scan_type != ScanType.EXTERNAL:
+                App().settings.set_value("scan-checkpoint",
+                                         GLib.Variant("as", uris))
             # Launch scan in a separate thread
-            self.__thread = App().task_helper.run(self.__scan, scan_type, uris)
+            self.__thread = App().task_helper.run(self.__scan, scan_type, uris,
+                                                  prune)
+
+    def apply_changes(self, updated, removed, moved):
+        """
+            Apply file changes from inotify, without scanning directories
+            @param updated as [str]: created/modified files or directories
+            @param removed as [str]: deleted files or directories
+            @param moved as [(str, str)]: renamed files or directories
+            @return bool: False if busy, retry later
+        """
+        if self.is_locked():
+            return False
+        elif App().ws_director.collection_ws is not None and\
+                not App().ws_director.collection_ws.stop():
+            return False
+        self.__disable_compilations = not App().settings.get_value(
+                "show-compilations")
+        App().lookup_action("update_db").set_enabled(False)
+        Logger.info("Applying changes: %s updated, %s removed, %s moved",
+                    len(updated), len(removed), len(moved))
+        self.__thread = App().task_helper.run(self.__apply_changes,
+                                              updated, removed, moved)
+        return True
 
     def save_album(self, item):
         """
@@ -378,6 +429,7 @@ class CollectionScanner(GObject.GObject, TagReader):
         App().artists.clean(False)
         App().genres.clean(False)
         App().cache.clear_table("duration")
+        self.__directories.clean()
         SqlCursor.commit(App().db)
         SqlCursor.remove(App().db)
         SqlCursor.commit(self.__history)
@@ -406,10 +458,15 @@ class CollectionScanner(GObject.GObject, TagReader):
         track_ids = [item.track_id for item in items]
         self.__thread = None
         Logger.info("Scan finished")
+        App().settings.set_value("scan-checkpoint", GLib.Variant("as", []))
+        (count, average, maximum) = SqlCursor.get_read_stats()
+        Logger.info("UI queries during scan: %s, average %.2fms, max %.2fms",
+                    count, average * 1000, maximum * 1000)
         App().lookup_action("update_db").set_enabled(True)
         App().window.container.progress.set_fraction(1.0, self)
         self.stop()
         emit_signal(self, "scan-finished", track_ids)
+        App().playlists.set_smart_dirty(SmartDependency.COLLECTION)
         # Update max count value
         App().albums.update_max_count()
         # Update featuring
@@ -433,11 +490,14 @@ class CollectionScanner(GObject.GObject, TagReader):
                 self.__inotify.add_monitor(d)
 
     @profile
-    def __get_objects_for_uris(self, scan_type, uris):
+    def __get_objects_for_uris(self, scan_type, uris, prune):
         """
             Get all tracks and dirs in uris
+            Unchanged directories are not listed if prune is True, their
+            subdirectories are then taken from directories manifest
             @param scan_type as ScanType
             @param uris as string
+            @param prune as bool
             @return ([(int, str)], [str], [str])
                     ([(mtime, file)], [dir], [stream])
         """
@@ -453,12 +513,24 @@ class CollectionScanner(GObject.GObject, TagReader):
             else:
                 f = Gio.File.new_for_uri(uri)
                 if f.query_exists():
-                    walk_uris.append(uri)
+                    walk_uris.append((uri, None))
                 else:
                     return ([], [], [])
 
+        if scan_type == ScanType.EXTERNAL:
+            known = {}
+            self.__manifest = None
+        else:
+            known = self.__directories.get_all()
+            self.__manifest = ([], [], False)
+        prune = prune and App().settings.get_value("scan-prune-directories")
+        subdirs = {}
+        for (uri, (parent, mtime, count, hash)) in known.items():
+            subdirs.setdefault(parent, []).append(uri)
+        max_mtime = time() - self.__MTIME_RESOLUTION
+        self.__unlisted_dirs = set()
         while walk_uris:
-            uri = walk_uris.pop(0)
+            (uri, parent) = walk_uris.pop(0)
             try:
                 # Directly add files, walk through directories
                 f = Gio.File.new_for_uri(uri)
@@ -467,6 +539,19 @@ class CollectionScanner(GObject.GObject, TagReader):
                                     None)
                 if info.get_file_type() == Gio.FileType.DIRECTORY:
                     dirs.append(uri)
+                    mtime = get_mtime(info)
+                    entry = known.get(uri)
+                    # Roots are always listed, they come from inotify
+                    if parent is None and entry is not None:
+                        parent = entry[0]
+                    elif prune and entry is not None and mtime != 0 and\
+                            entry[1] == mtime:
+                        for child_uri in subdirs.get(uri, []):
+                            walk_uris.append((child_uri, uri))
+                        self.__unlisted_dirs.add(uri)
+                        continue
+                    names = []
+                    child_dirs = []
                     infos = f.enumerate_children(SCAN_QUERY_INFO,
                                                  Gio.FileQueryInfoFlags.NONE,
                                                  None)
@@ -479,31 +564,201 @@ class CollectionScanner(GObject.GObject, TagReader):
                         elif info.get_is_symlink() and\
                                 App().settings.get_value("ignore-symlinks"):
                             continue
-                        walk_uris.append(child_uri)
+                        names.append(info.get_name())
+                        if info.get_file_type() == Gio.FileType.DIRECTORY:
+                            child_dirs.append(child_uri)
+                        walk_uris.append((child_uri, uri))
                     infos.close(None)
+                    if self.__manifest is not None:
+                        self.__add_to_manifest(uri, parent, mtime, max_mtime,
+                                               names, child_dirs, entry,
+                                               subdirs.get(uri, []))
                 # Only happens if files passed as args
                 else:
                     mtime = get_mtime(info)
                     files.append((mtime, uri))
             except Exception as e:
+                # Do not remove tracks we did not see
+                self.__unlisted_dirs.add(uri)
                 Logger.error("CollectionScanner::__get_objects_for_uris(): %s"
                              % e)
+        if self.__unlisted_dirs:
+            Logger.info("Directories not listed: %s/%s",
+                        len(self.__unlisted_dirs), len(dirs))
         files.sort(reverse=True)
         return (files, dirs, streams)
 
+    def __add_to_manifest(self, uri, parent, mtime, max_mtime,
+                          names, child_dirs, entry, previous_child_dirs):
+        """
+            Add listed directory to manifest saved after scan
+            @param uri as str
+            @param parent as str/None
+            @param mtime as int
+            @param max_mtime as int: more recent mtimes are not trusted
+            @param names as [str]: directory children
+            @param child_dirs as [str]: directory subdirectories uris
+            @param entry as (str, int, int, str)/None: previous entry
+            @param previous_child_dirs as [str]
+        """
+        (directories, removed, unreliable) = self.__manifest
+        count = len(names)
+        hash = self.__directories.get_hash(names)
+        # Children changed but not directory mtime, do not trust them
+        if entry is not None and mtime != 0 and entry[1] == mtime and\
+                (entry[2] != count or entry[3] != hash):
+            Logger.warning("Unreliable directory mtime: %s", uri)
+            self.__manifest = (directories, removed, True)
+        if mtime > max_mtime:
+            mtime = 0
+        directories.append((uri, parent, mtime, count, hash))
+        for child_uri in previous_child_dirs:
+            if child_uri not in child_dirs:
+                removed.append(child_uri)
+
+    def __save_manifest(self):
+        """
+            Save directories listed during scan
+            Directories with unreadable files will be listed again
+        """
+        if self.__manifest is None:
+            return
+        (directories, removed, unreliable) = self.__manifest
+        self.__manifest = None
+        if unreliable:
+            Logger.warning("Directory mtimes are unreliable on this"
+                           " filesystem, disabling directories pruning")
+            App().settings.set_value("scan-prune-directories",
+                                     GLib.Variant("b", False))
+            self.__directories.clean()
+            return
+        failed_dirs = set(uri.rsplit("/", 1)[0] for uri in self.__failed_uris)
+        for uri in removed:
+            self.__directories.remove(uri)
+        self.__directories.set([directory for directory in directories
+                                if directory[0] not in failed_dirs])
+
+    def __apply_changes(self, updated, removed, moved):
+        """
+            Apply file changes, tags are only read for updated files
+            @param updated as [str]
+            @param removed as [str]
+            @param moved as [(str, str)]
+            @thread safe
+        """
+        try:
+            self.__items = []
+            self.__notified_ids = set()
+            self.__pending_new_artist_ids = []
+            self.__failed_uris = set()
+            self.__progress_total = 1
+            self.__progress_count = 0
+            self.__progress_fraction = 0
+            SqlCursor.add(App().db)
+            for uri in removed:
+                self.__remove_uri(uri)
+            moved_album_ids = set()
+            for (old_uri, new_uri) in moved:
+                moved_album_ids |= self.__move_uri(old_uri, new_uri)
+                # Walk moved directories for monitors, moved files are
+                # then skipped: mtime did not change
+                if new_uri not in updated:
+                    updated.append(new_uri)
+            SqlCursor.commit(App().db)
+            for album_id in moved_album_ids:
+                emit_signal(self, "updated", CollectionItem(album_id=album_id),
+                            ScanUpdate.MODIFIED)
+            uris = [uri for uri in updated
+                    if Gio.File.new_for_uri(uri).query_exists()]
+            (files, dirs, streams) = self.__get_objects_for_uris(
+                ScanType.NEW_FILES, uris, False)
+            self.__scanned_uris = set(uri for (mtime, uri) in files)
+            # Not an initial scan, new files mtime is scan time
+            db_mtimes = {}
+            for (mtime, uri) in files:
+                track_id = App().tracks.get_id_by_uri(uri)
+                if track_id is None:
+                    db_mtimes[uri] = 0
+                else:
+                    db_mtimes[uri] = App().tracks.get_mtime(track_id)
+            self.__progress_total = len(files) * 2
+            self.__items += self.__scan_and_save(files, db_mtimes,
+                                                 ScanType.NEW_FILES,
+                                                 StorageType.COLLECTION)
+            self.__save_manifest()
+            self.__add_monitor(dirs)
+            GLib.idle_add(self.__finish, self.__items)
+            self.__items = []
+            self.__pending_new_artist_ids = []
+        except Exception as e:
+            Logger.warning("CollectionScanner::__apply_changes(): %s", e)
+            GLib.idle_add(App().lookup_action("update_db").set_enabled, True)
+        SqlCursor.remove(App().db)
+
+    def __remove_uri(self, uri):
+        """
+            Remove file or directory tracks from database
+            @param uri as str
+        """
+        if App().tracks.get_id_by_uri(uri) is not None:
+            self.del_from_db(uri, True)
+            return
+        for (track_id, track_uri) in App().tracks.get_ids_by_uri_prefix(uri):
+            self.del_from_db(track_uri, True)
+        self.__directories.remove(uri)
+        if self.__inotify is not None:
+            self.__inotify.remove_monitors(uri)
+
+    def __move_uri(self, old_uri, new_uri):
+        """
+            Update tracks and albums uri for moved file or directory
+            @param old_uri as str
+            @param new_uri as str
+            @return moved album ids as {int}
+        """
+        track_id = App().tracks.get_id_by_uri(old_uri)
+        if track_id is not None:
+            if not self.__scan_to_handle(new_uri):
+                # Renamed to a non audio file
+                self.del_from_db(old_uri, True)
+                return set()
+            App().tracks.set_uri(track_id, new_uri)
+            old_parent = Gio.File.new_for_uri(old_uri).get_parent().get_uri()
+            new_parent = Gio.File.new_for_uri(new_uri).get_parent().get_uri()
+            album_id = App().tracks.get_album_id(track_id)
+            if old_parent == new_parent or\
+                    App().albums.get_uri(album_id) != old_parent:
+                return set()
+            App().albums.set_uri(album_id, new_parent)
+            return {album_id}
+        for (track_id, uri) in App().tracks.get_ids_by_uri_prefix(old_uri):
+            App().tracks.set_uri(track_id, new_uri + uri[len(old_uri):])
+        album_ids = set()
+        for (album_id, uri) in App().albums.get_ids_by_uri_prefix(old_uri):
+            App().albums.set_uri(album_id, new_uri + uri[len(old_uri):])
+            album_ids.add(album_id)
+        self.__directories.remove(old_uri)
+        if self.__inotify is not None:
+            self.__inotify.remove_monitors(old_uri)
+        return album_ids
+
     @profile
-    def __scan(self, scan_type, uris):
+    def __scan(self, scan_type, uris, prune):
         """
             Scan music collection for music files
             @param scan_type as ScanType
             @param uris as [str]
+            @param prune as bool
             @thread safe
         """
         try:
             self.__items = []
+            self.__failed_uris = set()
             App().art.clean_rounded()
             (files, dirs, streams) = self.__get_objects_for_uris(
-                scan_type, uris)
+                scan_type, uris, prune)
+            scanned_uris = set(uri for (mtime, uri) in files)
+            self.__scanned_uris = scanned_uris
             if len(uris) != len(streams) and not files:
                 self.__flatpak_migration()
                 App().notify.send("Scarlatti",
@@ -522,34 +777,20 @@ class CollectionScanner(GObject.GObject, TagReader):
             self.__progress_total = len(files) * 2 + len(streams)
             self.__progress_count = 0
             self.__progress_fraction = 0
-            # Min: 1 thread, Max: 5 threads
-            count = max(1, min(5, cpu_count() // 2))
-            split_files = split_list(files, count)
-            self.__tags = {}
-            self.__notified_ids = []
+            self.__notified_ids = set()
             self.__pending_new_artist_ids = []
-            threads = []
-            for files in split_files:
-                thread = App().task_helper.run(self.__scan_files,
-                                               files, db_mtimes,
-                                               scan_type)
-                threads.append(thread)
-            while threads:
-                sleep(0.1)
-                thread = threads[0]
-                if not thread.is_alive():
-                    threads.remove(thread)
-
             SqlCursor.add(App().db)
             if scan_type == ScanType.EXTERNAL:
                 storage_type = StorageType.EXTERNAL
             else:
                 storage_type = StorageType.COLLECTION
-            self.__items += self.__save_in_db(storage_type)
+            self.__items += self.__scan_and_save(files, db_mtimes,
+                                                 scan_type, storage_type)
             # Add streams to DB, only happening on command line/m3u files
             self.__items += self.__save_streams_in_db(streams, storage_type)
 
-            self.__remove_old_tracks(db_uris, scan_type)
+            self.__remove_old_tracks(db_uris, scanned_uris, scan_type)
+            self.__save_manifest()
 
             if scan_type == ScanType.EXTERNAL:
                 albums = tracks_to_albums(
@@ -558,7 +799,6 @@ class CollectionScanner(GObject.GObject, TagReader):
             else:
                 self.__add_monitor(dirs)
                 GLib.idle_add(self.__finish, self.__items)
-            self.__tags = {}
             self.__items = []
             self.__pending_new_artist_ids = []
         except Exception as e:
@@ -593,15 +833,18 @@ class CollectionScanner(GObject.GObject, TagReader):
             Logger.error("CollectionScanner::__scan_to_handle(): %s" % e)
         return False
 
-    def __scan_files(self, files, db_mtimes, scan_type):
+    def __scan_files(self, files, db_mtimes, scan_type, queue):
         """
             Scan music collection for new audio files
             @param files as [str]
             @param db_mtimes as {}
             @param scan_type as ScanType
+            @param queue as Queue: read tags destination
             @thread safe
         """
-        discoverer = Discoverer()
+        discoverer = Discoverer(
+            App().settings.get_value("native-tag-reader"),
+            App().settings.get_value("native-tag-reader-check"))
         try:
             # Scan new files
             for (mtime, uri) in files:
@@ -617,8 +860,8 @@ class CollectionScanner(GObject.GObject, TagReader):
                         # Do not use mtime if not intial scan
                         if db_mtimes:
                             mtime = int(time())
-                        self.__tags[uri] = self.__get_tags(discoverer,
-                                                           uri, mtime)
+                        tags = self.__get_tags(discoverer, uri)
+                        self.__queue_put(queue, (uri, mtime, tags))
                         self.__progress_count += 1
                         self.__update_progress(self.__progress_count,
                                                self.__progress_total,
@@ -634,38 +877,144 @@ class CollectionScanner(GObject.GObject, TagReader):
                                                self.__progress_total,
                                                0.1)
                 except Exception as e:
+                    if self.__thread is None:
+                        raise e
+                    self.__failed_uris.add(uri)
                     Logger.error("Scanning file: %s, %s" % (uri, e))
         except Exception as e:
             Logger.warning("CollectionScanner::__scan_files(): % s" % e)
+        for (key, (count, spent)) in discoverer.get_stats().items():
+            if count:
+                Logger.info("Tag reader %s: %s files, %.1f ms per file",
+                            key, count, spent * 1000 / count)
+        self.__queue_close(queue)
+
+    def __scan_and_save(self, files, db_mtimes, scan_type, storage_type):
+        """
+            Read tags and save them while reading: readers fill a bounded
+            queue, tracks are written by batch from this thread
+            @param files as [(int, str)]
+            @param db_mtimes as {}
+            @param scan_type as ScanType
+            @param storage_type as StorageType
+            @return [CollectionItem]
+        """
+        queue = Queue(self.__SAVE_BATCH)
+        workers = App().settings.get_value("scan-workers").get_int32()
+        start_time = time()
+        if workers > 0 and scan_type != ScanType.EXTERNAL:
+            mode = "%s processes" % workers
+            readers = [App().task_helper.run(self.__scan_files_in_pool,
+                                             files, db_mtimes, workers,
+                                             queue)]
+        else:
+            # Min: 1 thread, Max: 5 threads
+            count = max(1, min(5, cpu_count() // 2))
+            mode = "%s threads" % count
+            readers = []
+            for split_files in split_list(files, count):
+                readers.append(App().task_helper.run(self.__scan_files,
+                                                     split_files, db_mtimes,
+                                                     scan_type, queue))
+        items = self.__save_in_db(queue, len(readers), storage_type)
+        elapsed = time() - start_time
+        Logger.info("Tracks saved for %s files in %.2fs: %.1f files/s (%s)",
+                    len(items), elapsed, len(items) / max(elapsed, 0.001),
+                    mode)
+        return items
 
-    def __save_in_db(self, storage_type):
+    def __save_in_db(self, queue, readers, storage_type):
         """
-            Save current tags into DB
+            Save tags from queue into DB until readers are done
+            @param queue as Queue
+            @param readers as int
             @param storage_type as StorageType
             @return [CollectionItem]
         """
         items = []
-        for uri in list(self.__tags.keys()):
+        writer = CollectionWriter(self.__disable_compilations)
+        batch = []
+        batch_time = time()
+        while readers:
             # Handle a stop request
             if self.__thread is None:
                 raise Exception("cancelled")
-            Logger.debug("Adding file: %s" % uri)
-            tags = self.__tags[uri]
-            item = self.__add2db(uri, *tags, storage_type)
-            items.append(item)
-            self.__progress_count += 1
-            self.__update_progress(self.__progress_count,
-                                   self.__progress_total,
-                                   0.001)
-            if item.album_id not in self.__notified_ids:
-                self.__notified_ids.append(item.album_id)
-                self.__notify_ui(item)
-            del self.__tags[uri]
+            try:
+                value = queue.get(timeout=self.__SAVE_DELAY)
+                if value is None:
+                    readers -= 1
+                else:
+                    batch.append(value)
+            except Empty:
+                pass
+            # Show tracks early when readers are slow
+            if len(batch) >= self.__SAVE_BATCH or (
+                    batch and (not readers or
+                               time() - batch_time > self.__SAVE_DELAY)):
+                items += self.__save_batch(writer, batch, storage_type)
+                batch = []
+                batch_time = time()
         # Handle a stop request
         if self.__thread is None:
             raise Exception("cancelled")
         return items
 
+    def __save_batch(self, writer, batch, storage_type):
+        """
+            Restore stats and save tags in one transaction
+            @param writer as CollectionWriter
+            @param batch as [(uri as str, mtime as int, tags as ())]
+            @param storage_type as StorageType
+            @return [CollectionItem]
+        """
+        items = []
+        removed_track_ids = []
+        removed_albums = {}
+        for i in range(0, len(batch), self.__RESTORE_BATCH):
+            for (uri, tags) in self.__restore_stats_batch(
+                    batch[i:i + self.__RESTORE_BATCH],
+                    removed_track_ids, removed_albums):
+                items.append(self.__get_item(uri, *tags, storage_type))
+        # Replaced tracks are removed by writer
+        writer.write(items, removed_track_ids)
+        # One transaction per batch
+        SqlCursor.commit(App().db)
+        self.__notify_removed(removed_albums)
+        for item in items:
+            if item.album_id not in self.__notified_ids:
+                self.__notified_ids.add(item.album_id)
+                self.__notify_ui(item)
+        self.__progress_count += len(items)
+        self.__update_progress(self.__progress_count,
+                               self.__progress_total,
+                               0.001)
+        return items
+
+    def __queue_put(self, queue, value):
+        """
+            Put value in queue, wait for writer
+            @param queue as Queue
+            @param value as object
+            @raise Exception if scan is cancelled
+        """
+        while True:
+            try:
+                queue.put(value, timeout=self.__SAVE_DELAY)
+                return
+            except Full:
+                if self.__thread is None:
+                    raise Exception("cancelled")
+
+    def __queue_close(self, queue):
+        """
+            Tell writer this reader is done
+            @param queue as Queue
+        """
+        try:
+            self.__queue_put(queue, None)
+        except Exception:
+            pass
+
     def __save_streams_in_db(self, streams, storage_type):
         """
             Save http stream to DB
@@ -690,127 +1039,289 @@ class CollectionScanner(GObject.GObject, TagReader):
             Notify UI for item
             @param items as CollectionItem
         """
-        SqlCursor.commit(App().db)
         if item.new_album:
             emit_signal(self, "updated", item, ScanUpdate.ADDED)
         else:
             emit_signal(self, "updated", item, ScanUpdate.MODIFIED)
 
-    def __remove_old_tracks(self, uris, scan_type):
+    def __remove_old_tracks(self, uris, scanned_uris, scan_type):
         """
             Remove non existent tracks from DB
+            A track is removed if not found while listing its directory
+            @param uris as [str]: tracks in DB
+            @param scanned_uris as {str}: files found while scanning
             @param scan_type as ScanType
         """
         if scan_type != ScanType.EXTERNAL and self.__thread is not None:
             # We need to check files are always in collections
             if scan_type == ScanType.FULL:
-                collections = App().settings.get_music_uris()
+                collections = tuple(App().settings.get_music_uris())
             else:
                 collections = None
+            to_remove = []
             for uri in uris:
-                # Handle a stop request
-                if self.__thread is None:
-                    raise Exception("cancelled")
-                in_collection = True
-                if collections is not None:
-                    in_collection = False
-                    for collection in collections:
-                        if collection in uri:
-                            in_collection = True
-                            break
-                f = Gio.File.new_for_uri(uri)
-                if not in_collection:
+                if uri in scanned_uris:
+                    continue
+                elif collections is not None and\
+                        not uri.startswith(collections):
                     Logger.warning(
                         "Removed, not in collection anymore: %s -> %s",
                         uri, collections)
-                    self.del_from_db(uri, True)
-                elif not f.query_exists():
+                    to_remove.append(uri)
+                elif not self.__in_unlisted_dir(uri):
                     Logger.warning("Removed, file has been deleted: %s", uri)
-                    self.del_from_db(uri, True)
+                    to_remove.append(uri)
+            self.__del_from_db_batch(to_remove)
+
+    def __in_unlisted_dir(self, uri):
+        """
+            True if uri is in a directory not listed by scan: unchanged
+            or unreadable, its files were not seen
+            @param uri as str
+            @return bool
+        """
+        while uri:
+            if uri in self.__unlisted_dirs:
+                return True
+            uri = uri.rpartition("/")[0]
+        return False
+
+    def __del_from_db_batch(self, uris):
+        """
+            Delete tracks from db, stats are saved in history
+            Orphans are removed once, in same transaction
+            @param uris as [str]
+        """
+        if not uris:
+            return
+        track_ids = []
+        for uri in uris:
+            track_id = App().tracks.get_id_by_uri(uri)
+            if track_id is not None:
+                track_ids.append(track_id)
+        albums = {}
+        SqlCursor.add(self.__history)
+        try:
+            for (track_id, uri, duration, album_id, track_pop, track_rate,
+                 track_ltime, album_mtime, track_loved, album_pop,
+                 album_rate, album_loved, album_synced) in\
+                    App().tracks.get_stats(track_ids):
+                # Handle a stop request
+                if self.__thread is None:
+                    raise Exception("cancelled")
+                name = get_uri_basename(uri)
+                self.__history.add(name, duration, track_pop, track_rate,
+                                   track_ltime, album_mtime, track_loved,
+                                   album_loved, album_pop, album_rate,
+                                   album_synced)
+                self.__add_removed_album(albums, track_id, album_id)
+                App().tracks.remove(track_id)
+            App().albums.clean()
+            App().genres.clean()
+            App().artists.clean()
+            SqlCursor.commit(App().db)
+        finally:
+            SqlCursor.commit(self.__history)
+            SqlCursor.remove(self.__history)
+        Logger.info("Removed %s tracks from %s albums",
+                    len(track_ids), len(albums))
+        self.__notify_removed(albums)
+
+    def __add_removed_album(self, albums, track_id, album_id):
+        """
+            Remember album, artists and genres of a track to be removed
+            @param albums as {album_id: (artist_ids as {int},
+                                         genre_ids as {int})}
+            @param track_id as int
+            @param album_id as int
+        """
+        if album_id not in albums:
+            albums[album_id] = (
+                set(App().albums.get_artist_ids(album_id)), set())
+        (artist_ids, genre_ids) = albums[album_id]
+        artist_ids.update(App().tracks.get_artist_ids(track_id))
+        genre_ids.update(App().tracks.get_genre_ids(track_id))
+
+    def __notify_removed(self, albums):
+        """
+            Notify UI for albums that lost tracks
+            @param albums as {album_id: (artist_ids as {int},
+                                         genre_ids as {int})}
+        """
+        for (album_id, (artist_ids, genre_ids)) in albums.items():
+            App().cache.clear_durations(album_id)
+            item = CollectionItem(album_id=album_id)
+            if not App().albums.get_name(album_id):
+                item.artist_ids = [artist_id for artist_id in artist_ids
+                                   if not App().artists.get_name(artist_id)]
+                item.genre_ids = [genre_id for genre_id in genre_ids
+                                  if not App().genres.get_name(genre_id)]
+                emit_signal(self, "updated", item, ScanUpdate.REMOVED)
+            else:
+                # Force genre for album
+                genre_ids = App().tracks.get_album_genre_ids(album_id)
+                App().albums.set_genre_ids(album_id, genre_ids)
+                emit_signal(self, "updated", item, ScanUpdate.MODIFIED)
 
-    def __get_tags(self, discoverer, uri, track_mtime):
+    def __scan_files_in_pool(self, files, db_mtimes, workers, queue):
+        """
+            Scan music collection for new audio files using worker processes
+            @param files as [str]
+            @param db_mtimes as {}
+            @param workers as int
+            @param queue as Queue: read tags destination
+            @thread safe
+        """
+        try:
+            self.__read_files_in_pool(files, db_mtimes, workers, queue)
+        except Exception as e:
+            Logger.warning("CollectionScanner::__scan_files_in_pool(): %s", e)
+        self.__queue_close(queue)
+
+    def __read_files_in_pool(self, files, db_mtimes, workers, queue):
+        """
+            Read tags with worker processes, they do not access database
+            @param files as [str]
+            @param db_mtimes as {}
+            @param workers as int
+            @param queue as Queue
+        """
+        to_read = []
+        for (mtime, uri) in files:
+            # Handle a stop request
+            if self.__thread is None:
+                raise Exception("cancelled")
+            if not self.__scan_to_handle(uri):
+                self.__progress_count += 2
+                continue
+            db_mtime = db_mtimes.get(uri, 0)
+            if mtime > db_mtime:
+                # Do not use mtime if not intial scan
+                if db_mtimes:
+                    mtime = int(time())
+                to_read.append((mtime, uri))
+            else:
+                self.__progress_count += 2
+        self.__update_progress(self.__progress_count,
+                               self.__progress_total,
+                               0.1)
+        pool = TagReaderPool(workers)
+        for (uri, mtime, tags, error) in pool.read(
+                to_read,
+                self.__disable_compilations,
+                App().settings.get_value("import-advanced-artist-tags"),
+                App().settings.get_value("native-tag-reader"),
+                App().settings.get_value("native-tag-reader-check"),
+                lambda: self.__thread is None):
+            if tags is None:
+                self.__failed_uris.add(uri)
+                Logger.error("Scanning file: %s, %s" % (uri, error))
+                continue
+            self.__queue_put(queue, (uri, mtime, tags))
+            self.__progress_count += 1
+            self.__update_progress(self.__progress_count,
+                                   self.__progress_total,
+                                   0.001)
+
+    def __get_tags(self, discoverer, uri):
         """
             Read track tags
             @param discoverer as Discoverer
             @param uri as string
+            @return ()
+        """
+        Logger.debug("CollectionScanner::add2db(): Read tags")
+        return self.read_tags(
+            discoverer, uri, self.__disable_compilations,
+            App().settings.get_value("import-advanced-artist-tags"))
+
+    def __restore_stats_batch(self, to_restore, removed_track_ids,
+                              removed_albums):
+        """
+            Restore stats for many tracks
+            Moved tracks and history are looked up once for the batch
+            Tracks replaced by files are added to removed_track_ids
+            @param to_restore as [(uri as str, mtime as int, tags as ())]
+            @param removed_track_ids as [int]
+            @param removed_albums as {album_id: (artist_ids, genre_ids)}
+            @return [(uri as str, tags as ())]
+        """
+        restored = []
+        if not to_restore:
+            return restored
+        track_ids = {}
+        missing = []
+        for (uri, mtime, tags) in to_restore:
+            track_id = App().tracks.get_id_by_uri(uri)
+            if track_id is None:
+                missing.append((tags[0], tags[1]))
+            else:
+                track_ids[uri] = track_id
+        moved = {}
+        for (key, (track_id, track_uri)) in\
+                App().tracks.get_ids_by_basename_duration(missing).items():
+            # A copy, not a move: keep both tracks
+            if track_uri in self.__scanned_uris or\
+                    Gio.File.new_for_uri(track_uri).query_exists():
+                continue
+            moved[key] = track_id
+        history = self.__history.get_many(
+            [key for key in missing if key not in moved])
+        stats = {}
+        for (track_id, uri, duration, album_id, track_pop, track_rate,
+             track_ltime, mtime, track_loved, album_pop, album_rate,
+             album_loved, album_synced) in App().tracks.get_stats(
+                list(track_ids.values()) + list(moved.values())):
+            stats[track_id] = (track_pop, track_rate, track_ltime, mtime,
+                               track_loved, album_loved, album_pop,
+                               album_rate, album_synced)
+            self.__add_removed_album(removed_albums, track_id, album_id)
+        for (uri, mtime, tags) in to_restore:
+            try:
+                key = (tags[0], tags[1])
+                track_id = track_ids.get(uri)
+                # A moved track can only be restored once
+                if track_id is None:
+                    track_id = moved.pop(key, None)
+                if track_id is None:
+                    track_stats = history.get(key)
+                else:
+                    track_stats = stats.get(track_id)
+                    removed_track_ids.append(track_id)
+                restored.append((uri, self.__restore_stats(
+                    mtime, tags, track_stats)))
+            except Exception as e:
+                self.__failed_uris.add(uri)
+                Logger.error("Scanning file: %s, %s" % (uri, e))
+        return restored
+
+    def __restore_stats(self, track_mtime, tags, stats):
+        """
+            Restore stats for tags read by TagReader.read_tags()
             @param track_mtime as int
+            @param tags as ()
+            @param stats as History.get() result or None
             @return ()
         """
-        f = Gio.File.new_for_uri(uri)
-        info = discoverer.get_info(uri)
-        tags = info.get_tags()
-        name = f.get_basename()
-        duration = int(info.get_duration() / 1000000)
+        (name, duration, title, artists, genres, a_sortnames,
+         aa_sortnames, album_artists, album_name, discname,
+         discnumber, year, timestamp, original_year,
+         original_timestamp, mb_album_id, mb_track_id, mb_artist_id,
+         mb_album_artist_id, tracknumber, tag_track_rate, bpm,
+         compilation) = tags
         Logger.debug("CollectionScanner::add2db(): Restore stats")
         # Restore stats
-        track_id = App().tracks.get_id_by_uri(uri)
-        if track_id is None:
-            track_id = App().tracks.get_id_by_basename_duration(name,
-                                                                duration)
-        if track_id is None:
-            (track_pop, track_rate, track_ltime,
-             album_mtime, track_loved, album_loved,
-             album_pop, album_rate, album_synced) = self.__history.get(
-                name, duration)
-        # Delete track and restore from it
-        else:
-            (track_pop, track_rate, track_ltime,
-             album_mtime, track_loved, album_loved,
-             album_pop, album_rate) = self.del_from_db(uri, False)
-
-        Logger.debug("CollectionScanner::add2db(): Read tags")
-        title = self.get_title(tags, name)
-        version = self.get_version(tags)
-        if version != "":
-            title += " (%s)" % version
-        artists = self.get_artists(tags)
-        a_sortnames = self.get_artist_sortnames(tags)
-        aa_sortnames = self.get_album_artist_sortnames(tags)
-        album_artists = self.get_album_artists(tags)
-        album_name = self.get_album_name(tags)
+        if stats is None:
+            stats = (0, 0, 0, 0, 0, 0, 0, 0, 0)
+        (track_pop, track_rate, track_ltime,
+         album_mtime, track_loved, album_loved,
+         album_pop, album_rate, album_synced) = stats
         album_synced = 0
-        mb_album_id = self.get_mb_album_id(tags)
-        mb_track_id = self.get_mb_track_id(tags)
-        mb_artist_id = self.get_mb_artist_id(tags)
-        mb_album_artist_id = self.get_mb_album_artist_id(tags)
-        genres = self.get_genres(tags)
-        discnumber = self.get_discnumber(tags)
-        discname = self.get_discname(tags)
-        tracknumber = self.get_tracknumber(tags, name)
         # We have popm in tags, override history one
-        tag_track_rate = self.get_popm(tags)
         if tag_track_rate > 0:
             track_rate = tag_track_rate
         if album_mtime == 0:
             album_mtime = track_mtime
-        bpm = self.get_bpm(tags)
-        compilation = not self.__disable_compilations and\
-            self.get_compilation(tags)
-        (original_year, original_timestamp) = self.get_original_year(tags)
-        (year, timestamp) = self.get_year(tags)
-        if year is None:
-            (year, timestamp) = (original_year, original_timestamp)
-        elif original_year is None:
-            (original_year, original_timestamp) = (year, timestamp)
-        # If no artists tag, use album artist
-        if artists == "":
-            artists = album_artists
-        if App().settings.get_value("import-advanced-artist-tags"):
-            composers = self.get_composers(tags)
-            conductors = self.get_conductors(tags)
-            performers = self.get_performers(tags)
-            remixers = self.get_remixers(tags)
-            artists += ";%s" % performers if performers != "" else ""
-            artists += ";%s" % conductors if conductors != "" else ""
-            artists += ";%s" % composers if composers != "" else ""
-            artists += ";%s" % remixers if remixers != "" else ""
-        if artists == "":
-            artists = _("Unknown")
-        # Reset album tags if we found a compilation
-        if compilation:
-            album_artists = ""
-            mb_album_artist_id = ""
-            aa_sortnames = ""
         return (title, artists, genres, a_sortnames, aa_sortnames,
                 album_artists, album_name, discname, album_loved, album_mtime,
                 album_synced, album_rate, album_pop, discnumber, year,
@@ -819,23 +1330,34 @@ class CollectionScanner(GObject.GObject, TagReader):
                 mb_album_artist_id, tracknumber, track_pop, track_rate, bpm,
                 track_mtime, track_ltime, track_loved, duration, compilation)
 
-    def __add2db(self, uri, name, artists,
-                 genres, a_sortnames, aa_sortnames, album_artists, album_name,
-                 discname, album_loved, album_mtime, album_synced, album_rate,
-                 album_pop, discnumber, year, timestamp,
-                 original_year, original_timestamp, mb_album_id,
-                 mb_track_id, mb_artist_id, mb_album_artist_id,
-                 tracknumber, track_pop, track_rate, bpm, track_mtime,
-                 track_ltime, track_loved, duration, compilation,
-                 storage_type=StorageType.COLLECTION):
+    def __add2db(self, uri, *tags):
         """
             Add new file to DB
             @param uri as str
             @param tags as *()
+            @return CollectionItem
+        """
+        item = self.__get_item(uri, *tags)
+        self.save_album(item)
+        self.save_track(item)
+        return item
+
+    def __get_item(self, uri, name, artists, genres, a_sortnames, aa_sortnames,
+                   album_artists, album_name, discname, album_loved,
+                   album_mtime, album_synced, album_rate, album_pop,
+                   discnumber, year, timestamp, original_year,
+                   original_timestamp, mb_album_id, mb_track_id, mb_artist_id,
+                   mb_album_artist_id, tracknumber, track_pop, track_rate, bpm,
+                   track_mtime, track_ltime, track_loved, duration,
+                   compilation, storage_type=StorageType.COLLECTION):
+        """
+            Get collection item for file
+            @param uri as str
+            @param tags as *()
             @param storage_type as StorageType
             @return CollectionItem
         """
-        item = CollectionItem(uri=uri,
+        return CollectionItem(uri=uri,
                               track_name=name,
                               artists=artists,
                               genres=genres,
@@ -868,9 +1390,6 @@ class CollectionScanner(GObject.GObject, TagReader):
                               duration=duration,
                               compilation=compilation,
                               storage_type=storage_type)
-        self.save_album(item)
-        self.save_track(item)
-        return item
 
     def __flatpak_migration(self):
         """
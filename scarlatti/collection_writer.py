@@ -0,0 +1,599 @@
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import Gio
+
+from string import ascii_uppercase, ascii_lowercase
+
+from scarlatti.define import App, Type
+from scarlatti.sqlcursor import SqlCursor
+from scarlatti.utils import sql_escape, noaccents2, format_artist_name
+from scarlatti.utils import get_scarlatti_album_id, get_scarlatti_track_id
+from scarlatti.localized import get_sort_key
+from scarlatti.utils_file import get_uri_basename
+
+
+# SQLite NOCASE only folds ASCII characters
+NOCASE = str.maketrans(ascii_uppercase, ascii_lowercase)
+
+
+def nocase(string):
+    """
+        Fold string like SQLite NOCASE collation
+        @param string as str
+        @return str
+    """
+    return string.translate(NOCASE)
+
+
+class CollectionWriter:
+    """
+        Write scanned items to database in batches
+        Artists, genres and albums are resolved with set based queries and
+        kept in memory for the whole scan, tracks and their relations
+        are inserted with executemany()
+        Caller must own a thread cursor (SqlCursor.add()) and commit
+    """
+
+    # Stay below SQLITE_MAX_VARIABLE_NUMBER (999 for older SQLite)
+    __CHUNK = 500
+
+    def __init__(self, disable_compilations):
+        """
+            Init writer
+            @param disable_compilations as bool
+        """
+        self.__disable_compilations = disable_compilations
+        # nocase(name) => [[id, name, sortname, mb_artist_id]]
+        self.__artists = {}
+        # sql_escape(name) => id
+        self.__genres = None
+        # nocase(name) => [{id, name, mb_album_id, no_album_artist,
+        #                   storage_type, uri, artist_ids}]
+        self.__albums = {}
+        self.__loaded_artists = set()
+        self.__loaded_albums = set()
+        self.__new_artist_ids = set()
+        # Pending updates, applied at end of batch
+        self.__artist_names = {}
+        self.__artist_sortnames = {}
+        self.__artist_mbids = {}
+
+    def write(self, items, removed_track_ids=[]):
+        """
+            Write items to database
+            @param items as [CollectionItem]
+            @param removed_track_ids as [int]: tracks replaced by items
+            @commit needed
+        """
+        if not items and not removed_track_ids:
+            return
+        with SqlCursor(App().db) as sql:
+            # Lock database now: track ids are calculated from MAX(rowid)
+            if not sql.in_transaction:
+                sql.execute("BEGIN IMMEDIATE")
+            try:
+                if removed_track_ids:
+                    self.__remove_tracks(removed_track_ids)
+                self.__load_genres(sql)
+                self.__load_artists(sql, items)
+                self.__load_albums(sql, items)
+                for item in items:
+                    self.__add_album(item)
+                    self.__add_track(item)
+                self.__update_artists(sql)
+                self.__insert_tracks(sql, items)
+                self.__update_albums(sql, items)
+                self.__update_model(items)
+            except Exception:
+                # Do not let a partial batch be committed
+                sql.rollback()
+                raise
+
+#######################
+# PRIVATE             #
+#######################
+    def __remove_tracks(self, track_ids):
+        """
+            Remove tracks and orphans, cached albums, artists and genres
+            may have been removed: load them again
+            @param track_ids as [int]
+        """
+        for track_id in track_ids:
+            App().tracks.remove(track_id)
+        App().albums.clean(False)
+        App().genres.clean(False)
+        App().artists.clean(False)
+        self.__artists = {}
+        self.__genres = None
+        self.__albums = {}
+        self.__loaded_artists = set()
+        self.__loaded_albums = set()
+
+    def __update_model(self, items):
+        """
+            Forget written albums, artists, genres and tracks in model
+            @param items as [CollectionItem]
+        """
+        model = App().db.model
+        if model is None:
+            return
+        artist_ids = set()
+        genre_ids = set()
+        for item in items:
+            artist_ids.update(item.artist_ids)
+            artist_ids.update(item.album_artist_ids)
+            genre_ids.update(item.genre_ids)
+        model.remove([item.album_id for item in items], artist_ids,
+                     genre_ids, [item.track_id for item in items])
+
+    def __chunks(self, values):
+        """
+            Split values for IN () requests
+            @param values as [object]
+            @return generator of [object]
+        """
+        values = list(values)
+        for i in range(0, len(values), self.__CHUNK):
+            yield values[i:i + self.__CHUNK]
+
+    def __split_artists(self, artists, sortnames, mb_artist_id):
+        """
+            Split artists tags like TagReader.add_artists()
+            @param artists as str
+            @param sortnames as str
+            @param mb_artist_id as str
+            @return [(str, str/None, str/None)]
+        """
+        ret = []
+        artistsplit = artists.split(";")
+        sortsplit = sortnames.split(";")
+        sortlen = len(sortsplit)
+        mbidsplit = mb_artist_id.split(";")
+        mbidlen = len(mbidsplit)
+        if len(artistsplit) != mbidlen:
+            mbidsplit = []
+            mbidlen = 0
+        i = 0
+        for artist in artistsplit:
+            artist = artist.strip()
+            if artist != "":
+                if i >= mbidlen or mbidsplit[i] == "":
+                    mbid = None
+                else:
+                    mbid = mbidsplit[i].strip()
+                if i >= sortlen or sortsplit[i] == "":
+                    sortname = None
+                else:
+                    sortname = sortsplit[i].strip()
+                ret.append((artist, sortname, mbid))
+                i += 1
+        return ret
+
+    def __load_genres(self, sql):
+        """
+            Load all genres, only done once
+            @param sql as sqlite cursor
+        """
+        if self.__genres is not None:
+            return
+        self.__genres = {}
+        result = sql.execute("SELECT rowid, escaped_name FROM genres\
+                              ORDER BY rowid")
+        for (genre_id, escaped_name) in result:
+            self.__genres.setdefault(escaped_name, genre_id)
+
+    def __load_artists(self, sql, items):
+        """
+            Load artists needed by items
+            @param sql as sqlite cursor
+            @param items as [CollectionItem]
+        """
+        names = set()
+        for item in items:
+            for artists in [item.album_artists, item.artists]:
+                for artist in artists.split(";"):
+                    key = nocase(artist.strip())
+                    if key and key not in self.__loaded_artists:
+                        names.add(key)
+        self.__loaded_artists |= names
+        for chunk in self.__chunks(names):
+            request = "SELECT rowid, name, sortname, mb_artist_id\
+                       FROM artists WHERE name COLLATE NOCASE IN (%s)\
+                       ORDER BY rowid" % ",".join("?" * len(chunk))
+            for row in sql.execute(request, chunk):
+                self.__artists.setdefault(nocase(row[1]), []).append(
+                    list(row))
+
+    def __load_albums(self, sql, items):
+        """
+            Load albums needed by items
+            @param sql as sqlite cursor
+            @param items as [CollectionItem]
+        """
+        names = set()
+        for item in items:
+            key = nocase(item.album_name)
+            if key not in self.__loaded_albums:
+                names.add(key)
+        self.__loaded_albums |= names
+        albums = {}
+        for chunk in self.__chunks(names):
+            request = "SELECT rowid, name, mb_album_id, no_album_artist,\
+                       storage_type, uri FROM albums\
+                       WHERE name COLLATE NOCASE IN (%s)\
+                       ORDER BY rowid" % ",".join("?" * len(chunk))
+            for row in sql.execute(request, chunk):
+                albums[row[0]] = {"id": row[0],
+                                  "name": row[1],
+                                  "mb_album_id": row[2],
+                                  "no_album_artist": row[3],
+                                  "storage_type": row[4],
+                                  "uri": row[5],
+                                  "artist_ids": set()}
+        for chunk in self.__chunks(albums.keys()):
+            request = "SELECT album_id, artist_id FROM album_artists\
+                       WHERE album_id IN (%s)" % ",".join("?" * len(chunk))
+            for (album_id, artist_id) in sql.execute(request, chunk):
+                albums[album_id]["artist_ids"].add(artist_id)
+        for album in albums.values():
+            self.__albums.setdefault(nocase(album["name"]), []).append(album)
+
+    def __get_artist_ids(self, artists, sortnames, mb_artist_id):
+        """
+            Get artist ids, add missing artists
+            @param artists as str
+            @param sortnames as str
+            @param mb_artist_id as str
+            @return [int]
+        """
+        artist_ids = []
+        for (artist, sortname, mbid) in self.__split_artists(artists,
+                                                             sortnames,
+                                                             mb_artist_id):
+            key = nocase(artist)
+            row = None
+            for candidate in self.__artists.get(key, []):
+                if mbid is None or candidate[3] in [mbid, None]:
+                    row = candidate
+                    break
+            if row is None:
+                if sortname is None:
+                    sortname = format_artist_name(artist)
+                artist_id = App().artists.add(artist, sortname, mbid)
+                self.__artists.setdefault(key, []).append(
+                    [artist_id, artist, sortname, mbid])
+                self.__new_artist_ids.add(artist_id)
+            else:
+                artist_id = row[0]
+                if row[1] != artist:
+                    row[1] = artist
+                    self.__artist_names[artist_id] = artist
+                if sortname is not None and row[2] != sortname:
+                    row[2] = sortname
+                    self.__artist_sortnames[artist_id] = sortname
+                if mbid is not None and row[3] != mbid:
+                    row[3] = mbid
+                    self.__artist_mbids[artist_id] = mbid
+            artist_ids.append(artist_id)
+        return artist_ids
+
+    def __get_genre_ids(self, genres):
+        """
+            Get genre ids, add missing genres
+            @param genres as str
+            @return ([int], [int]): (added genre ids, genre ids)
+        """
+        genre_ids = []
+        added_genre_ids = []
+        for genre in genres.split(";"):
+            genre = genre.strip()
+            if genre != "":
+                key = sql_escape(genre)
+                genre_id = self.__genres.get(key, None)
+                if genre_id is None:
+                    genre_id = App().genres.add(genre)
+                    self.__genres[key] = genre_id
+                    added_genre_ids.append(genre_id)
+                genre_ids.append(genre_id)
+        return (added_genre_ids, genre_ids)
+
+    def __get_album(self, album_name, mb_album_id, artist_ids):
+        """
+            Get album like AlbumsDatabase.get_id()
+            @param album_name as str
+            @param mb_album_id as str
+            @param artist_ids as [int]
+            @return dict/None
+        """
+        mb_album_id = mb_album_id or None
+        for album in self.__albums.get(nocase(album_name), []):
+            if album["mb_album_id"] != mb_album_id:
+                continue
+            if artist_ids:
+                if not album["no_album_artist"] and\
+                        album["artist_ids"] & set(artist_ids):
+                    return album
+            elif album["no_album_artist"] and album["name"] == album_name:
+                return album
+        return None
+
+    def __take_new_artist_ids(self, artist_ids):
+        """
+            Get artist ids created by this scan and not notified yet
+            @param artist_ids as [int]
+            @return [int]
+        """
+        new_artist_ids = []
+        for artist_id in artist_ids:
+            if artist_id in self.__new_artist_ids:
+                new_artist_ids.append(artist_id)
+                self.__new_artist_ids.remove(artist_id)
+        return new_artist_ids
+
+    def __add_album(self, item):
+        """
+            Set album for item, add album if missing
+            @param item as CollectionItem
+        """
+        item.album_artist_ids = self.__get_artist_ids(item.album_artists,
+                                                      item.aa_sortnames,
+                                                      item.mb_album_artist_id)
+        item.new_album_artist_ids = self.__take_new_artist_ids(
+            item.album_artist_ids)
+        item.lp_album_id = get_scarlatti_album_id(item.album_name,
+                                                  item.album_artists,
+                                                  item.year,
+                                                  item.mb_album_id)
+        uri = item.uri
+        parent = Gio.File.new_for_uri(uri).get_parent()
+        if parent is not None:
+            uri = parent.get_uri()
+        album = self.__get_album(item.album_name, item.mb_album_id,
+                                 item.album_artist_ids)
+        # Check storage type did not changed, remove album then
+        # Do not clean artists here: artists added by this batch are not
+        # linked to tracks yet
+        if album is not None and album["storage_type"] != item.storage_type:
+            App().tracks.remove_album(album["id"])
+            App().tracks.clean(False)
+            App().albums.clean(False)
+            self.__albums[nocase(album["name"])].remove(album)
+            album = None
+        if album is None:
+            item.new_album = True
+            album_id = App().albums.add(item.album_name, item.mb_album_id,
+                                        item.lp_album_id,
+                                        item.album_artist_ids, uri,
+                                        item.album_loved, item.album_pop,
+                                        item.album_rate, item.album_synced,
+                                        item.album_mtime, item.storage_type)
+            album = {"id": album_id,
+                     "name": item.album_name,
+                     "mb_album_id": item.mb_album_id or None,
+                     "no_album_artist": item.album_artist_ids == [],
+                     "storage_type": item.storage_type,
+                     "uri": uri,
+                     "artist_ids": set(item.album_artist_ids)}
+            self.__albums.setdefault(nocase(item.album_name), []).append(
+                album)
+        else:
+            item.new_album = False
+            # Check if path did not change
+            if album["uri"] != uri:
+                App().albums.set_uri(album["id"], uri)
+                album["uri"] = uri
+        item.album_id = album["id"]
+        # Keep album artists in sync for next lookups
+        if item.compilation:
+            album["artist_ids"] = {Type.COMPILATIONS}
+        elif item.album_artist_ids:
+            album["artist_ids"] = set(item.album_artist_ids)
+
+    def __add_track(self, item):
+        """
+            Set artists and genres for item
+            @param item as CollectionItem
+        """
+        item.artist_ids = self.__get_artist_ids(item.artists,
+                                                item.a_sortnames,
+                                                item.mb_artist_id)
+        missing_artist_ids = list(
+            set(item.album_artist_ids) - set(item.artist_ids))
+        # Special case for broken tags
+        # If all artist album tags are missing
+        # Can't do more because don't want to break split album behaviour
+        if len(missing_artist_ids) == len(item.album_artist_ids):
+            item.artist_ids += missing_artist_ids
+        if item.genres is None:
+            (item.new_genre_ids, item.genre_ids) = ([], [Type.WEB])
+        else:
+            (item.new_genre_ids,
+             item.genre_ids) = self.__get_genre_ids(item.genres)
+        item.lp_track_id = get_scarlatti_track_id(item.track_name,
+                                                  item.artists,
+                                                  item.album_name,
+                                                  item.mb_track_id)
+
+    def __update_artists(self, sql):
+        """
+            Apply pending artists updates
+            @param sql as sqlite cursor
+        """
+        if self.__artist_names:
+            sql.executemany("UPDATE artists SET name=?, escaped_name=?,\
+                             noaccents_name=? WHERE rowid=?",
+                            [(v, sql_escape(v), noaccents2(v), k)
+                             for (k, v) in self.__artist_names.items()])
+            self.__artist_names.clear()
+        if self.__artist_sortnames:
+            sql.executemany("UPDATE artists SET sortname=?, sortkey=?\
+                             WHERE rowid=?",
+                            [(v, get_sort_key(v), k)
+                             for (k, v) in self.__artist_sortnames.items()])
+            self.__artist_sortnames.clear()
+        if self.__artist_mbids:
+            sql.executemany("UPDATE artists SET mb_artist_id=? WHERE rowid=?",
+                            [(v, k) for (k, v) in self.__artist_mbids.items()])
+            self.__artist_mbids.clear()
+
+    def __insert_tracks(self, sql, items):
+        """
+            Insert tracks with their artists and genres
+            @param sql as sqlite cursor
+            @param items as [CollectionItem]
+        """
+        result = sql.execute("SELECT MAX(rowid) FROM tracks")
+        track_id = result.fetchone()[0] or 0
+        tracks = []
+        track_artists = []
+        track_genres = []
+        for item in items:
+            track_id += 1
+            item.track_id = track_id
+            tracks.append((track_id, item.track_name, item.uri,
+                           item.duration, item.tracknumber, item.discnumber,
+                           item.discname, item.album_id, item.original_year,
+                           item.original_timestamp, item.track_pop,
+                           item.track_rate, item.track_loved,
+                           item.track_ltime, item.track_mtime,
+                           item.mb_track_id, item.lp_track_id, item.bpm,
+                           item.storage_type, noaccents2(item.track_name),
+                           get_uri_basename(item.uri)))
+            for artist_id in dict.fromkeys(item.artist_ids):
+                track_artists.append((track_id, artist_id))
+            for genre_id in dict.fromkeys(item.genre_ids):
+                track_genres.append((track_id, genre_id))
+        sql.executemany("INSERT INTO tracks (rowid, name, uri, duration,\
+                         tracknumber, discnumber, discname, album_id,\
+                         year, timestamp, popularity, rate, loved,\
+                         ltime, mtime, mb_track_id, lp_track_id, bpm,\
+                         storage_type, noaccents_name, basename)\
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?,\
+                                 ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tracks)
+        sql.executemany("INSERT INTO track_artists (track_id, artist_id)\
+                         VALUES (?, ?)", track_artists)
+        sql.executemany("INSERT INTO track_genres (track_id, genre_id)\
+                         VALUES (?, ?)", track_genres)
+
+    def __update_albums(self, sql, items):
+        """
+            Update albums artists, genres and years for items
+            @param sql as sqlite cursor
+            @param items as [CollectionItem]
+        """
+        last_items = {}
+        genre_ids = {}
+        years = {}
+        for item in items:
+            last_items[item.album_id] = item
+            genre_ids.setdefault(item.album_id, set()).update(item.genre_ids)
+            if item.year is not None:
+                years[item.album_id] = (item.year, item.timestamp,
+                                        item.album_id)
+        # Album artists based on album-artist and artist tags
+        # Auto handle compilations: empty "album artist" with
+        # different artists
+        artist_ids = {}
+        to_calculate = []
+        for (album_id, item) in last_items.items():
+            if item.album_artist_ids and not item.compilation:
+                artist_ids[album_id] = item.album_artist_ids
+            elif item.compilation:
+                artist_ids[album_id] = [Type.COMPILATIONS]
+            else:
+                to_calculate.append(album_id)
+        artist_ids.update(self.__calculate_artist_ids(sql, to_calculate))
+        for album_id in to_calculate:
+            item = last_items[album_id]
+            item.new_album_artist_ids = self.__take_new_artist_ids(
+                artist_ids[album_id])
+        for (album_id, ids) in artist_ids.items():
+            album = self.__get_album_by_id(last_items[album_id])
+            if album is not None:
+                album["artist_ids"] = set(ids)
+        for chunk in self.__chunks(artist_ids.keys()):
+            sql.execute("DELETE FROM album_artists WHERE album_id IN (%s)"
+                        % ",".join("?" * len(chunk)), chunk)
+        sql.executemany("INSERT INTO album_artists (album_id, artist_id)\
+                         VALUES (?, ?)",
+                        [(album_id, artist_id)
+                         for (album_id, ids) in artist_ids.items()
+                         for artist_id in dict.fromkeys(ids)])
+        # Album genres
+        for chunk in self.__chunks(genre_ids.keys()):
+            request = "SELECT album_id, genre_id FROM album_genres\
+                       WHERE album_id IN (%s)" % ",".join("?" * len(chunk))
+            for (album_id, genre_id) in sql.execute(request, chunk):
+                genre_ids[album_id].discard(genre_id)
+        sql.executemany("INSERT INTO album_genres (album_id, genre_id)\
+                         VALUES (?, ?)",
+                        [(album_id, genre_id)
+                         for (album_id, ids) in genre_ids.items()
+                         for genre_id in ids])
+        sql.executemany("UPDATE albums SET year=?, timestamp=?\
+                         WHERE rowid=?", years.values())
+        for album_id in last_items.keys():
+            App().cache.clear_durations(album_id)
+
+    def __get_album_by_id(self, item):
+        """
+            Get cached album for item
+            @param item as CollectionItem
+            @return dict/None
+        """
+        for album in self.__albums.get(nocase(item.album_name), []):
+            if album["id"] == item.album_id:
+                return album
+        return None
+
+    def __calculate_artist_ids(self, sql, album_ids):
+        """
+            Calculate artist ids based on tracks
+            Same as AlbumsDatabase.calculate_artist_ids() for many albums
+            @param sql as sqlite cursor
+            @param album_ids as [int]
+            @return {album_id: [int]}
+        """
+        # album_id => {track_id: [artist_id]}
+        tracks = {album_id: {} for album_id in album_ids}
+        for chunk in self.__chunks(album_ids):
+            request = "SELECT tracks.album_id, tracks.rowid,\
+                       track_artists.artist_id\
+                       FROM tracks LEFT JOIN track_artists\
+                       ON track_artists.track_id=tracks.rowid\
+                       WHERE tracks.album_id IN (%s)\
+                       ORDER BY tracks.rowid, track_artists.rowid"\
+                       % ",".join("?" * len(chunk))
+            for (album_id, track_id, artist_id) in sql.execute(request,
+                                                               chunk):
+                artist_ids = tracks[album_id].setdefault(track_id, [])
+                if artist_id is not None:
+                    artist_ids.append(artist_id)
+        ret = {}
+        for (album_id, album_tracks) in tracks.items():
+            artist_ids = []
+            for track_artist_ids in album_tracks.values():
+                if self.__disable_compilations:
+                    for artist_id in track_artist_ids:
+                        if artist_id not in artist_ids:
+                            artist_ids.append(artist_id)
+                else:
+                    # Check if previous track and
+                    # track do not have same artists
+                    if artist_ids and\
+                            not set(artist_ids) & set(track_artist_ids):
+                        artist_ids = [Type.COMPILATIONS]
+                        break
+                    artist_ids = track_artist_ids
+            ret[album_id] = artist_ids
+        return ret
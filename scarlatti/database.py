@@ -14,6 +14,7 @@ from gi.repository import Gio
 
 import sqlite3
 from threading import Lock
+from urllib.parse import quote
 from random import shuffle
 import itertools
 import re
@@ -22,7 +23,8 @@ from scarlatti.define import App, SCARLATTI_DATA_PATH
 from scarlatti.database_upgrade import DatabaseAlbumsUpgrade
 from scarlatti.sqlcursor import SqlCursor
 from scarlatti.logger import Logger
-from scarlatti.localized import LocalizedCollation
+from scarlatti.localized import LocalizedCollation, get_sort_key
+from scarlatti.localized import get_collate_locale
 from scarlatti.utils import noaccents, noaccents2, sql_escape, regexpr
 
 
@@ -54,6 +56,16 @@ class Database:
 
     DB_PATH = "%s/scarlatti.db" % SCARLATTI_DATA_PATH
 
+    # Per connection pragmas, see https://www.sqlite.org/pragma.html
+    PRAGMAS = {
+        # Negative value is in KiB
+        "cache_size": -16384,
+        "mmap_size": 268435456,
+        # Safe with WAL, only last commits may be lost on power failure
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY"
+    }
+
     # SQLite documentation:
     # In SQLite, a column with type INTEGER PRIMARY KEY
     # is an alias for the ROWID.
@@ -72,16 +84,23 @@ class Database:
                                               loved INT NOT NULL,
                                               mtime INT NOT NULL,
                                               storage_type INT NOT NULL,
-                                              synced INT NOT NULL)"""
+                                              synced INT NOT NULL,
+                                              escaped_name TEXT,
+                                              sortkey BLOB,
+                                              noaccents_name TEXT)"""
     __create_artists = """CREATE TABLE artists (id INTEGER PRIMARY KEY,
                                                name TEXT NOT NULL,
                                                sortname TEXT NOT NULL,
-                                               mb_artist_id TEXT)"""
+                                               mb_artist_id TEXT,
+                                               escaped_name TEXT,
+                                               sortkey BLOB,
+                                               noaccents_name TEXT)"""
     __create_featuring = """CREATE TABLE featuring (
                                                artist_id INT NOT NULL,
                                                album_id INT NOT NULL)"""
     __create_genres = """CREATE TABLE genres (id INTEGER PRIMARY KEY,
-                                            name TEXT NOT NULL)"""
+                                            name TEXT NOT NULL,
+                                            escaped_name TEXT)"""
     __create_album_artists = """CREATE TABLE album_artists (
                                                 album_id INT NOT NULL,
                                                 artist_id INT NOT NULL)"""
@@ -110,7 +129,9 @@ class Database:
                                               storage_type INT NOT NULL,
                                               mb_track_id TEXT,
                                               lp_track_id TEXT,
-                                              bpm DOUBLE
+                                              bpm DOUBLE,
+                                              noaccents_name TEXT,
+                                              basename TEXT
                                               )"""
     __create_track_artists = """CREATE TABLE track_artists (
                                                 track_id INT NOT NULL,
@@ -118,20 +139,72 @@ class Database:
     __create_track_genres = """CREATE TABLE track_genres (
                                                 track_id INT NOT NULL,
                                                 genre_id INT NOT NULL)"""
-    __create_album_artists_idx = """CREATE index idx_aa ON album_artists(
-                                                album_id)"""
-    __create_track_artists_idx = """CREATE index idx_ta ON track_artists(
-                                                track_id)"""
-    __create_album_genres_idx = """CREATE index idx_ag ON album_genres(
-                                                album_id)"""
-    __create_track_genres_idx = """CREATE index idx_tg ON track_genres(
-                                                track_id)"""
+    # Names are normalized at ingest, see sql_escape() and noaccents2()
+    __create_albums_escaped_idx = """CREATE index idx_albums_escaped ON
+                                                albums(escaped_name)"""
+    __create_artists_escaped_idx = """CREATE index idx_artists_escaped ON
+                                                artists(escaped_name)"""
+    __create_genres_escaped_idx = """CREATE index idx_genres_escaped ON
+                                                genres(escaped_name)"""
+    __create_tracks_noaccents_idx = """CREATE index idx_tracks_noaccents ON
+                                                tracks(noaccents_name)"""
+    # Find moved tracks, see get_uri_basename()
+    __create_tracks_basename_idx = """CREATE index idx_tracks_basename ON
+                                                tracks(basename, duration)"""
+    # Binary sort keys, see get_sort_key(), valid for one locale
+    __create_albums_sortkey_idx = """CREATE index idx_albums_sortkey ON
+                                                albums(sortkey)"""
+    __create_artists_sortkey_idx = """CREATE index idx_artists_sortkey ON
+                                                artists(sortkey)"""
+    __create_sort_locale = """CREATE TABLE sort_locale (
+                                                name TEXT NOT NULL)"""
+    # Directories manifest, see DirectoriesDatabase
+    __create_directories = """CREATE TABLE directories (
+                                                uri TEXT PRIMARY KEY,
+                                                parent TEXT,
+                                                mtime INT NOT NULL,
+                                                count INT NOT NULL,
+                                                hash TEXT NOT NULL)"""
+
+    # Indexes for lookups and joins in both directions, link tables ones
+    # are covering: SQLite does not need to read the table
+    # Check a query with EXPLAIN QUERY PLAN, hot paths should not SCAN
+    INDEXES = {
+        "idx_aa": "album_artists(album_id, artist_id)",
+        "idx_ta": "track_artists(track_id, artist_id)",
+        "idx_ag": "album_genres(album_id, genre_id)",
+        "idx_tg": "track_genres(track_id, genre_id)",
+        "idx_aa_artist": "album_artists(artist_id, album_id)",
+        "idx_ta_artist": "track_artists(artist_id, track_id)",
+        "idx_ag_genre": "album_genres(genre_id, album_id)",
+        "idx_tg_genre": "track_genres(genre_id, track_id)",
+        "idx_featuring": "featuring(artist_id, album_id)",
+        "idx_tracks_album": "tracks(album_id, discnumber, tracknumber)",
+        "idx_tracks_uri": "tracks(uri)",
+        "idx_tracks_lp": "tracks(lp_track_id)",
+        "idx_albums_name": "albums(name)",
+        "idx_albums_name_nocase": "albums(name COLLATE NOCASE)",
+        "idx_albums_uri": "albums(uri)",
+        "idx_albums_lp": "albums(lp_album_id)",
+        "idx_artists_name": "artists(name)",
+        "idx_artists_name_nocase": "artists(name COLLATE NOCASE)"
+    }
+
+    # Full text search on names without accents, kept in sync by triggers
+    # Trigram tokenizer allows LIKE "%searched%" to use the index
+    SEARCH_TABLES = ["albums", "artists", "tracks"]
+
+    # Stay below SQLITE_MAX_VARIABLE_NUMBER (999 for older SQLite)
+    __CHUNK = 500
 
     def __init__(self):
         """
             Create database tables or manage update if needed
         """
         self.thread_lock = MyLock()
+        self.__search_index = None
+        # Optional LibraryModel, set by application
+        self.model = None
         f = Gio.File.new_for_path(self.DB_PATH)
         upgrade = DatabaseAlbumsUpgrade()
         if not f.query_exists():
@@ -141,6 +214,8 @@ class Database:
                     d.make_directory_with_parents()
                 # Create db schema
                 with SqlCursor(self, True) as sql:
+                    # Before any DML: not allowed inside a transaction
+                    sql.execute("PRAGMA journal_mode=WAL")
                     sql.execute(self.__create_albums)
                     sql.execute(self.__create_artists)
                     sql.execute(self.__create_featuring)
@@ -151,15 +226,118 @@ class Database:
                     sql.execute(self.__create_tracks)
                     sql.execute(self.__create_track_artists)
                     sql.execute(self.__create_track_genres)
-                    sql.execute(self.__create_album_artists_idx)
-                    sql.execute(self.__create_track_artists_idx)
-                    sql.execute(self.__create_album_genres_idx)
-                    sql.execute(self.__create_track_genres_idx)
+                    self.create_indexes(sql)
+                    sql.execute(self.__create_albums_escaped_idx)
+                    sql.execute(self.__create_artists_escaped_idx)
+                    sql.execute(self.__create_genres_escaped_idx)
+                    sql.execute(self.__create_tracks_noaccents_idx)
+                    sql.execute(self.__create_tracks_basename_idx)
+                    sql.execute(self.__create_albums_sortkey_idx)
+                    sql.execute(self.__create_artists_sortkey_idx)
+                    sql.execute(self.__create_sort_locale)
+                    sql.execute(self.__create_directories)
+                    sql.execute("INSERT INTO sort_locale (name) VALUES (?)",
+                                (get_collate_locale(),))
+                    self.create_search_index(sql)
                     sql.execute("PRAGMA user_version=%s" % upgrade.version)
             except Exception as e:
                 Logger.error("Database::__init__(): %s" % e)
         else:
             upgrade.upgrade(self)
+            self.__check_sort_locale()
+
+    def create_indexes(self, sql):
+        """
+            Create indexes, replace existing ones with same name
+            @param sql as sqlite cursor
+        """
+        for (name, columns) in self.INDEXES.items():
+            sql.execute("DROP INDEX IF EXISTS %s" % name)
+            sql.execute("CREATE INDEX %s ON %s" % (name, columns))
+
+    def create_search_index(self, sql):
+        """
+            Create full text search tables, fill them from current names
+            Triggers copy noaccents_name column, set by writers: they do not
+            need python functions
+            @param sql as sqlite cursor
+        """
+        try:
+            for table in self.SEARCH_TABLES:
+                sql.execute("CREATE VIRTUAL TABLE %s_fts\
+                             USING fts5(name, tokenize='trigram')" % table)
+                sql.execute("INSERT INTO {0}_fts (rowid, name)\
+                             SELECT rowid, noaccents_name\
+                             FROM {0}".format(table))
+                sql.execute("CREATE TRIGGER {0}_fts_insert\
+                             AFTER INSERT ON {0} BEGIN\
+                                INSERT INTO {0}_fts (rowid, name)\
+                                VALUES (new.rowid, new.noaccents_name);\
+                             END".format(table))
+                sql.execute("CREATE TRIGGER {0}_fts_update\
+                             AFTER UPDATE OF noaccents_name ON {0} BEGIN\
+                                UPDATE {0}_fts SET name=new.noaccents_name\
+                                WHERE rowid=old.rowid;\
+                             END".format(table))
+                sql.execute("CREATE TRIGGER {0}_fts_delete\
+                             AFTER DELETE ON {0} BEGIN\
+                                DELETE FROM {0}_fts WHERE rowid=old.rowid;\
+                             END".format(table))
+        except Exception as e:
+            # SQLite < 3.34, search will use REGEXP/LIKE on tables
+            Logger.error("Database::create_search_index(): %s", e)
+
+    def update_sort_keys(self, sql):
+        """
+            Compute sort keys for current locale
+            @param sql as sqlite cursor
+        """
+        sql.execute("UPDATE albums SET sortkey=sort_key(name)")
+        sql.execute("UPDATE artists SET sortkey=sort_key(sortname)")
+        sql.execute("DELETE FROM sort_locale")
+        sql.execute("INSERT INTO sort_locale (name) VALUES (?)",
+                    (get_collate_locale(),))
+
+    def get_fields(self, table, ids, columns, lists):
+        """
+            Get values for many rows with one query per 500 ids
+            @param table as str
+            @param ids as [int]
+            @param columns as {field as str: SQL column as str}
+            @param lists as {field as str: SQL request as str}, requests
+                   select (id, value) for ids in %s
+            @return {id as int: {field as str: value}}
+        """
+        values = {}
+        ids = list(ids)
+        try:
+            with SqlCursor(self) as sql:
+                for i in range(0, len(ids), self.__CHUNK):
+                    chunk = ids[i:i + self.__CHUNK]
+                    subrequest = ",".join("?" * len(chunk))
+                    if columns:
+                        result = sql.execute(
+                            "SELECT %s.rowid, %s FROM %s\
+                             WHERE %s.rowid IN (%s)" % (
+                                table, ", ".join(columns.values()), table,
+                                table, subrequest), chunk)
+                        for row in result:
+                            values[row[0]] = dict(zip(columns.keys(),
+                                                      row[1:]))
+                    else:
+                        for rowid in chunk:
+                            values[rowid] = {}
+                    for (field, request) in lists.items():
+                        for rowid in chunk:
+                            if rowid in values:
+                                values[rowid][field] = []
+                        result = sql.execute(request % subrequest, chunk)
+                        for (rowid, value) in result:
+                            if rowid in values:
+                                values[rowid][field].append(value)
+        except Exception as e:
+            Logger.error("Database::get_fields(): %s", e)
+        return values
 
     def execute(self, request):
         """
@@ -206,17 +384,76 @@ class Database:
             Return a new sqlite cursor
         """
         try:
-            c = sqlite3.connect(self.DB_PATH, 600.0)
-            c.create_collation("LOCALIZED", LocalizedCollation())
-            c.create_function("noaccents", 1, noaccents)
-            c.create_function("noaccents2", 1, noaccents2)
-            c.create_function("sql_escape", 1, sql_escape)
-            # https://www.sqlite.org/lang_expr.html
-            c.create_function("regexp", 2, regexpr)
+            c = sqlite3.connect(self.DB_PATH, 600.0, cached_statements=256)
+            self.__setup_cursor(c)
             return c
         except:
             exit(-1)
 
+    @property
+    def search_index(self):
+        """
+            True if full text search tables are available
+            @return bool
+        """
+        if self.__search_index is None:
+            with SqlCursor(self) as sql:
+                result = sql.execute("SELECT COUNT(*) FROM sqlite_master\
+                                      WHERE type='table' AND name IN (%s)" %
+                                     ",".join("?" * len(self.SEARCH_TABLES)),
+                                     ["%s_fts" % table
+                                      for table in self.SEARCH_TABLES])
+                v = result.fetchone()
+                self.__search_index = v is not None and\
+                    v[0] == len(self.SEARCH_TABLES)
+        return self.__search_index
+
+    def get_read_cursor(self):
+        """
+            Return a new read only sqlite cursor
+            With WAL, readers do not wait for the writer
+        """
+        try:
+            c = sqlite3.connect("file:%s?mode=ro" % quote(self.DB_PATH),
+                                600.0, cached_statements=256, uri=True)
+            self.__setup_cursor(c)
+            return c
+        except Exception as e:
+            Logger.warning("Database::get_read_cursor(): %s", e)
+            return self.get_cursor()
+
 #######################
 # PRIVATE             #
 #######################
+    def __setup_cursor(self, c):
+        """
+            Add functions and pragmas to cursor
+            @param c as sqlite3.Connection
+        """
+        c.create_collation("LOCALIZED", LocalizedCollation())
+        c.create_function("noaccents", 1, noaccents)
+        c.create_function("noaccents2", 1, noaccents2)
+        c.create_function("sql_escape", 1, sql_escape)
+        c.create_function("sort_key", 1, get_sort_key)
+        # https://www.sqlite.org/lang_expr.html
+        c.create_function("regexp", 2, regexpr)
+        for (key, value) in self.PRAGMAS.items():
+            c.execute("PRAGMA %s=%s" % (key, value))
+
+    def __check_sort_locale(self):
+        """
+            Rebuild sort keys if locale changed since last run
+        """
+        try:
+            locale = get_collate_locale()
+            with SqlCursor(self) as sql:
+                result = sql.execute("SELECT name FROM sort_locale")
+                v = result.fetchone()
+            if v is not None and v[0] == locale:
+                return
+            Logger.info("Database::__check_sort_locale(): %s -> %s",
+                        v, locale)
+            with SqlCursor(self, True) as sql:
+                self.update_sort_keys(sql)
+        except Exception as e:
+            Logger.error("Database::__check_sort_locale(): %s", e)
@@ -19,6 +19,8 @@ from scarlatti.define import App, Type, OrderBy, StorageType, LovedFlags
 from scarlatti.logger import Logger
 from scarlatti.utils import remove_static, make_subrequest, max_search_results
 from scarlatti.utils import regexp_search_filter, regexp_search_query, unique, report_large_delta
+from scarlatti.utils import regexp_search_p, sql_escape, noaccents2
+from scarlatti.localized import get_sort_key
 
 
 class AlbumsDatabase:
@@ -26,6 +28,27 @@ class AlbumsDatabase:
         Albums database helper
     """
 
+    # Album attributes available with get_fields()
+    __COLUMNS = {"name": "name",
+                 "year": "year",
+                 "timestamp": "timestamp",
+                 "uri": "uri",
+                 "popularity": "popularity",
+                 "rate": "rate",
+                 "mtime": "mtime",
+                 "synced": "synced",
+                 "loved": "loved",
+                 "storage_type": "storage_type",
+                 "mb_album_id": "mb_album_id",
+                 "lp_album_id": "lp_album_id"}
+    __LISTS = {"artists": "SELECT album_artists.album_id, artists.name\
+                           FROM artists, album_artists\
+                           WHERE album_artists.album_id IN (%s)\
+                           AND album_artists.artist_id=artists.rowid",
+               "artist_ids": "SELECT album_id, artist_id\
+                              FROM album_artists\
+                              WHERE album_id IN (%s)"}
+
     def __init__(self, db):
         """
             Init albums database object
@@ -56,11 +79,16 @@ class AlbumsDatabase:
                                   (name, mb_album_id, lp_album_id,\
                                    no_album_artist, uri,\
                                    loved, popularity, rate, mtime, synced,\
-                                   storage_type)\
-                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   storage_type, escaped_name, sortkey,\
+                                   noaccents_name)\
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,\
+                                          ?, ?)",
                                  (album_name, mb_album_id or None, lp_album_id,
                                   artist_ids == [], uri, loved, popularity,
-                                  rate, mtime, synced, storage_type))
+                                  rate, mtime, synced, storage_type,
+                                  sql_escape(album_name),
+                                  get_sort_key(album_name),
+                                  noaccents2(album_name)))
             for artist_id in artist_ids:
                 sql.execute("INSERT INTO album_artists\
                              (album_id, artist_id)\
@@ -79,6 +107,8 @@ class AlbumsDatabase:
                 sql.execute("INSERT INTO "
                             "album_artists (album_id, artist_id)"
                             "VALUES (?, ?)", (album_id, artist_id))
+                if self.__db.model is not None:
+                    self.__db.model.remove_album(album_id)
 
     def add_genre(self, album_id, genre_id):
         """
@@ -107,6 +137,8 @@ class AlbumsDatabase:
                 sql.execute("INSERT INTO album_artists\
                             (album_id, artist_id)\
                             VALUES (?, ?)", (album_id, artist_id))
+        if self.__db.model is not None:
+            self.__db.model.remove_album(album_id)
 
     def set_synced(self, album_id, synced):
         """
@@ -224,11 +256,9 @@ class AlbumsDatabase:
                        AND (album_artists.artist_id = artists.rowid\
                             OR album_artists.artist_id=?)\
                        AND synced & (1 << ?) AND albums.storage_type & ?"
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order = " ORDER BY artists.sortkey,\
                      albums.timestamp,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
             filters = (Type.COMPILATIONS, index, StorageType.COLLECTION)
             result = sql.execute(request + order, filters)
             return list(itertools.chain(*result))
@@ -479,9 +509,9 @@ class AlbumsDatabase:
             @return int
         """
         with SqlCursor(self.__db) as sql:
-            filters = (album_name,)
+            filters = (album_name.lower(),)
             request = "SELECT albums.rowid FROM albums, album_artists\
-                       WHERE sql_escape(name)=? COLLATE NOCASE AND\
+                       WHERE escaped_name=? AND\
                        album_artists.album_id=albums.rowid"
             if artist_ids:
                 request += " AND (1=0 "
@@ -501,7 +531,7 @@ class AlbumsDatabase:
             @param album_id as int
             @param genre_ids as [int]
         """
-        with SqlCursor(self.__db) as sql:
+        with SqlCursor(self.__db, True) as sql:
             request = "DELETE from album_genres\
                        WHERE album_genres.album_id=?"
             sql.execute(request, (album_id,))
@@ -521,12 +551,37 @@ class AlbumsDatabase:
                                   WHERE album_id=?", (album_id,))
             return list(itertools.chain(*result))
 
+    def get_fields(self, album_ids, fields):
+        """
+            Get fields for many albums, see Album.prefetch()
+            @param album_ids as [int]
+            @param fields as [str]
+            @return {album_id as int: {field as str: value}}
+        """
+        columns = {field: self.__COLUMNS[field]
+                   for field in fields if field in self.__COLUMNS}
+        lists = {field: self.__LISTS[field]
+                 for field in fields if field in self.__LISTS}
+        values = self.__db.get_fields("albums", album_ids, columns, lists)
+        # Same values as get_year() and get_lp_album_id()
+        for value in values.values():
+            if "year" in value:
+                value["year"] = value["year"] or None
+            if "lp_album_id" in value:
+                value["lp_album_id"] = value["lp_album_id"] or ""
+        return values
+
     def get_name(self, album_id):
         """
             Get album name for album id
             @param album_id as int
             @return str
         """
+        model = self.__db.model
+        if model is not None:
+            value = model.get_album_name(album_id)
+            if value is not None:
+                return value
         with SqlCursor(self.__db) as sql:
             result = sql.execute("SELECT name FROM albums where rowid=?",
                                  (album_id,))
@@ -541,6 +596,11 @@ class AlbumsDatabase:
             @param album_id as int
             @return artists as [str]
         """
+        model = self.__db.model
+        if model is not None:
+            value = model.get_album_artists(album_id)
+            if value is not None:
+                return value
         with SqlCursor(self.__db) as sql:
             result = sql.execute("SELECT artists.name\
                                  FROM artists, album_artists\
@@ -555,6 +615,11 @@ class AlbumsDatabase:
             @param album_id
             @return artist ids as [int]artist_ids
         """
+        model = self.__db.model
+        if model is not None:
+            value = model.get_album_artist_ids(album_id)
+            if value is not None:
+                return value
         with SqlCursor(self.__db) as sql:
             result = sql.execute("SELECT artist_id\
                                   FROM album_artists\
@@ -676,6 +741,20 @@ class AlbumsDatabase:
                 return v[0]
             return 1
 
+    def get_ids_by_uri_prefix(self, uri):
+        """
+            Get albums in directory uri and its subdirectories
+            @param uri as str
+            @return [(album_id as int, uri as str)]
+        """
+        # "0" follows "/" in ASCII
+        uri = uri.rstrip("/")
+        with SqlCursor(self.__db) as sql:
+            result = sql.execute("SELECT rowid, uri FROM albums\
+                                  WHERE uri=? OR (uri>=? AND uri<?)",
+                                 (uri, uri + "/", uri + "0"))
+            return list(result)
+
     def get_uris(self):
         """
             Get all albums uri
@@ -1039,34 +1118,26 @@ class AlbumsDatabase:
         if orderby is None:
             orderby = App().settings.get_enum("orderby")
         if orderby == OrderBy.ARTIST_YEAR:
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order = " ORDER BY artists.sortkey,\
                      albums.year,\
                      albums.timestamp,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         elif orderby == OrderBy.ARTIST_TITLE:
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+            order = " ORDER BY artists.sortkey,\
+                     albums.sortkey"
         elif orderby == OrderBy.TITLE:
-            order = " ORDER BY albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+            order = " ORDER BY albums.sortkey"
         elif orderby == OrderBy.YEAR_DESC:
             order = " ORDER BY albums.year DESC,\
                      albums.timestamp DESC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         elif orderby == OrderBy.YEAR_ASC:
             order = " ORDER BY albums.year ASC,\
                      albums.timestamp ASC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         else:
             order = " ORDER BY albums.popularity DESC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
 
         with SqlCursor(self.__db) as sql:
             result = []
@@ -1295,11 +1366,19 @@ class AlbumsDatabase:
         """
         t1 = time()
         with SqlCursor(self.__db) as sql:
-            filters = (regexp_search_filter(searched), storage_type)
-            request = regexp_search_query(
-                        "SELECT rowid, name FROM albums\
-                         WHERE noaccents(name) REGEXP ?\
-                         AND albums.storage_type & ?")
+            if self.__db.search_index and not regexp_search_p():
+                filters = ("%" + searched + "%", storage_type)
+                request = "SELECT albums.rowid, albums.name\
+                           FROM albums_fts, albums\
+                           WHERE albums_fts.name LIKE ?\
+                           AND albums.rowid=albums_fts.rowid\
+                           AND albums.storage_type & ?"
+            else:
+                filters = (regexp_search_filter(searched), storage_type)
+                request = regexp_search_query(
+                            "SELECT rowid, name FROM albums\
+                             WHERE noaccents(name) REGEXP ?\
+                             AND albums.storage_type & ?")
             result = sql.execute(request, filters)
             report_large_delta("database_albums/search", t1, time())
             return list(result)
@@ -1364,6 +1443,8 @@ class AlbumsDatabase:
             Clean albums
             @param commit as bool
         """
+        if self.__db.model is not None:
+            self.__db.model.clear()
         storage_type = StorageType.EPHEMERAL |\
             StorageType.COLLECTION | StorageType.EXTERNAL
         with SqlCursor(self.__db, commit) as sql:
@@ -18,6 +18,8 @@ from scarlatti.define import App, Type, StorageType, OrderBy, LovedFlags
 from scarlatti.utils import get_default_storage_type, make_subrequest
 from scarlatti.utils import format_artist_name, remove_static, max_search_results
 from scarlatti.utils import regexp_search_filter, regexp_search_query
+from scarlatti.utils import regexp_search_p, sql_escape, noaccents2
+from scarlatti.localized import get_sort_key
 
 
 class ArtistsDatabase:
@@ -45,9 +47,12 @@ class ArtistsDatabase:
             sortname = format_artist_name(name)
         with SqlCursor(self.__db, True) as sql:
             result = sql.execute("INSERT INTO artists (name, sortname,\
-                                  mb_artist_id)\
-                                  VALUES (?, ?, ?)",
-                                 (name, sortname, mb_artist_id))
+                                  mb_artist_id, escaped_name, sortkey,\
+                                  noaccents_name)\
+                                  VALUES (?, ?, ?, ?, ?, ?)",
+                                 (name, sortname, mb_artist_id,
+                                  sql_escape(name), get_sort_key(sortname),
+                                  noaccents2(name)))
             return result.lastrowid
 
     def set_sortname(self, artist_id, sort_name):
@@ -59,9 +64,9 @@ class ArtistsDatabase:
         """
         with SqlCursor(self.__db, True) as sql:
             sql.execute("UPDATE artists\
-                         SET sortname=?\
+                         SET sortname=?, sortkey=?\
                          WHERE rowid=?",
-                        (sort_name, artist_id))
+                        (sort_name, get_sort_key(sort_name), artist_id))
 
     def get_sortname(self, artist_id):
         """
@@ -105,7 +110,7 @@ class ArtistsDatabase:
             @return int
         """
         with SqlCursor(self.__db) as sql:
-            request = "SELECT rowid from artists WHERE sql_escape(name)=?"
+            request = "SELECT rowid from artists WHERE escaped_name=?"
             result = sql.execute(request, (name,))
             v = result.fetchone()
             if v is not None:
@@ -118,11 +123,16 @@ class ArtistsDatabase:
             @param artist_id as int
             @return str
         """
+        if artist_id == Type.COMPILATIONS:
+            return _("Many artists")
+        show_sortname = App().settings.get_value("show-artist-sort")
+        model = self.__db.model
+        if model is not None and not show_sortname:
+            value = model.get_artist_name(artist_id)
+            if value is not None:
+                return value
         with SqlCursor(self.__db) as sql:
-            if artist_id == Type.COMPILATIONS:
-                return _("Many artists")
-
-            if App().settings.get_value("show-artist-sort"):
+            if show_sortname:
                 result = sql.execute(
                     "SELECT sortname from artists WHERE rowid=?",
                     (artist_id,))
@@ -143,9 +153,11 @@ class ArtistsDatabase:
         """
         with SqlCursor(self.__db, True) as sql:
             sql.execute("UPDATE artists\
-                         SET name=?\
+                         SET name=?, escaped_name=?, noaccents_name=?\
                          WHERE rowid=?",
-                        (name, artist_id))
+                        (name, sql_escape(name), noaccents2(name), artist_id))
+        if self.__db.model is not None:
+            self.__db.model.remove_artist(artist_id)
 
     def set_mb_artist_id(self, artist_id, mb_artist_id):
         """
@@ -210,8 +222,7 @@ class ArtistsDatabase:
                                   WHERE album_artists.artist_id=artists.rowid\
                                   AND album_artists.album_id=albums.rowid\
                                   AND albums.storage_type & ?\
-                                  ORDER BY artists.sortname\
-                                  COLLATE NOCASE COLLATE LOCALIZED" % select,
+                                  ORDER BY artists.sortkey" % select,
                     (storage_type,))
             else:
                 filters = (storage_type,)
@@ -225,8 +236,7 @@ class ArtistsDatabase:
                 request += make_subrequest("album_genres.genre_id=?",
                                            "OR",
                                            len(genre_ids))
-                request += " ORDER BY artists.sortname\
-                            COLLATE NOCASE COLLATE LOCALIZED"
+                request += " ORDER BY artists.sortkey"
                 result = sql.execute(request % select, filters)
             return [(row[0], row[1], row[2]) for row in result]
 
@@ -268,8 +278,7 @@ class ArtistsDatabase:
                                   WHERE album_artists.artist_id=artists.rowid\
                                   AND album_artists.album_id=albums.rowid\
                                   AND albums.storage_type & ?\
-                                  ORDER BY artists.sortname\
-                                  COLLATE NOCASE COLLATE LOCALIZED",
+                                  ORDER BY artists.sortkey",
                     (storage_type,))
             else:
                 filters = (storage_type,)
@@ -283,8 +292,7 @@ class ArtistsDatabase:
                 request += make_subrequest("album_genres.genre_id=?",
                                            "OR",
                                            len(genre_ids))
-                request += " ORDER BY artists.sortname\
-                            COLLATE NOCASE COLLATE LOCALIZED"
+                request += " ORDER BY artists.sortkey"
                 result = sql.execute(request, filters)
             return list(itertools.chain(*result))
 
@@ -337,31 +345,23 @@ class ArtistsDatabase:
         """
         orderby = App().settings.get_enum("orderby")
         if orderby == OrderBy.ARTIST_YEAR:
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order = " ORDER BY artists.sortkey,\
                      albums.timestamp,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         elif orderby == OrderBy.ARTIST_TITLE:
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+            order = " ORDER BY artists.sortkey,\
+                     albums.sortkey"
         elif orderby == OrderBy.TITLE:
-            order = " ORDER BY albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+            order = " ORDER BY albums.sortkey"
         elif orderby == OrderBy.YEAR_DESC:
             order = " ORDER BY albums.timestamp DESC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         elif orderby == OrderBy.YEAR_ASC:
             order = " ORDER BY albums.timestamp ASC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         else:
             order = " ORDER BY albums.popularity DESC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         with SqlCursor(self.__db) as sql:
             request = "SELECT DISTINCT featuring.album_id\
                        FROM featuring, album_genres, albums, artists\
@@ -408,14 +408,26 @@ class ArtistsDatabase:
             @return artist ids as [int]
         """
         with SqlCursor(self.__db) as sql:
-            filters = (regexp_search_filter(searched), storage_type, max_search_results())
-            request = regexp_search_query(
-                    "SELECT DISTINCT artists.rowid, artists.name\
-                    FROM albums, album_artists, artists\
-                    WHERE album_artists.artist_id=artists.rowid AND\
+            if self.__db.search_index and not regexp_search_p():
+                filters = ("%" + searched + "%", storage_type,
+                           max_search_results())
+                request = "SELECT DISTINCT artists.rowid, artists.name\
+                    FROM artists_fts, artists, album_artists, albums\
+                    WHERE artists_fts.name LIKE ? AND\
+                    artists.rowid=artists_fts.rowid AND\
+                    album_artists.artist_id=artists.rowid AND\
                     album_artists.album_id=albums.rowid AND\
-                    noaccents(artists.name) REGEXP ? AND\
-                    albums.storage_type & ? LIMIT ?")
+                    albums.storage_type & ? LIMIT ?"
+            else:
+                filters = (regexp_search_filter(searched), storage_type,
+                           max_search_results())
+                request = regexp_search_query(
+                        "SELECT DISTINCT artists.rowid, artists.name\
+                        FROM albums, album_artists, artists\
+                        WHERE album_artists.artist_id=artists.rowid AND\
+                        album_artists.album_id=albums.rowid AND\
+                        noaccents(artists.name) REGEXP ? AND\
+                        albums.storage_type & ? LIMIT ?")
             result = sql.execute(request, filters)
             return list(result)
 
@@ -441,6 +453,8 @@ class ArtistsDatabase:
             Clean artists
             @param commit as bool
         """
+        if self.__db.model is not None:
+            self.__db.model.clear()
         with SqlCursor(self.__db, commit) as sql:
             sql.execute("DELETE FROM artists WHERE artists.rowid NOT IN (\
                             SELECT album_artists.artist_id\
@@ -111,7 +111,6 @@ class CacheDatabase:
             @param commit as bool
         """
         with SqlCursor(self, commit) as sql:
-            sql.execute('ATTACH DATABASE "%s" AS music' % Database.DB_PATH)
             sql.execute("DELETE FROM duration WHERE duration.album_id NOT IN (\
                             SELECT albums.rowid FROM music.albums)")
 
@@ -120,7 +119,8 @@ class CacheDatabase:
             Return a new sqlite cursor
         """
         try:
-            c = sqlite3.connect(self.DB_PATH, 600.0)
+            c = sqlite3.connect(self.DB_PATH, 600.0, cached_statements=256)
+            c.execute('ATTACH DATABASE "%s" AS music' % Database.DB_PATH)
             return c
         except:
             exit(-1)
@@ -0,0 +1,82 @@
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from hashlib import md5
+
+from scarlatti.sqlcursor import SqlCursor
+
+
+class DirectoriesDatabase:
+    """
+        Collection directories seen by last scans
+        A directory with an unchanged mtime has the same children, scanner
+        then walks its subdirectories without listing its files
+    """
+
+    def __init__(self, db):
+        """
+            Init directories database object
+            @param db as Database
+        """
+        self.__db = db
+
+    def get_all(self):
+        """
+            Get all known directories
+            @return {uri: (parent as str, mtime as int,
+                           count as int, hash as str)}
+        """
+        with SqlCursor(self.__db) as sql:
+            result = sql.execute("SELECT uri, parent, mtime, count, hash\
+                                  FROM directories")
+            return {row[0]: row[1:] for row in result}
+
+    def set(self, directories):
+        """
+            Add or update directories
+            @param directories as [(uri as str, parent as str, mtime as int,
+                                    count as int, hash as str)]
+            @warning: commit needed
+        """
+        with SqlCursor(self.__db, True) as sql:
+            sql.executemany("INSERT OR REPLACE INTO directories\
+                             (uri, parent, mtime, count, hash)\
+                             VALUES (?, ?, ?, ?, ?)", directories)
+
+    def remove(self, uri):
+        """
+            Remove directory and its subdirectories
+            @param uri as str
+            @warning: commit needed
+        """
+        prefix = uri.rstrip("/") + "/"
+        with SqlCursor(self.__db, True) as sql:
+            sql.execute("DELETE FROM directories\
+                         WHERE uri=? OR substr(uri, 1, ?)=?",
+                        (uri, len(prefix), prefix))
+
+    def clean(self):
+        """
+            Forget all directories, next scan will list all files
+            @warning: commit needed
+        """
+        with SqlCursor(self.__db, True) as sql:
+            sql.execute("DELETE FROM directories")
+
+    @staticmethod
+    def get_hash(names):
+        """
+            Get hash for directory children names
+            @param names as [str]
+            @return str
+        """
+        return md5("\n".join(sorted(names)).encode("utf-8")).hexdigest()
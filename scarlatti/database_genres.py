@@ -37,8 +37,8 @@ class GenresDatabase:
             @warning: commit needed
         """
         with SqlCursor(self.__db, True) as sql:
-            result = sql.execute("INSERT INTO genres (name) VALUES (?)",
-                                 (name,))
+            result = sql.execute("INSERT INTO genres (name, escaped_name)\
+                                  VALUES (?, ?)", (name, sql_escape(name)))
             return result.lastrowid
 
     def get_id(self, name):
@@ -51,7 +51,7 @@ class GenresDatabase:
             # Escape string to fix mixed tags:
             # Alternative Rock, Aternative-Rock, alternative rock
             result = sql.execute("SELECT rowid FROM genres\
-                                  WHERE sql_escape(name)=?",
+                                  WHERE escaped_name=?",
                                  (sql_escape(name),))
             v = result.fetchone()
             if v is not None:
@@ -64,6 +64,11 @@ class GenresDatabase:
             @param genre_id as int
             @return str
         """
+        model = self.__db.model
+        if model is not None:
+            value = model.get_genre_name(genre_id)
+            if value is not None:
+                return value
         with SqlCursor(self.__db) as sql:
             result = sql.execute("SELECT name FROM genres\
                                   WHERE rowid=?", (genre_id,))
@@ -82,27 +87,20 @@ class GenresDatabase:
         orderby = App().settings.get_enum("orderby")
         order = " ORDER BY genres.name, "
         if orderby == OrderBy.ARTIST_YEAR:
-            order += " artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order += " artists.sortkey,\
                      albums.timestamp,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         elif orderby == OrderBy.ARTIST_TITLE:
-            order += " artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+            order += " artists.sortkey,\
+                     albums.sortkey"
         elif orderby == OrderBy.NAME:
-            order += " albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+            order += " albums.sortkey"
         elif orderby == OrderBy.YEAR_DESC:
             order += " albums.timestamp DESC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         else:
             order += " albums.popularity DESC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         with SqlCursor(self.__db) as sql:
             filters = ()
             request = "SELECT albums.rowid\
@@ -187,6 +185,8 @@ class GenresDatabase:
             Clean genres
             @param commit as bool
         """
+        if self.__db.model is not None:
+            self.__db.model.clear()
         with SqlCursor(self.__db, commit) as sql:
             sql.execute("DELETE FROM genres WHERE genres.rowid NOT IN (\
                             SELECT album_genres.genre_id FROM album_genres)")
@@ -39,6 +39,8 @@ class History:
                             album_loved INT NOT NULL,
                             album_synced INT NOT NULL,
                             album_popularity INT NOT NULL)"""
+    __create_history_idx = """CREATE INDEX IF NOT EXISTS idx_history ON
+                                history(name, duration)"""
 
     def __init__(self):
         """
@@ -51,6 +53,8 @@ class History:
                 sql.execute(self.__create_history)
         except:
             pass
+        with SqlCursor(self, True) as sql:
+            sql.execute(self.__create_history_idx)
         with SqlCursor(self, True) as sql:
             result = sql.execute("SELECT COUNT(*)\
                                   FROM history")
@@ -126,6 +130,33 @@ class History:
                 return v
             return (0, 0, 0, 0, 0, 0, 0, 0, 0)
 
+    def get_many(self, keys):
+        """
+            Get stats for many tracks, see get()
+            @param keys as [(name as str, duration as int)]
+            @return {(name, duration): stats as tuple}, only found tracks
+        """
+        wanted = {}
+        for (name, duration) in keys:
+            wanted[(name, duration // 1000)] = (name, duration)
+        names = list(set(name for (name, duration) in keys))
+        stats = {}
+        with SqlCursor(self) as sql:
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                result = sql.execute("SELECT name, duration,\
+                                      popularity, rate, ltime, mtime,\
+                                      loved, album_loved, album_popularity,\
+                                      album_rate, album_synced\
+                                      FROM history\
+                                      WHERE name IN (%s)" %
+                                     ",".join("?" * len(chunk)), chunk)
+                for row in result:
+                    key = wanted.get(row[0:2])
+                    if key is not None and key not in stats:
+                        stats[key] = row[2:]
+        return stats
+
     def exists(self, name, duration):
         """
             Return True if entry exists
@@ -150,7 +181,8 @@ class History:
             Return a new sqlite cursor
         """
         try:
-            return sqlite3.connect(self.__DB_PATH, 600.0)
+            return sqlite3.connect(self.__DB_PATH, 600.0,
+                                   cached_statements=256)
         except:
             exit(-1)
 
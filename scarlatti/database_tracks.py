@@ -16,8 +16,11 @@ import itertools
 
 from scarlatti.sqlcursor import SqlCursor
 from scarlatti.define import App, StorageType, Type, LovedFlags
+from scarlatti.define import SmartDependency
 from scarlatti.utils import noaccents, make_subrequest, max_search_results
 from scarlatti.utils import regexp_search_filter, regexp_search_query, unique, report_large_delta
+from scarlatti.utils import regexp_search_p, noaccents2
+from scarlatti.utils_file import get_uri_basename
 import time
 
 
@@ -27,6 +30,45 @@ class TracksDatabase:
         set another one if you"re in a thread
     """
 
+    # Track attributes available with get_fields()
+    __COLUMNS = {"name": "name",
+                 "uri": "uri",
+                 "album_id": "album_id",
+                 "album_name": "(SELECT albums.name FROM albums\
+                                 WHERE albums.rowid=tracks.album_id)",
+                 "popularity": "popularity",
+                 "rate": "rate",
+                 "duration": "duration",
+                 "number": "tracknumber",
+                 "discnumber": "discnumber",
+                 "discname": "discname",
+                 "year": "year",
+                 "timestamp": "timestamp",
+                 "mtime": "mtime",
+                 "loved": "loved",
+                 "storage_type": "storage_type",
+                 "mb_track_id": "mb_track_id",
+                 "lp_track_id": "lp_track_id"}
+    __LISTS = {"artists": "SELECT track_artists.track_id, artists.name\
+                           FROM artists, track_artists\
+                           WHERE track_artists.track_id IN (%s)\
+                           AND track_artists.artist_id=artists.rowid",
+               "artist_ids": "SELECT track_id, artist_id\
+                              FROM track_artists\
+                              WHERE track_id IN (%s)",
+               "mb_artist_ids": "SELECT track_artists.track_id,\
+                                 artists.mb_artist_id\
+                                 FROM artists, track_artists\
+                                 WHERE track_artists.track_id IN (%s)\
+                                 AND track_artists.artist_id=artists.rowid",
+               "genres": "SELECT track_genres.track_id, genres.name\
+                          FROM genres, track_genres\
+                          WHERE track_genres.track_id IN (%s)\
+                          AND track_genres.genre_id=genres.rowid",
+               "genre_ids": "SELECT track_id, genre_id\
+                             FROM track_genres\
+                             WHERE track_id IN (%s)"}
+
     def __init__(self, db):
         """
             Init tracks database object
@@ -64,12 +106,14 @@ class TracksDatabase:
                 "INSERT INTO tracks (name, uri, duration, tracknumber,\
                 discnumber, discname, album_id,\
                 year, timestamp, popularity, rate, loved,\
-                ltime, mtime, mb_track_id, lp_track_id, bpm, storage_type)\
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ltime, mtime, mb_track_id, lp_track_id, bpm, storage_type,\
+                noaccents_name, basename)\
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,\
+                        ?, ?)",
                 (name, uri, duration, tracknumber, discnumber,
                  discname, album_id, year, timestamp, popularity,
                  rate, loved, ltime, mtime, mb_track_id, lp_track_id,
-                 bpm, storage_type))
+                 bpm, storage_type, noaccents2(name), get_uri_basename(uri)))
             return result.lastrowid
 
     def add_artist(self, track_id, artist_id):
@@ -127,8 +171,7 @@ class TracksDatabase:
         """
         with SqlCursor(self.__db) as sql:
             result = sql.execute("SELECT rowid\
-                                  FROM tracks WHERE noaccents2(name)=?\
-                                  COLLATE NOCASE",
+                                  FROM tracks WHERE noaccents_name=?",
                                  (noaccents2(name),))
             return list(itertools.chain(*result))
 
@@ -146,6 +189,44 @@ class TracksDatabase:
                 return v[0]
             return None
 
+    def get_ids_by_uri_prefix(self, uri):
+        """
+            Get tracks in directory uri and its subdirectories
+            @param uri as str
+            @return [(track_id as int, uri as str)]
+        """
+        (start, end) = self.__get_uri_range(uri)
+        with SqlCursor(self.__db) as sql:
+            result = sql.execute("SELECT rowid, uri FROM tracks\
+                                  WHERE uri>=? AND uri<?", (start, end))
+            return list(result)
+
+    def get_stats(self, track_ids):
+        """
+            Get stats saved in history for tracks
+            @param track_ids as [int]
+            @return [(track_id, uri, duration, album_id, popularity, rate,
+                      ltime, mtime, loved, album_popularity, album_rate,
+                      album_loved, album_synced)]
+        """
+        stats = []
+        with SqlCursor(self.__db) as sql:
+            for i in range(0, len(track_ids), 500):
+                chunk = track_ids[i:i + 500]
+                result = sql.execute("SELECT tracks.rowid, tracks.uri,\
+                                      tracks.duration, tracks.album_id,\
+                                      tracks.popularity, tracks.rate,\
+                                      tracks.ltime, tracks.mtime,\
+                                      tracks.loved, albums.popularity,\
+                                      albums.rate, albums.loved,\
+                                      albums.synced\
+                                      FROM tracks, albums\
+                                      WHERE albums.rowid=tracks.album_id\
+                                      AND tracks.rowid IN (%s)" %
+                                     ",".join("?" * len(chunk)), chunk)
+                stats += list(result)
+        return stats
+
     def get_id_by_basename_duration(self, basename, duration):
         """
             Get track id by basename
@@ -155,13 +236,57 @@ class TracksDatabase:
         """
         with SqlCursor(self.__db) as sql:
             result = sql.execute("SELECT rowid FROM tracks\
-                                  WHERE uri like ? AND duration=?",
-                                 ("%" + basename, duration))
+                                  WHERE basename=? AND duration=?",
+                                 (basename, duration))
             v = result.fetchone()
             if v is not None:
                 return v[0]
             return None
 
+    def get_ids_by_basename_duration(self, keys):
+        """
+            Get track ids and uris for many basenames
+            @param keys as [(basename as str, duration as int)]
+            @return {(basename, duration): (track_id as int, uri as str)}
+        """
+        keys = set(keys)
+        basenames = list(set(basename for (basename, duration) in keys))
+        tracks = {}
+        with SqlCursor(self.__db) as sql:
+            # Stay below SQLITE_MAX_VARIABLE_NUMBER (999 for older SQLite)
+            for i in range(0, len(basenames), 500):
+                chunk = basenames[i:i + 500]
+                result = sql.execute("SELECT rowid, basename, duration, uri\
+                                      FROM tracks WHERE basename IN (%s)\
+                                      ORDER BY rowid" %
+                                     ",".join("?" * len(chunk)), chunk)
+                for (track_id, basename, duration, uri) in result:
+                    key = (basename, duration)
+                    if key in keys and key not in tracks:
+                        tracks[key] = (track_id, uri)
+        return tracks
+
+    def get_fields(self, track_ids, fields):
+        """
+            Get fields for many tracks, see Track.prefetch()
+            @param track_ids as [int]
+            @param fields as [str]
+            @return {track_id as int: {field as str: value}}
+        """
+        columns = {field: self.__COLUMNS[field]
+                   for field in fields if field in self.__COLUMNS}
+        lists = {field: self.__LISTS[field]
+                 for field in fields if field in self.__LISTS}
+        values = self.__db.get_fields("tracks", track_ids, columns, lists)
+        # Same values as get_year(), get_timestamp() and get_lp_track_id()
+        for value in values.values():
+            for field in ["year", "timestamp"]:
+                if field in value:
+                    value[field] = value[field] or None
+            if "lp_track_id" in value:
+                value["lp_track_id"] = value["lp_track_id"] or ""
+        return values
+
     def get_name(self, track_id):
         """
             Get track name for track id
@@ -274,9 +399,9 @@ class TracksDatabase:
             @param uri as string
         """
         with SqlCursor(self.__db, True) as sql:
-            sql.execute("UPDATE tracks SET uri=?\
+            sql.execute("UPDATE tracks SET uri=?, basename=?\
                          WHERE rowid=?",
-                        (uri, track_id))
+                        (uri, get_uri_basename(uri), track_id))
 
     def set_storage_type(self, track_id, storage_type):
         """
@@ -299,6 +424,7 @@ class TracksDatabase:
             sql.execute("UPDATE tracks SET rate=?\
                          WHERE rowid=?",
                         (rate, track_id))
+        App().playlists.set_smart_dirty(SmartDependency.RATE)
 
     def get_album_id(self, track_id):
         """
@@ -454,6 +580,8 @@ class TracksDatabase:
         """
         with SqlCursor(self.__db, commit) as sql:
             sql.execute("DELETE FROM tracks WHERE album_id=?", (album_id,))
+        if self.__db.model is not None:
+            self.__db.model.clear()
 
     def del_non_persistent(self, commit=True):
         """
@@ -463,6 +591,8 @@ class TracksDatabase:
         with SqlCursor(self.__db, commit) as sql:
             sql.execute("DELETE FROM tracks WHERE storage_type & ?",
                         (StorageType.EPHEMERAL | StorageType.EXTERNAL,))
+        if self.__db.model is not None:
+            self.__db.model.clear()
 
     def del_persistent(self, commit=True):
         """
@@ -472,6 +602,8 @@ class TracksDatabase:
         with SqlCursor(self.__db, commit) as sql:
             sql.execute("DELETE FROM tracks WHERE storage_type & ?",
                         (StorageType.COLLECTION,))
+        if self.__db.model is not None:
+            self.__db.model.clear()
 
     def get_uris(self, uris_concerned=None):
         """
@@ -483,11 +615,15 @@ class TracksDatabase:
             uris = []
             if uris_concerned:
                 for uri in uris_concerned:
+                    # Range instead of LIKE: uses index, no wildcards in uri
+                    (start, end) = self.__get_uri_range(uri)
                     result = sql.execute("SELECT uri\
                                           FROM tracks\
-                                          WHERE uri LIKE ? AND\
+                                          WHERE (uri=? OR\
+                                                 (uri>=? AND uri<?)) AND\
                                           storage_type & ?",
-                                         (uri + "%", StorageType.COLLECTION))
+                                         (uri, start, end,
+                                          StorageType.COLLECTION))
                     uris += list(itertools.chain(*result))
             else:
                 result = sql.execute("SELECT uri FROM tracks\
@@ -559,6 +695,11 @@ class TracksDatabase:
             @param track_id as int
             @return duration as int
         """
+        model = self.__db.model
+        if model is not None:
+            value = model.get_track_duration(track_id)
+            if value is not None:
+                return value
         with SqlCursor(self.__db) as sql:
             result = sql.execute("SELECT duration FROM tracks\
                                   WHERE rowid=?", (track_id,))
@@ -577,6 +718,8 @@ class TracksDatabase:
             sql.execute("UPDATE tracks\
                          SET duration=?\
                          WHERE rowid=?", (duration, track_id,))
+        if self.__db.model is not None:
+            self.__db.model.set_track_duration(track_id, duration)
 
     def set_mtime(self, track_id, mtime):
         """
@@ -723,6 +866,7 @@ class TracksDatabase:
             current += 1
             sql.execute("UPDATE tracks set popularity=? WHERE rowid=?",
                         (current, track_id))
+        App().playlists.set_smart_dirty(SmartDependency.POPULARITY)
 
     def set_listened_at(self, track_id, time):
         """
@@ -733,6 +877,7 @@ class TracksDatabase:
         with SqlCursor(self.__db, True) as sql:
             sql.execute("UPDATE tracks set ltime=? WHERE rowid=?",
                         (time, track_id))
+        App().playlists.set_smart_dirty(SmartDependency.LTIME)
 
     def get_little_played(self, storage_type, skipped, limit):
         """
@@ -821,6 +966,7 @@ class TracksDatabase:
         with SqlCursor(self.__db, True) as sql:
             sql.execute("UPDATE tracks set popularity=? WHERE rowid=?",
                         (popularity, track_id))
+        App().playlists.set_smart_dirty(SmartDependency.POPULARITY)
 
     def get_popularity(self, track_id):
         """
@@ -935,11 +1081,9 @@ class TracksDatabase:
             @return discs [(int, int)]
         """
         with SqlCursor(self.__db) as sql:
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order = " ORDER BY artists.sortkey,\
                      tracks.timestamp,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED LIMIT ?"
+                     albums.sortkey LIMIT ?"
             request = "SELECT DISTINCT tracks.album_id,\
                        discnumber,\
                        discname,\
@@ -970,8 +1114,7 @@ class TracksDatabase:
             @return discs [(int, int)]
         """
         with SqlCursor(self.__db) as sql:
-            order = " ORDER BY albums.timestamp, albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED LIMIT ?"
+            order = " ORDER BY albums.timestamp, albums.sortkey LIMIT ?"
             request = "SELECT DISTINCT tracks.album_id,\
                        discnumber,\
                        discname,\
@@ -1012,6 +1155,7 @@ class TracksDatabase:
         with SqlCursor(self.__db, True) as sql:
             sql.execute("UPDATE tracks SET loved=? WHERE rowid=?",
                         (loved, track_id))
+        App().playlists.set_smart_dirty(SmartDependency.LOVED)
 
     def count(self):
         """
@@ -1049,11 +1193,19 @@ class TracksDatabase:
         """
         t1 = time.time()
         with SqlCursor(self.__db) as sql:
-            filters = (regexp_search_filter(searched), storage_type)
-            request = regexp_search_query(
-                        "SELECT rowid, name FROM tracks\
-                         WHERE noaccents(name) REGEXP ?\
-                         AND tracks.storage_type & ?")
+            if self.__db.search_index and not regexp_search_p():
+                filters = ("%" + searched + "%", storage_type)
+                request = "SELECT tracks.rowid, tracks.name\
+                           FROM tracks_fts, tracks\
+                           WHERE tracks_fts.name LIKE ?\
+                           AND tracks.rowid=tracks_fts.rowid\
+                           AND tracks.storage_type & ?"
+            else:
+                filters = (regexp_search_filter(searched), storage_type)
+                request = regexp_search_query(
+                            "SELECT rowid, name FROM tracks\
+                             WHERE noaccents(name) REGEXP ?\
+                             AND tracks.storage_type & ?")
             result = sql.execute(request, filters)
             report_large_delta("database_tracks/search", t1, time.time())
             return list(result)
@@ -1067,8 +1219,21 @@ class TracksDatabase:
         """
         t1 = time.time()
         with SqlCursor(self.__db) as sql:
-            filters = (regexp_search_filter(searched), storage_type)
-            request = regexp_search_query(
+            if self.__db.search_index and not regexp_search_p():
+                filters = ("%" + searched + "%", storage_type)
+                request = "SELECT DISTINCT tracks.rowid, artists.name\
+                   FROM artists_fts, artists, track_artists, tracks\
+                   WHERE artists_fts.name LIKE ? AND\
+                   artists.rowid=artists_fts.rowid AND\
+                   track_artists.artist_id=artists.rowid AND\
+                   track_artists.track_id=tracks.rowid AND\
+                   tracks.storage_type & ? AND NOT EXISTS (\
+                        SELECT album_artists.artist_id\
+                        FROM album_artists\
+                        WHERE album_artists.artist_id=artists.rowid)"
+            else:
+                filters = (regexp_search_filter(searched), storage_type)
+                request = regexp_search_query(
                   "SELECT DISTINCT tracks.rowid, artists.name\
                    FROM track_artists, tracks, artists\
                    WHERE track_artists.artist_id=artists.rowid AND\
@@ -1118,3 +1283,18 @@ class TracksDatabase:
                          WHERE track_id=?", (track_id,))
             sql.execute("DELETE FROM tracks\
                          WHERE rowid=?", (track_id,))
+        if self.__db.model is not None:
+            self.__db.model.remove_track(track_id)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_uri_range(self, uri):
+        """
+            Get uri range for tracks in directory
+            @param uri as str
+            @return (str, str): start included, end excluded
+        """
+        # "0" follows "/" in ASCII
+        uri = uri.rstrip("/")
+        return (uri + "/", uri + "0")
@@ -18,6 +18,7 @@ from gettext import gettext as _
 
 from scarlatti.sqlcursor import SqlCursor
 from scarlatti.utils import translate_artist_name
+from scarlatti.utils_file import get_uri_basename
 from scarlatti.database_history import History
 from scarlatti.define import App, Type, StorageType, SCARLATTI_DATA_PATH
 from scarlatti.logger import Logger
@@ -88,7 +89,14 @@ class DatabasePlaylistsUpgrade(DatabaseUpgrade):
            2: "ALTER TABLE playlists ADD smart_enabled INT NOT NULL DEFAULT 0",
            3: "ALTER TABLE playlists ADD smart_sql TEXT",
            4: self.__upgrade_4,
-           5: "ALTER TABLE playlists ADD uri TEXT"
+           5: "ALTER TABLE playlists ADD uri TEXT",
+           6: "ALTER TABLE playlists ADD smart_deps INT NOT NULL DEFAULT 0",
+           7: "ALTER TABLE playlists ADD smart_dirty INT NOT NULL DEFAULT 1",
+           8: "ALTER TABLE playlists\
+               ADD smart_storage INT NOT NULL DEFAULT 0",
+           9: self.__upgrade_9,
+           10: "CREATE INDEX idx_tracks_playlist\
+                ON tracks(playlist_id, uri)"
         }
 
 #######################
@@ -107,6 +115,18 @@ class DatabasePlaylistsUpgrade(DatabaseUpgrade):
                     sql2.execute("UPDATE tracks SET loved=1 WHERE uri=?",
                                  (uri,))
 
+    def __upgrade_9(self, db):
+        """
+            Add smart playlists result table
+        """
+        with SqlCursor(db, True) as sql:
+            sql.execute("CREATE TABLE smart_tracks (\
+                         playlist_id INT NOT NULL,\
+                         position INT NOT NULL,\
+                         track_id INT NOT NULL)")
+            sql.execute("CREATE INDEX idx_smart_tracks\
+                         ON smart_tracks(playlist_id, position)")
+
 
 class DatabaseAlbumsUpgrade(DatabaseUpgrade):
     """
@@ -175,6 +195,17 @@ class DatabaseAlbumsUpgrade(DatabaseUpgrade):
             46: self.__upgrade_46,
             47: self.__upgrade_47,
             48: self.__upgrade_48,
+            49: self.__upgrade_49,
+            50: self.__upgrade_50,
+            51: self.__upgrade_51,
+            52: self.__upgrade_52,
+            53: self.__upgrade_53,
+            54: self.__upgrade_54,
+            55: """CREATE TABLE directories (uri TEXT PRIMARY KEY,
+                                             parent TEXT,
+                                             mtime INT NOT NULL,
+                                             count INT NOT NULL,
+                                             hash TEXT NOT NULL)""",
         }
 
 #######################
@@ -837,3 +868,73 @@ class DatabaseAlbumsUpgrade(DatabaseUpgrade):
             sql.execute("UPDATE albums set loved=2 where loved=1")
             sql.execute("UPDATE albums set loved=1 where loved=0")
             sql.execute("UPDATE albums set loved=4 where loved=-1")
+
+    def __upgrade_49(self, db):
+        """
+            Switch to WAL journal: UI readers do not wait for scanner anymore
+        """
+        # journal_mode can't be changed inside a transaction
+        SqlCursor.commit(db)
+        with SqlCursor(db) as sql:
+            result = sql.execute("PRAGMA journal_mode=WAL")
+            v = result.fetchone()
+            if v is None or v[0] != "wal":
+                Logger.warning("DB upgrade 49: journal mode is %s", v)
+
+    def __upgrade_50(self, db):
+        """
+            Store names without accents, add full text search index
+            Triggers copy noaccents_name, they do not call python
+        """
+        with SqlCursor(db, True) as sql:
+            for table in ["albums", "artists", "tracks"]:
+                sql.execute("ALTER TABLE %s ADD noaccents_name TEXT" % table)
+                sql.execute("UPDATE %s SET noaccents_name=noaccents2(name)" %
+                            table)
+            sql.execute("CREATE INDEX idx_tracks_noaccents ON\
+                         tracks(noaccents_name)")
+            db.create_search_index(sql)
+
+    def __upgrade_51(self, db):
+        """
+            Store normalized names, lookups do not call python anymore
+        """
+        with SqlCursor(db, True) as sql:
+            for table in ["albums", "artists", "genres"]:
+                sql.execute("ALTER TABLE %s ADD escaped_name TEXT" % table)
+                sql.execute("UPDATE %s SET escaped_name=sql_escape(name)" %
+                            table)
+                sql.execute("CREATE INDEX idx_{0}_escaped ON\
+                             {0}(escaped_name)".format(table))
+
+    def __upgrade_52(self, db):
+        """
+            Store binary sort keys, ORDER BY does not call python anymore
+        """
+        with SqlCursor(db, True) as sql:
+            for table in ["albums", "artists"]:
+                sql.execute("ALTER TABLE %s ADD sortkey BLOB" % table)
+                sql.execute("CREATE INDEX idx_{0}_sortkey ON\
+                             {0}(sortkey)".format(table))
+            sql.execute("CREATE TABLE sort_locale (name TEXT NOT NULL)")
+            db.update_sort_keys(sql)
+
+    def __upgrade_53(self, db):
+        """
+            Add indexes for lookups and reverse joins
+        """
+        with SqlCursor(db, True) as sql:
+            db.create_indexes(sql)
+
+    def __upgrade_54(self, db):
+        """
+            Store tracks basename, moved tracks are found with an index
+        """
+        with SqlCursor(db, True) as sql:
+            sql.execute("ALTER TABLE tracks ADD basename TEXT")
+            result = sql.execute("SELECT rowid, uri FROM tracks")
+            sql.executemany("UPDATE tracks SET basename=? WHERE rowid=?",
+                            [(get_uri_basename(uri), track_id)
+                             for (track_id, uri) in list(result)])
+            sql.execute("CREATE INDEX idx_tracks_basename ON\
+                         tracks(basename, duration)")
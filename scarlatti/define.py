@@ -111,6 +111,7 @@ class ArtBehaviour:
     CROP_SQUARE = 1 << 10
     CACHE = 1 << 11
     NO_CACHE = 1 << 12
+    NO_DOWNLOAD = 1 << 13
 
 
 class ViewType:
@@ -197,6 +198,17 @@ class ScanUpdate:
     MODIFIED = 2
 
 
+class SmartDependency:
+    NONE = 0
+    COLLECTION = 1 << 0
+    RATE = 1 << 1
+    LOVED = 1 << 2
+    POPULARITY = 1 << 3
+    LTIME = 1 << 4
+    # Result changes on each read
+    RANDOM = 1 << 5
+
+
 class SelectionListMask:
     NONE = 1 << 0
     SIDEBAR = 1 << 1
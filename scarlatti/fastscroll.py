@@ -12,9 +12,10 @@
 
 from gi.repository import Gtk, GLib
 
+from bisect import bisect_left
 from locale import strxfrm
 
-from scarlatti.utils import noaccents
+from scarlatti.utils import noaccents2
 
 from scarlatti.localized import index_of
 
@@ -40,7 +41,9 @@ class FastScroll(Gtk.ScrolledWindow):
         self.set_policy(Gtk.PolicyType.NEVER,
                         Gtk.PolicyType.NEVER)
         self.set_property("halign", Gtk.Align.END)
+        # Sorted chars and their collation keys
         self.__chars = []
+        self.__char_keys = []
         self.__listbox = listbox
         self.__scrolled = scrolled
         self.__grid = Gtk.Grid()
@@ -69,16 +72,27 @@ class FastScroll(Gtk.ScrolledWindow):
             Clear chars
         """
         self.__chars = []
+        self.__char_keys = []
 
     def add_char(self, c):
         """
-            Add a char to widget, will not be shown
+            Add a char to widget, shown at once if widget is populated
             @param c as char
         """
         if c:
             to_add = noaccents2(index_of(c)).upper()
-            if to_add not in self.__chars:
-                self.__chars.append(to_add)
+            key = strxfrm(to_add)
+            position = bisect_left(self.__char_keys, key)
+            if position < len(self.__chars) and\
+                    self.__chars[position] == to_add:
+                return
+            self.__chars.insert(position, to_add)
+            self.__char_keys.insert(position, key)
+            if self.__grid.get_children():
+                # First row is ▲
+                self.__grid.insert_row(position + 1)
+                self.__grid.attach(self.__get_label(to_add, 0.4),
+                                   0, position + 1, 1, 1)
 
     def populate(self):
         """
@@ -86,34 +100,38 @@ class FastScroll(Gtk.ScrolledWindow):
         """
         if not self.__chars:
             return
-        label = Gtk.Label.new()
-        label.set_margin_start(10)
-        label.set_markup('<span font="Monospace"><b>%s</b></span>' % "▲")
-        label.show()
-        self.__grid.add(label)
-        for c in sorted(self.__chars, key=strxfrm):
-            label = Gtk.Label.new()
-            label.set_margin_start(10)
-            label.set_markup('<span font="Monospace"><b>%s</b></span>' % c)
-            label.set_opacity(0.4)
-            label.show()
-            self.__grid.add(label)
-        label = Gtk.Label.new()
-        label.set_margin_start(10)
-        label.set_markup('<span font="Monospace"><b>%s</b></span>' % "▼")
-        label.show()
-        self.__grid.add(label)
+        if not self.__grid.get_children():
+            self.__grid.add(self.__get_label("▲", 1))
+            for c in self.__chars:
+                self.__grid.add(self.__get_label(c, 0.4))
+            self.__grid.add(self.__get_label("▼", 1))
         self.__on_value_changed()
 
 #######################
 # PRIVATE             #
 #######################
+    def __get_label(self, c, opacity):
+        """
+            Get a label for char
+            @param c as str
+            @param opacity as float
+            @return Gtk.Label
+        """
+        label = Gtk.Label.new()
+        label.set_margin_start(10)
+        label.set_markup('<span font="Monospace"><b>%s</b></span>' % c)
+        label.set_opacity(opacity)
+        label.show()
+        return label
+
     def __set_margin(self):
         """
             Get top non static entry and set margin based on it position
         """
         margin = 0
-        for row in self.__listbox.get_children():
+        index = 0
+        row = self.__listbox.get_row_at_index(index)
+        while row is not None:
             if row.id >= 0:
                 values = row.translate_coordinates(self.__main_scrolled, 0, 0)
                 if values is not None:
@@ -122,6 +140,8 @@ class FastScroll(Gtk.ScrolledWindow):
                     margin = 5
                 self.set_margin_top(margin)
                 break
+            index += 1
+            row = self.__listbox.get_row_at_index(index)
 
     def __check_value_to_mark(self):
         """
@@ -129,25 +149,20 @@ class FastScroll(Gtk.ScrolledWindow):
         """
         start = self.__scrolled.get_vadjustment().get_value()
         end = start + self.__scrolled.get_allocated_height()
-        start_value = None
-        end_value = None
-        for row in self.__listbox.get_children():
-            if row.id < 0:
-                continue
-            values = row.translate_coordinates(self.__listbox, 0, 0)
-            if values is not None:
-                if row.sortname:
-                    name = row.sortname
-                else:
-                    name = row.name
-                if values[1] >= start and start_value is None:
-                    start_value = name[0]
-                elif values[1] <= end:
-                    end_value = name[0]
-                else:
-                    break
-        if start_value is not None and end_value is not None:
-            self.__mark_values(start_value, end_value)
+        # Rows are found with a binary search, do not walk the list
+        start_row = self.__listbox.get_row_at_y(start)
+        end_row = self.__listbox.get_row_at_y(
+            min(end, self.__listbox.get_allocated_height() - 1))
+        # Static entries are on top
+        while start_row is not None and start_row.id < 0:
+            start_row = self.__listbox.get_row_at_index(
+                start_row.get_index() + 1)
+        if start_row is None or end_row is None or end_row.id < 0:
+            return
+        start_name = start_row.sortname or start_row.name
+        end_name = end_row.sortname or end_row.name
+        if start_name and end_name:
+            self.__mark_values(start_name[0], end_name[0])
 
     def __mark_values(self, start, end):
         """
@@ -157,7 +172,9 @@ class FastScroll(Gtk.ScrolledWindow):
         """
         start = noaccents2(index_of(start)).upper()
         end = noaccents2(index_of(end)).upper()
-        chars = sorted(self.__chars, key=strxfrm)
+        chars = self.__chars
+        if start not in chars or end not in chars:
+            return
         start_idx = chars.index(start)
         end_idx = chars.index(end)
         selected = chars[start_idx:end_idx + 1] + ["▲", "▼"]
@@ -14,20 +14,308 @@ from gi.repository import GObject, GLib, Gtk, Gdk
 
 import cairo
 
+from collections import OrderedDict
+from heapq import heappush, heappop
+from os import cpu_count
+from threading import Thread, Condition
+from time import time
+from weakref import WeakMethod, WeakKeyDictionary
+
 from scarlatti.define import App, ArtBehaviour
+from scarlatti.logger import Logger
 from scarlatti.utils import get_round_surface
 
 
+class ArtworkRequest:
+    """
+        A pending artwork load
+    """
+    __slots__ = ("command", "args", "callbacks", "time")
+
+    def __init__(self, command, args):
+        """
+            Init request
+            @param command as function
+            @param args as tuple
+        """
+        self.command = command
+        self.args = args
+        self.callbacks = []
+        self.time = time()
+
+
+class ArtworkPool:
+    """
+        Load artwork with a fixed number of threads
+        Last requests are loaded first: widgets just shown are visible
+        Same requests are loaded once
+        Requests for destroyed widgets are dropped, a widget asking for
+        another artwork drops its previous request
+    """
+
+    def __init__(self, workers, on_loaded):
+        """
+            Init pool
+            @param workers as int
+            @param on_loaded as function(result, callback, *callback_args)
+        """
+        self.__workers = workers
+        self.__on_loaded = on_loaded
+        self.__threads = []
+        self.__condition = Condition()
+        # Heap of (order, key), lower order first
+        self.__queue = []
+        self.__requests = {}
+        # Callback owner => pending request key
+        self.__owners = WeakKeyDictionary()
+        self.__order = 0
+        self.__stats = {"requests": 0, "merged": 0, "cancelled": 0,
+                        "loaded": 0, "wait": 0.0, "max_wait": 0.0,
+                        "load": 0.0}
+
+    def add(self, key, command, args, callback, callback_args):
+        """
+            Load command(*args) result and pass it to on_loaded()
+            @param key as tuple, same keys are loaded once
+            @param command as function
+            @param args as tuple
+            @param callback as function, only weakly referenced
+            @param callback_args as tuple
+        """
+        try:
+            ref = WeakMethod(callback)
+            owner = callback.__self__
+        except TypeError:
+            def ref():
+                return callback
+            owner = None
+        with self.__condition:
+            self.__stats["requests"] += 1
+            if owner is not None:
+                previous = self.__owners.get(owner)
+                if previous is not None and previous != key:
+                    self.__cancel(owner, previous)
+                self.__owners[owner] = key
+            request = self.__requests.get(key)
+            if request is None:
+                request = ArtworkRequest(command, args)
+                self.__requests[key] = request
+                self.__order -= 1
+                heappush(self.__queue, (self.__order, key))
+                if len(self.__threads) < self.__workers:
+                    thread = Thread(target=self.__run)
+                    thread.daemon = True
+                    thread.start()
+                    self.__threads.append(thread)
+                self.__condition.notify()
+            else:
+                self.__stats["merged"] += 1
+            request.callbacks.append((ref, callback_args))
+
+    def cancel(self, owner):
+        """
+            Drop pending request for owner
+            @param owner as object: callbacks are owner methods
+        """
+        with self.__condition:
+            key = self.__owners.pop(owner, None)
+            if key is not None:
+                self.__cancel(owner, key)
+
+    @property
+    def stats(self):
+        """
+            Get pool counters, times in seconds
+            @return {str: int/float}
+        """
+        with self.__condition:
+            stats = dict(self.__stats)
+            stats["queued"] = len(self.__queue)
+        loaded = max(1, stats["loaded"])
+        stats["wait"] /= loaded
+        stats["load"] /= loaded
+        return stats
+
+#######################
+# PRIVATE             #
+#######################
+    def __run(self):
+        """
+            Load requests until application quits
+        """
+        while True:
+            with self.__condition:
+                while not self.__queue:
+                    self.__condition.wait()
+                (order, key) = heappop(self.__queue)
+                # Cancelled request
+                request = self.__requests.pop(key, None)
+                if request is None:
+                    continue
+            callbacks = [(ref(), args) for (ref, args) in request.callbacks]
+            callbacks = [(callback, args) for (callback, args) in callbacks
+                         if callback is not None]
+            if not callbacks:
+                with self.__condition:
+                    self.__stats["cancelled"] += 1
+                continue
+            start = time()
+            try:
+                result = request.command(*request.args)
+            except Exception as e:
+                Logger.warning("ArtworkPool::__run(): %s", e)
+                result = None
+            with self.__condition:
+                wait = start - request.time
+                self.__stats["loaded"] += 1
+                self.__stats["wait"] += wait
+                self.__stats["max_wait"] = max(wait, self.__stats["max_wait"])
+                self.__stats["load"] += time() - start
+                empty = not self.__queue
+            for (callback, args) in callbacks:
+                GLib.idle_add(self.__on_loaded, result, callback, *args)
+            if empty:
+                Logger.debug("ArtworkPool::__run(): %s", self.stats)
+
+    def __cancel(self, owner, key):
+        """
+            Remove owner callbacks from request, drop request if unused
+            @param owner as object
+            @param key as tuple
+        """
+        request = self.__requests.get(key)
+        if request is None:
+            return
+        callbacks = []
+        for (ref, args) in request.callbacks:
+            callback = ref()
+            if callback is not None and\
+                    getattr(callback, "__self__", None) is not owner:
+                callbacks.append((ref, args))
+        request.callbacks = callbacks
+        # Queue entry is skipped by workers
+        if not callbacks:
+            del self.__requests[key]
+            self.__stats["cancelled"] += 1
+
+
+class SurfaceCache:
+    """
+        Least recently used decoded surfaces, bounded by size in bytes
+        Surfaces are shared: users must not paint on them
+        @warning not thread safe, main thread only
+    """
+
+    def __init__(self, max_size):
+        """
+            Init cache
+            @param max_size as int: bytes
+        """
+        self.__max_size = max_size
+        self.__surfaces = OrderedDict()
+        self.__size = 0
+        self.__stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def get(self, key):
+        """
+            Get surface for key
+            @param key as tuple
+            @return cairo.Surface/None
+        """
+        item = self.__surfaces.get(key)
+        if item is None:
+            self.__stats["misses"] += 1
+            return None
+        self.__surfaces.move_to_end(key)
+        self.__stats["hits"] += 1
+        return item[0]
+
+    def add(self, key, surface):
+        """
+            Add surface for key, evict oldest surfaces if needed
+            @param key as tuple
+            @param surface as cairo.Surface
+        """
+        self.__remove(key)
+        size = self.__get_size(surface)
+        if size > self.__max_size:
+            return
+        self.__surfaces[key] = (surface, size)
+        self.__size += size
+        while self.__size > self.__max_size:
+            (key, (surface, size)) = self.__surfaces.popitem(last=False)
+            self.__size -= size
+            self.__stats["evicted"] += 1
+
+    def remove(self, kind, name):
+        """
+            Remove all surfaces for kind and name
+            @param kind as str: "album"/"artist"
+            @param name as int/str: album id or artist name
+        """
+        for key in [key for key in self.__surfaces
+                    if key[0:2] == (kind, name)]:
+            self.__remove(key)
+
+    @property
+    def stats(self):
+        """
+            Get cache counters
+            @return {str: int}
+        """
+        stats = dict(self.__stats)
+        stats["surfaces"] = len(self.__surfaces)
+        stats["size"] = self.__size
+        return stats
+
+#######################
+# PRIVATE             #
+#######################
+    def __remove(self, key):
+        """
+            Remove key from cache
+            @param key as tuple
+        """
+        item = self.__surfaces.pop(key, None)
+        if item is not None:
+            self.__size -= item[1]
+
+    def __get_size(self, surface):
+        """
+            Get surface size in memory
+            @param surface as cairo.Surface
+            @return int
+        """
+        try:
+            return surface.get_stride() * surface.get_height()
+        except AttributeError:
+            return surface.get_width() * surface.get_height() * 4
+
+
 class ArtHelper(GObject.Object):
     """
         Helper to load artwork smoothly
     """
 
+    # Decoded surfaces kept in memory
+    __CACHE_SIZE = 64 * 1024 * 1024
+
     def __init__(self):
         """
             Init helper
+            @warning: needs App().album_art and App().artist_art
         """
         GObject.Object.__init__(self)
+        self.__pool = ArtworkPool(min(4, cpu_count() or 1),
+                                  self.__on_artwork_loaded)
+        self.__cache = SurfaceCache(self.__CACHE_SIZE)
+        # Connected before widgets: cache is cleaned before they reload
+        App().album_art.connect("album-artwork-changed",
+                                lambda art, album_id:
+                                self.__cache.remove("album", album_id))
+        App().artist_art.connect("artist-artwork-changed",
+                                 lambda art, name:
+                                 self.__cache.remove("artist", name))
 
     def set_frame(self, image, frame, width, height):
         """
@@ -59,19 +347,23 @@ class ArtHelper(GObject.Object):
             @param effect as ArtBehaviour
             @param callback as function
         """
-        App().task_helper.run(App().album_art.get,
-                              album,
-                              width,
-                              height,
-                              scale_factor,
-                              effect,
-                              callback=(self._on_get_artwork_pixbuf,
-                                        width,
-                                        height,
-                                        scale_factor,
-                                        effect,
-                                        callback,
-                                        *args))
+        # Albums without id are not shared
+        if album.id is None or effect & ArtBehaviour.NO_CACHE:
+            cache_key = None
+            key = ("album", id(album), width, height, scale_factor, effect)
+        else:
+            cache_key = key = ("album", album.id, width, height,
+                               scale_factor, effect)
+            surface = self.__cache.get(cache_key)
+            if surface is not None:
+                callback(surface, *args)
+                return
+        self.__pool.add(key,
+                        App().album_art.get,
+                        (album, width, height, scale_factor, effect),
+                        callback,
+                        (cache_key, width, height, scale_factor,
+                         effect, *args))
 
     def set_artist_artwork(self, name, width, height, scale_factor,
                            effect, callback, *args):
@@ -84,64 +376,90 @@ class ArtHelper(GObject.Object):
             @param effect as ArtBehaviour
             @param callback as function
         """
-        App().task_helper.run(App().artist_art.get,
-                              name,
-                              width,
-                              height,
-                              scale_factor,
-                              effect,
-                              callback=(self._on_get_artwork_pixbuf,
-                                        width,
-                                        height,
-                                        scale_factor,
-                                        effect,
-                                        callback,
-                                        *args))
+        key = ("artist", name, width, height, scale_factor, effect)
+        if effect & ArtBehaviour.NO_CACHE:
+            cache_key = None
+        else:
+            cache_key = key
+            surface = self.__cache.get(cache_key)
+            if surface is not None:
+                callback(surface, *args)
+                return
+        self.__pool.add(key,
+                        App().artist_art.get,
+                        (name, width, height, scale_factor, effect),
+                        callback,
+                        (cache_key, width, height, scale_factor,
+                         effect, *args))
+
+    def cancel(self, owner):
+        """
+            Drop pending artwork request for owner, a new request from
+            owner already replaces the previous one
+            @param owner as object: callbacks are owner methods
+        """
+        self.__pool.cancel(owner)
+
+    @property
+    def stats(self):
+        """
+            Get artwork loading and cache counters
+            @return {str: int/float}
+        """
+        stats = self.__pool.stats
+        for (key, value) in self.__cache.stats.items():
+            stats["cache_%s" % key] = value
+        return stats
 
 #######################
-# PROTECTED           #
+# PRIVATE             #
 #######################
-    def _on_get_artwork_pixbuf(self, pixbuf, width, height, scale_factor,
-                               effect, callback, *args):
+    def __on_artwork_loaded(self, pixbuf, callback, cache_key, width,
+                            height, scale_factor, effect, *args):
         """
-            Transform pixbuf to surface and load surface effects
+            Create surface for pool result and cache it
             @param pixbuf as Gdk.Pixbuf
-            @param size as int
+            @param callback as function
+            @param cache_key as tuple/None
+            @param width as int
+            @param height as int
             @param scale_factor as int
             @param effect as ArtBehaviour
-            @param callback as function
         """
         surface = None
-        if pixbuf is not None:
-            if effect & ArtBehaviour.ROUNDED:
-                radius = pixbuf.get_width() / 2
-                surface = get_round_surface(pixbuf, scale_factor, radius)
-            elif effect & ArtBehaviour.ROUNDED_BORDER:
-                surface = get_round_surface(pixbuf, scale_factor, 5)
-            else:
-                surface = Gdk.cairo_surface_create_from_pixbuf(
-                        pixbuf, scale_factor, None)
-        App().task_helper.run(self.__surface_effects, surface, width, height,
-                              scale_factor, effect, callback, *args)
+        # Merged requests: surface created by a previous callback
+        if cache_key is not None and pixbuf is not None:
+            surface = self.__cache.get(cache_key)
+        if surface is None:
+            surface = self.__get_surface(pixbuf, scale_factor, effect)
+            if cache_key is not None and surface is not None:
+                self.__cache.add(cache_key, surface)
+        callback(surface, *args)
 
-#######################
-# PRIVATE             #
-#######################
-    def __surface_effects(self, surface, width, height, scale_factor,
-                          effect, callback, *args):
+    def __get_surface(self, pixbuf, scale_factor, effect):
         """
-            Load surface effects
-            @param surface as cairo.Surface
-            @param size as int
+            Transform pixbuf to surface and load surface effects
+            A single fill: no need for a thread
+            @param pixbuf as Gdk.Pixbuf/None
             @param scale_factor as int
             @param effect as ArtBehaviour
-            @param callback as function
+            @return cairo.Surface/None
         """
+        if pixbuf is None:
+            return None
+        if effect & ArtBehaviour.ROUNDED:
+            radius = pixbuf.get_width() / 2
+            surface = get_round_surface(pixbuf, scale_factor, radius)
+        elif effect & ArtBehaviour.ROUNDED_BORDER:
+            surface = get_round_surface(pixbuf, scale_factor, 5)
+        else:
+            surface = Gdk.cairo_surface_create_from_pixbuf(
+                    pixbuf, scale_factor, None)
         if effect & ArtBehaviour.DARKER:
             self.__set_color(surface, 0, 0, 0)
         if effect & ArtBehaviour.LIGHTER:
             self.__set_color(surface, 1, 1, 1)
-        GLib.idle_add(callback, surface, *args)
+        return surface
 
     def __set_color(self, surface, r, g, b):
         """
@@ -11,32 +11,113 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 from gi.repository import Gio, GLib
-from gi.repository.Gio import FILE_ATTRIBUTE_STANDARD_TYPE,\
-    FILE_ATTRIBUTE_STANDARD_FAST_CONTENT_TYPE
 
-from scarlatti.define import App, ScanType
-from scarlatti.utils_file import is_audio
+from time import time
+
+from scarlatti.define import App
 from scarlatti.logger import Logger
 
 
-SCAN_QUERY_INFO = "{},{}".format(FILE_ATTRIBUTE_STANDARD_TYPE,
-                                 FILE_ATTRIBUTE_STANDARD_FAST_CONTENT_TYPE)
+class ChangeJournal:
+    """
+        Pending file changes, coalesced
+    """
+
+    def __init__(self):
+        """
+            Init journal
+        """
+        self.clear()
+
+    def update(self, uri):
+        """
+            File created or modified
+            @param uri as str
+        """
+        self.__removed.discard(uri)
+        self.__updated.add(uri)
+
+    def remove(self, uri):
+        """
+            File deleted
+            @param uri as str
+        """
+        self.__updated.discard(uri)
+        self.__removed.add(uri)
+        # Moved then deleted
+        for (old_uri, new_uri) in list(self.__moved.items()):
+            if new_uri == uri:
+                del self.__moved[old_uri]
+                self.__removed.add(old_uri)
+
+    def move(self, old_uri, new_uri):
+        """
+            File renamed
+            @param old_uri as str
+            @param new_uri as str
+        """
+        self.__removed.discard(new_uri)
+        # Created then moved
+        if old_uri in self.__updated:
+            self.__updated.discard(old_uri)
+            self.__updated.add(new_uri)
+        # Moved twice
+        for (uri, moved_uri) in list(self.__moved.items()):
+            if moved_uri == old_uri:
+                old_uri = uri
+        if old_uri == new_uri:
+            self.__moved.pop(old_uri, None)
+        else:
+            self.__moved[old_uri] = new_uri
+
+    def get(self):
+        """
+            Get pending changes
+            @return ([str], [str], [(str, str)]): updated, removed, moved
+        """
+        return (list(self.__updated),
+                list(self.__removed),
+                list(self.__moved.items()))
+
+    def clear(self):
+        """
+            Forget pending changes
+        """
+        self.__updated = set()
+        self.__removed = set()
+        self.__moved = {}
+
+    def __len__(self):
+        """
+            Get pending changes count
+            @return int
+        """
+        return len(self.__updated) + len(self.__removed) + len(self.__moved)
 
 
 class Inotify:
     """
         Inotify support
+        Changes are recorded in a journal, applied file by file when quiet
     """
-    # 2 seconds before updating database
+    # 2 seconds without changes before updating database
     __TIMEOUT = 2000
+    # Do not wait more than 30 seconds on continuous changes
+    __MAX_DELAY = 30
+    # Leave inotify watches to other applications
+    __WATCHES_RATIO = 0.5
 
     def __init__(self):
         """
             Init inode notification
         """
         self.__monitors = {}
+        self.__journal = ChangeJournal()
+        self.__journal_time = 0
         self.__collection_timeout_id = None
         self.__disable_timeout_id = None
+        self.__max_monitors = self.__get_max_monitors()
+        self.__limit_reached = False
 
     def add_monitor(self, uri):
         """
@@ -46,9 +127,17 @@ class Inotify:
         # Check if there is already a monitor for this uri
         if uri in self.__monitors.keys():
             return
+        # Directory changes are found by next scan
+        if len(self.__monitors) >= self.__max_monitors:
+            if not self.__limit_reached:
+                self.__limit_reached = True
+                Logger.warning("Inotify::add_monitor(): limit reached, %s"
+                               " directories monitored",
+                               self.__max_monitors)
+            return
         try:
             f = Gio.File.new_for_uri(uri)
-            monitor = f.monitor_directory(Gio.FileMonitorFlags.NONE,
+            monitor = f.monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES,
                                           None)
             if monitor is not None:
                 monitor.connect("changed", self.__on_dir_changed)
@@ -56,6 +145,16 @@ class Inotify:
         except Exception as e:
             Logger.error("Inotify::add_monitor(): %s" % e)
 
+    def remove_monitors(self, uri):
+        """
+            Remove monitors for uri and its subdirectories
+            @param uri as str
+        """
+        prefix = uri.rstrip("/") + "/"
+        for monitor_uri in list(self.__monitors.keys()):
+            if monitor_uri == uri or monitor_uri.startswith(prefix):
+                self.__monitors.pop(monitor_uri).cancel()
+
     def disable(self, timeout=10000):
         """
             Disable inotify for timeout
@@ -65,6 +164,8 @@ class Inotify:
             self.__disable_timeout_id = None
         if self.__collection_timeout_id is not None:
             GLib.source_remove(self.__collection_timeout_id)
+            self.__collection_timeout_id = None
+        self.__journal.clear()
         if self.__disable_timeout_id is not None:
             GLib.source_remove(self.__disable_timeout_id)
         self.__disable_timeout_id = GLib.timeout_add(timeout, on_timeout)
@@ -72,9 +173,21 @@ class Inotify:
 #######################
 # PRIVATE             #
 #######################
+    def __get_max_monitors(self):
+        """
+            Get maximum monitor count for system inotify watches
+            @return int
+        """
+        try:
+            with open("/proc/sys/fs/inotify/max_user_watches", "r") as f:
+                return int(int(f.read()) * self.__WATCHES_RATIO)
+        except Exception as e:
+            Logger.warning("Inotify::__get_max_monitors(): %s", e)
+            return 4096
+
     def __on_dir_changed(self, monitor, changed_file, other_file, event):
         """
-            Stop collection scanner if running
+            Record change in journal
             Delayed update by default
             @param monitor as Gio.FileMonitor
             @param changed_file as Gio.File/None
@@ -89,43 +202,52 @@ class Inotify:
             if changed_uri in self.__monitors.keys() and\
                     self.__monitors[changed_uri] == monitor:
                 return
-
-            if changed_file.query_exists():
-                # Ignore non audio
-                info = changed_file.query_info(SCAN_QUERY_INFO,
-                                               Gio.FileQueryInfoFlags.NONE)
-                if info.get_file_type() != Gio.FileType.DIRECTORY and\
-                        is_audio(info):
+            other_uri = None if other_file is None else other_file.get_uri()
+            # Ignore hidden files, temporary files written by tag editors
+            if changed_file.get_basename().startswith("."):
+                # Temporary file replacing a track
+                if event == Gio.FileMonitorEvent.RENAMED:
+                    self.__journal.update(other_uri)
+                else:
                     return
-
-            # Stop collection scanner and wait
-            if App().scanner.is_locked():
-                App().scanner.stop()
-                GLib.timeout_add(self.__TIMEOUT,
-                                 self.__on_dir_changed,
-                                 monitor,
-                                 changed_file,
-                                 other_file,
-                                 event)
-            # Run update delayed
-            else:
-                if self.__collection_timeout_id is not None:
-                    GLib.source_remove(self.__collection_timeout_id)
-                if changed_file.has_parent():
-                    uris = [changed_file.get_parent().get_uri()]
+            elif event in [Gio.FileMonitorEvent.CREATED,
+                           Gio.FileMonitorEvent.CHANGES_DONE_HINT]:
+                self.__journal.update(changed_uri)
+            elif event == Gio.FileMonitorEvent.DELETED:
+                self.__journal.remove(changed_uri)
+            elif event == Gio.FileMonitorEvent.RENAMED:
+                self.__journal.move(changed_uri, other_uri)
+            elif event == Gio.FileMonitorEvent.MOVED_IN:
+                if other_uri is None:
+                    self.__journal.update(changed_uri)
+                else:
+                    self.__journal.move(other_uri, changed_uri)
+            elif event == Gio.FileMonitorEvent.MOVED_OUT:
+                if other_uri is None:
+                    self.__journal.remove(changed_uri)
                 else:
-                    uris = [changed_uri]
-                self.__collection_timeout_id = GLib.timeout_add(
-                                                 self.__TIMEOUT,
-                                                 self.__run_collection_update,
-                                                 uris)
+                    self.__journal.move(changed_uri, other_uri)
+            else:
+                return
+            if self.__collection_timeout_id is None:
+                self.__journal_time = time()
+            # Wait for changes to end, bursts are applied together
+            elif time() - self.__journal_time < self.__MAX_DELAY:
+                GLib.source_remove(self.__collection_timeout_id)
+            else:
+                return
+            self.__collection_timeout_id = GLib.timeout_add(
+                                             self.__TIMEOUT,
+                                             self.__run_collection_update)
         except Exception as e:
-            Logger.error("Inotify::__on_dir_changed()", e)
+            Logger.error("Inotify::__on_dir_changed(): %s", e)
 
-    def __run_collection_update(self, uris=[]):
+    def __run_collection_update(self):
         """
-            Run a collection update
-            @param uris as [str]
+            Apply journal changes, retry later if scanner is busy
         """
-        self.__collection_timeout_id = None
-        App().scanner.update(ScanType.NEW_FILES, uris)
+        if App().scanner.apply_changes(*self.__journal.get()):
+            self.__journal.clear()
+            self.__collection_timeout_id = None
+            return False
+        return True
@@ -0,0 +1,271 @@
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from array import array
+from threading import Lock
+from time import time
+import sys
+
+from scarlatti.sqlcursor import SqlCursor
+from scarlatti.logger import Logger
+
+
+class ModelAlbum:
+    """
+        An album in library model
+    """
+    __slots__ = ("name", "artist_ids")
+
+    def __init__(self, name):
+        """
+            Init album
+            @param name as str
+        """
+        self.name = name
+        self.artist_ids = ()
+
+
+class LibraryModel:
+    """
+        In memory copy of collection data only changing on scans:
+        artist/album/genre names, album artists and track durations
+        Getters return None for unknown values, callers then query database
+    """
+
+    # Unknown track duration
+    __NO_DURATION = -1
+
+    def __init__(self, db):
+        """
+            Init model
+            @param db as Database
+        """
+        self.__db = db
+        self.__lock = Lock()
+        self.__generation = 0
+        self.__set_tables({}, {}, {}, array("l"))
+
+    def load(self):
+        """
+            Load model from database, run this in a thread
+        """
+        try:
+            start = time()
+            generation = self.__generation
+            albums = {}
+            artists = {}
+            genres = {}
+            durations = array("l")
+            with SqlCursor(self.__db) as sql:
+                result = sql.execute("SELECT rowid, name FROM artists")
+                artists = dict(result)
+                result = sql.execute("SELECT rowid, name FROM genres")
+                genres = dict(result)
+                result = sql.execute("SELECT rowid, name FROM albums")
+                for (album_id, name) in result:
+                    albums[album_id] = ModelAlbum(name)
+                result = sql.execute("SELECT album_id, artist_id\
+                                      FROM album_artists ORDER BY rowid")
+                for (album_id, artist_id) in result:
+                    album = albums.get(album_id)
+                    if album is not None:
+                        album.artist_ids += (artist_id,)
+                result = sql.execute("SELECT MAX(rowid) FROM tracks")
+                v = result.fetchone()
+                size = (v[0] or 0) + 1
+                durations = array("l", [self.__NO_DURATION]) * size
+                result = sql.execute("SELECT rowid, duration FROM tracks")
+                for (track_id, duration) in result:
+                    durations[track_id] = duration or 0
+            with self.__lock:
+                # Database changed while loading
+                if generation != self.__generation:
+                    Logger.info("LibraryModel::load(): outdated")
+                    return
+                self.__set_tables(albums, artists, genres, durations)
+            Logger.info("LibraryModel::load(): %s albums, %s artists,"
+                        " %s genres, %s tracks in %.2fs, %.1f MiB",
+                        len(albums), len(artists), len(genres),
+                        len(durations), time() - start,
+                        self.get_memory_size() / 1048576)
+        except Exception as e:
+            Logger.error("LibraryModel::load(): %s", e)
+
+    def clear(self):
+        """
+            Forget all values, bulk database changes
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__set_tables({}, {}, {}, array("l"))
+
+    def get_memory_size(self):
+        """
+            Get an estimation of memory used by model
+            @return bytes as int
+        """
+        size = sys.getsizeof(self.__durations)
+        for names in [self.__artists, self.__genres]:
+            size += sys.getsizeof(names)
+            size += sum(sys.getsizeof(name) for name in names.values())
+        size += sys.getsizeof(self.__albums)
+        for album in self.__albums.values():
+            size += sys.getsizeof(album) + sys.getsizeof(album.name) +\
+                sys.getsizeof(album.artist_ids)
+        return size
+
+    def get_album_name(self, album_id):
+        """
+            Get album name
+            @param album_id as int
+            @return str/None
+        """
+        album = self.__albums.get(album_id)
+        return None if album is None else album.name
+
+    def get_album_artist_ids(self, album_id):
+        """
+            Get album artist ids
+            @param album_id as int
+            @return [int]/None
+        """
+        album = self.__albums.get(album_id)
+        return None if album is None else list(album.artist_ids)
+
+    def get_album_artists(self, album_id):
+        """
+            Get album artist names
+            @param album_id as int
+            @return [str]/None
+        """
+        album = self.__albums.get(album_id)
+        if album is None:
+            return None
+        names = [self.__artists.get(artist_id)
+                 for artist_id in album.artist_ids]
+        return None if None in names else names
+
+    def get_artist_name(self, artist_id):
+        """
+            Get artist name
+            @param artist_id as int
+            @return str/None
+        """
+        return self.__artists.get(artist_id)
+
+    def get_genre_name(self, genre_id):
+        """
+            Get genre name
+            @param genre_id as int
+            @return str/None
+        """
+        return self.__genres.get(genre_id)
+
+    def get_track_duration(self, track_id):
+        """
+            Get track duration
+            @param track_id as int
+            @return int/None
+        """
+        durations = self.__durations
+        if 0 <= track_id < len(durations):
+            duration = durations[track_id]
+            if duration != self.__NO_DURATION:
+                return duration
+        return None
+
+    def set_track_duration(self, track_id, duration):
+        """
+            Update track duration
+            @param track_id as int
+            @param duration as int
+        """
+        with self.__lock:
+            self.__generation += 1
+            durations = self.__durations
+            if 0 <= track_id < len(durations):
+                durations[track_id] = duration or 0
+
+    def remove_album(self, album_id):
+        """
+            Forget album
+            @param album_id as int
+        """
+        self.remove([album_id], [], [], [])
+
+    def remove_artist(self, artist_id):
+        """
+            Forget artist
+            @param artist_id as int
+        """
+        self.remove([], [artist_id], [], [])
+
+    def remove_genre(self, genre_id):
+        """
+            Forget genre
+            @param genre_id as int
+        """
+        self.remove([], [], [genre_id], [])
+
+    def remove_track(self, track_id):
+        """
+            Forget track
+            @param track_id as int
+        """
+        self.remove([], [], [], [track_id])
+
+    def remove(self, album_ids, artist_ids, genre_ids, track_ids):
+        """
+            Forget values, a running load() is discarded
+            @param album_ids as [int]
+            @param artist_ids as [int]
+            @param genre_ids as [int]
+            @param track_ids as [int]
+        """
+        with self.__lock:
+            self.__generation += 1
+            for album_id in album_ids:
+                self.__albums.pop(album_id, None)
+            for artist_id in artist_ids:
+                self.__artists.pop(artist_id, None)
+            for genre_id in genre_ids:
+                self.__genres.pop(genre_id, None)
+            durations = self.__durations
+            for track_id in track_ids:
+                if track_id is not None and 0 <= track_id < len(durations):
+                    durations[track_id] = self.__NO_DURATION
+
+    def on_collection_updated(self, scanner, item, scan_update):
+        """
+            Forget updated items
+            @param scanner as CollectionScanner
+            @param item as CollectionItem
+            @param scan_update as ScanUpdate
+        """
+        self.remove([item.album_id], item.artist_ids, item.genre_ids,
+                    [item.track_id])
+
+#######################
+# PRIVATE             #
+#######################
+    def __set_tables(self, albums, artists, genres, durations):
+        """
+            Set model tables
+            @param albums as {int: ModelAlbum}
+            @param artists as {int: str}
+            @param genres as {int: str}
+            @param durations as array
+        """
+        self.__albums = albums
+        self.__artists = artists
+        self.__genres = genres
+        self.__durations = durations
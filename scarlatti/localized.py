@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from locale import getlocale, strcoll
+from locale import getlocale, strcoll, strxfrm, LC_COLLATE
 from importlib import import_module
 
 # Ugly magic to dynamically adapt to the current locale...
@@ -52,3 +52,29 @@ class LocalizedCollation(object):
             return strcoll(v1, v2)
         else:
             return 1
+
+
+def get_collate_locale():
+    """
+        Get locale used for sort keys
+        @return str
+    """
+    return ".".join([v for v in getlocale(LC_COLLATE) if v]) or "C"
+
+
+def get_sort_key(string):
+    """
+        Get a binary sort key ordering like LocalizedCollation
+        Keys can be compared byte per byte, without calling python
+        @param string as str
+        @return bytes
+    """
+    if string is None:
+        return None
+    parts = []
+    for part in [index_of(string).upper(), string]:
+        # Big endian, fixed width: byte order is code point order
+        parts.append(b"".join([ord(c).to_bytes(3, "big")
+                               for c in strxfrm(part)]))
+    # Separator lower than any encoded char: index compares first
+    return b"\0\0\0".join(parts)
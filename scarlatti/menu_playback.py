@@ -14,7 +14,7 @@ from gi.repository import Gio, GLib
 
 from gettext import gettext as _
 
-from scarlatti.define import App, ViewType, Type, LovedFlags
+from scarlatti.define import App, ViewType, LovedFlags
 from scarlatti.utils_album import tracks_to_albums
 from scarlatti.utils import get_default_storage_type, emit_signal
 from scarlatti.utils import get_network_available
@@ -228,13 +228,7 @@ class PlaylistPlaybackMenu(Gio.Menu):
             @parma playlist_id as int
         """
         if App().playlists.get_smart(playlist_id):
-            request = App().playlists.get_smart_sql(playlist_id)
-            # We need to inject skipped/storage_type
-            storage_type = get_default_storage_type()
-            split = request.split("ORDER BY")
-            split[0] += " AND loved != %s" % Type.NONE
-            split[0] += " AND tracks.storage_type&%s " % storage_type
-            track_ids = App().db.execute("ORDER BY".join(split))
+            track_ids = App().playlists.get_smart_track_ids(playlist_id)
             albums = tracks_to_albums(
                 [Track(track_id) for track_id in track_ids])
         else:
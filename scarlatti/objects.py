@@ -48,6 +48,24 @@ class Base:
             else:
                 return attr_value
 
+    @classmethod
+    def prefetch(cls, objects, fields):
+        """
+            Load fields for many objects at once instead of one query per
+            object and per field
+            @param objects as [Base]
+            @param fields as [str]
+        """
+        objects = [obj for obj in objects
+                   if obj.id is not None and obj.id >= 0]
+        if not objects:
+            return
+        values = objects[0].db.get_fields(set(obj.id for obj in objects),
+                                          fields)
+        for obj in objects:
+            for (field, value) in values.get(obj.id, {}).items():
+                obj._set_prefetched(field, value)
+
     def reset(self, attr):
         """
             Reset attr
@@ -57,6 +75,16 @@ class Base:
         attr_value = getattr(self.db, "get_" + attr)(self.id)
         setattr(self, attr_name, attr_value)
 
+    def _set_prefetched(self, field, value):
+        """
+            Set field value loaded by prefetch(), keep values already set
+            @param field as str
+            @param value as object
+        """
+        attr_name = "_" + field
+        if self.__dict__.get(attr_name) is None:
+            setattr(self, attr_name, value)
+
     def get_popularity(self):
         """
             Get popularity
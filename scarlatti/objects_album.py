@@ -141,7 +141,8 @@ class Album(Base):
         self.__skipped = skipped
         self.__disc_number = None
         self.__original_year = Type.NONE
-        self.__tracks_storage_type = self.storage_type
+        # Loaded on demand, see prefetch()
+        self.__tracks_storage_type = None
         # Use artist ids from db else
         if artist_ids:
             artists = []
@@ -354,6 +355,13 @@ class Album(Base):
             album.set_tracks(self.tracks)
         return album
 
+    def set_artist_filter_ids(self, artist_ids):
+        """
+            Only use tracks from artist ids, does not load artists names
+            @param artist_ids as [int]
+        """
+        self.artist_ids = artist_ids
+
     def set_storage_type(self, storage_type):
         """
             Set storage type
@@ -374,7 +382,8 @@ class Album(Base):
         """
         self.__original_year = None
         tracks = self.tracks
-        disc = Disc(self, 0, self.__tracks_storage_type, self.__skipped)
+        disc = Disc(self, 0, self.__get_tracks_storage_type(),
+                    self.__skipped)
         disc.set_tracks(tracks)
         self.__discs = [disc]
 
@@ -450,6 +459,33 @@ class Album(Base):
         """
         return [track.id for track in self.tracks]
 
+    @property
+    def loaded_track_ids(self):
+        """
+            Get album track ids without loading tracks
+            @return [int]
+        """
+        return [track.id for track in self.__tracks]
+
+    @property
+    def artist_filter_ids(self):
+        """
+            Get artist ids album tracks are filtered on, without loading
+            album artists
+            @return [int]
+        """
+        # Only set by __init__() and set_artist_filter_ids(), lazy loaded
+        # artist ids are stored in _artist_ids
+        return self.__dict__.get("artist_ids", [])
+
+    @property
+    def skipped(self):
+        """
+            True if skipped tracks are allowed
+            @return bool
+        """
+        return self.__skipped
+
     @property
     def track_uris(self):
         """
@@ -491,7 +527,7 @@ class Album(Base):
             disc_numbers = [self.__disc_number]
         for disc_number in disc_numbers:
             disc = Disc(self, disc_number,
-                        self.__tracks_storage_type,
+                        self.__get_tracks_storage_type(),
                         self.__skipped)
             if disc.tracks:
                 discs.append(disc)
@@ -531,9 +567,33 @@ class Album(Base):
             App().cache.set_duration(self.id, album_hash, duration)
         return duration
 
+#######################
+# PROTECTED           #
+#######################
+    def _set_prefetched(self, field, value):
+        """
+            Set field value loaded by prefetch()
+            @param field as str
+            @param value as object
+        """
+        if field == "name":
+            if self.__name is None and self.__disc_number is None:
+                self.__name = value
+        else:
+            Base._set_prefetched(self, field, value)
+
 #######################
 # PRIVATE             #
 #######################
+    def __get_tracks_storage_type(self):
+        """
+            Get storage type used to load tracks
+            @return StorageType
+        """
+        if self.__tracks_storage_type is None:
+            self.__tracks_storage_type = self.storage_type
+        return self.__tracks_storage_type
+
     def __save(self, save):
         """
             Save album to collection.
@@ -119,8 +119,7 @@ class Track(Base):
             Get featuring artist ids
             @return [int]
         """
-        artist_ids = self.db.get_artist_ids(self.id)
-        return list(set(artist_ids) - set(album_artist_ids))
+        return list(set(self.artist_ids) - set(album_artist_ids))
 
     def set_preloaded(self):
         """
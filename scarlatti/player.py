@@ -12,7 +12,10 @@
 
 from gi.repository import GLib, GObject
 
+import json
+import os
 from pickle import load
+from threading import Lock
 from time import time
 
 from scarlatti.player_albums import AlbumsPlayer
@@ -25,7 +28,8 @@ from scarlatti.player_shuffle import ShufflePlayer
 from scarlatti.player_transitions import TransitionsPlayer
 from scarlatti.logger import Logger
 from scarlatti.objects_track import Track
-from scarlatti.define import App, Type, SCARLATTI_DATA_PATH
+from scarlatti.objects_album import Album
+from scarlatti.define import App, Type, StorageType, SCARLATTI_DATA_PATH
 from scarlatti.utils import emit_signal
 
 
@@ -58,6 +62,14 @@ class Player(GObject.GObject, AlbumsPlayer, BinPlayer, AutoRandomPlayer,
         "rate-changed": (GObject.SignalFlags.RUN_FIRST, None, (int, int))
     }
 
+    # Playback state: ids only, albums and tracks are loaded on demand
+    __STATE_PATH = SCARLATTI_DATA_PATH + "/state.json"
+    __STATE_VERSION = 1
+    # Pickled state saved by older versions
+    __LEGACY_STATE = ["track_id", "queue", "Albums", "player", "position"]
+    # Checkpoint state every n seconds while playing
+    __CHECKPOINT = 30
+
     def __init__(self):
         """
             Init player
@@ -72,7 +84,9 @@ class Player(GObject.GObject, AlbumsPlayer, BinPlayer, AutoRandomPlayer,
         ShufflePlayer.__init__(self)
         TransitionsPlayer.__init__(self)
         self.__stop_after_track_id = None
+        self.__state_lock = Lock()
         App().settings.connect("changed::repeat", self.update_next_prev)
+        GLib.timeout_add_seconds(self.__CHECKPOINT, self.__on_checkpoint)
 
     def load(self, track):
         """
@@ -128,47 +142,70 @@ class Player(GObject.GObject, AlbumsPlayer, BinPlayer, AutoRandomPlayer,
             artists = ", ".join(self._current_track.album_artists)
         return artists
 
+    def save_state(self):
+        """
+            Save player state
+        """
+        try:
+            self.__write_state(self.__get_state())
+        except Exception as e:
+            Logger.error("Player::save_state(): %s", e)
+
     def restore_state(self):
         """
             Restore player state
         """
         try:
-            if App().settings.get_value("save-state"):
-                self._current_track = Track(
-                    load(open(SCARLATTI_DATA_PATH + "/track_id.bin", "rb")))
-                self.set_queue(load(open(SCARLATTI_DATA_PATH +
-                                         "/queue.bin", "rb")))
-                albums = load(open(SCARLATTI_DATA_PATH + "/Albums.bin", "rb"))
-                (is_playing, was_party) = load(open(SCARLATTI_DATA_PATH +
-                                                    "/player.bin", "rb"))
-                if self._current_track.uri:
-                    if albums:
-                        if was_party:
-                            # Tips: prevents player from loading albums
-                            self._is_party = True
-                            App().lookup_action("party").change_state(
-                                GLib.Variant("b", True))
-                        self.set_albums(albums)
-                        # Load track from player albums
-                        index = self.album_ids.index(
-                            self._current_track.album.id)
-                        for track in self._albums[index].tracks:
-                            if track.id == self._current_track.id:
-                                self._load_track(track)
-                                break
-
-                    if not App().settings.get_value("startup-track-notif"):
-                        App().notify.nextNotification = False
-
-                    if is_playing:
-                        self.play()
-                    else:
-                        self.pause()
-                    position = load(open(SCARLATTI_DATA_PATH + "/position.bin",
-                                    "rb"))
-                    self.seek(position)
+            if not App().settings.get_value("save-state"):
+                return
+            try:
+                with open(self.__STATE_PATH, "r") as f:
+                    state = json.load(f)
+            except FileNotFoundError:
+                state = self.__migrate_legacy_state()
+                if state is None:
+                    return
+            if state.get("version") != self.__STATE_VERSION:
+                Logger.warning("Player::restore_state(): unknown version")
+                return
+            self._current_track = Track(state["track_id"])
+            self.set_queue(state["queue"])
+            if self._current_track.uri:
+                albums = []
+                for (album_id, genre_ids, artist_ids, skipped, track_ids) in\
+                        state["albums"]:
+                    album = Album(album_id, genre_ids, [], skipped)
+                    if artist_ids:
+                        album.set_artist_filter_ids(artist_ids)
+                    if track_ids:
+                        album.set_tracks([Track(track_id, album)
+                                          for track_id in track_ids], False)
+                    albums.append(album)
+                if albums:
+                    if state["is_party"]:
+                        # Tips: prevents player from loading albums
+                        self._is_party = True
+                        App().lookup_action("party").change_state(
+                            GLib.Variant("b", True))
+                    self.set_albums(albums)
+                    # Load track from player albums
+                    index = self.album_ids.index(
+                        self._current_track.album.id)
+                    for track in self._albums[index].tracks:
+                        if track.id == self._current_track.id:
+                            self._load_track(track)
+                            break
+
+                if not App().settings.get_value("startup-track-notif"):
+                    App().notify.nextNotification = False
+
+                if state["is_playing"]:
+                    self.play()
                 else:
-                    Logger.debug("Player::restore_state(): track missing")
+                    self.pause()
+                self.seek(state["position"])
+            else:
+                Logger.debug("Player::restore_state(): track missing")
         except Exception as e:
             Logger.error("Player::restore_state(): %s" % e)
 
@@ -302,6 +339,98 @@ class Player(GObject.GObject, AlbumsPlayer, BinPlayer, AutoRandomPlayer,
 #######################
 # PRIVATE             #
 #######################
+    def __get_state(self):
+        """
+            Get player state
+            @return dict
+        """
+        if self._current_track.id is None or\
+                self._current_track.storage_type & StorageType.EPHEMERAL:
+            track_id = None
+            albums = []
+            position = 0
+        else:
+            track_id = self._current_track.id
+            # Do not load album tracks, keep loaded ones
+            albums = self.__get_albums_state(self._albums)
+            position = self.position
+        return {"version": self.__STATE_VERSION,
+                "track_id": track_id,
+                "albums": albums,
+                "queue": self.queue,
+                "is_playing": self.is_playing,
+                "is_party": self.is_party,
+                "position": position}
+
+    def __get_albums_state(self, albums):
+        """
+            Get albums state
+            @param albums as [Album]
+            @return [[int, [int], [int], bool, [int]]]
+        """
+        return [[album.id, album.genre_ids, album.artist_filter_ids,
+                 album.skipped, album.loaded_track_ids]
+                for album in albums]
+
+    def __migrate_legacy_state(self):
+        """
+            Convert pickled state to state.json, then remove it
+            @return dict/None
+        """
+        legacy = {}
+        for name in self.__LEGACY_STATE:
+            try:
+                with open("%s/%s.bin" % (SCARLATTI_DATA_PATH, name),
+                          "rb") as f:
+                    legacy[name] = load(f)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                Logger.error("Player::__migrate_legacy_state(): %s", e)
+        if "track_id" not in legacy:
+            return None
+        (is_playing, is_party) = legacy.get("player", [False, False])
+        track_id = legacy["track_id"]
+        albums = legacy.get("Albums", []) if track_id is not None else []
+        state = {"version": self.__STATE_VERSION,
+                 "track_id": track_id,
+                 "albums": self.__get_albums_state(albums),
+                 "queue": legacy.get("queue", []),
+                 "is_playing": is_playing,
+                 "is_party": is_party,
+                 "position": legacy.get("position", 0)}
+        self.__write_state(state)
+        for name in self.__LEGACY_STATE:
+            try:
+                os.remove("%s/%s.bin" % (SCARLATTI_DATA_PATH, name))
+            except FileNotFoundError:
+                pass
+        return state
+
+    def __write_state(self, state):
+        """
+            Write state atomically
+            @param state as dict
+        """
+        tmp_path = self.__STATE_PATH + ".tmp"
+        with self.__state_lock:
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.__STATE_PATH)
+
+    def __on_checkpoint(self):
+        """
+            Save state while playing, write in background
+        """
+        try:
+            if self.is_playing and App().settings.get_value("save-state"):
+                App().task_helper.run(self.__write_state, self.__get_state())
+        except Exception as e:
+            Logger.error("Player::__on_checkpoint(): %s", e)
+        return True
+
     def __scrobble(self, track, finished_start_time):
         """
             Scrobble on lastfm
@@ -20,7 +20,7 @@ from threading import Lock
 import json
 
 from scarlatti.database import Database
-from scarlatti.define import App, Type
+from scarlatti.define import App, Type, SmartDependency
 from scarlatti.objects_track import Track
 from scarlatti.sqlcursor import SqlCursor
 from scarlatti.localized import LocalizedCollation
@@ -54,17 +54,42 @@ class Playlists(GObject.GObject):
                             smart_enabled INT NOT NULL DEFAULT 0,
                             smart_sql TEXT,
                             uri TEXT,
-                            mtime BIGINT NOT NULL)"""
+                            mtime BIGINT NOT NULL,
+                            smart_deps INT NOT NULL DEFAULT 0,
+                            smart_dirty INT NOT NULL DEFAULT 1,
+                            smart_storage INT NOT NULL DEFAULT 0)"""
 
     __create_tracks = """CREATE TABLE tracks (
                         playlist_id INT NOT NULL,
                         uri TEXT NOT NULL)"""
+    # Joined with music.tracks(uri), indexed in music DB
+    __create_tracks_index = """CREATE INDEX idx_tracks_playlist
+                               ON tracks(playlist_id, uri)"""
+
+    # Smart playlists result, refreshed when dirty
+    __create_smart_tracks = """CREATE TABLE smart_tracks (
+                               playlist_id INT NOT NULL,
+                               position INT NOT NULL,
+                               track_id INT NOT NULL)"""
+    __create_smart_tracks_index = """CREATE INDEX idx_smart_tracks
+                                     ON smart_tracks(playlist_id, position)"""
+
+    # Smart SQL columns and matching dependencies
+    __SMART_COLUMNS = {"rate": SmartDependency.RATE,
+                       "popularity": SmartDependency.POPULARITY,
+                       "ltime": SmartDependency.LTIME,
+                       "random()": SmartDependency.RANDOM}
+    # Wait for changes to end before refreshing smart playlists
+    __SMART_REFRESH_DELAY = 2000
 
     def __init__(self):
         """
             Init playlists manager
         """
         self.thread_lock = Lock()
+        self.__smart_lock = Lock()
+        self.__smart_deps = None
+        self.__smart_timeout_id = None
         GObject.GObject.__init__(self)
         upgrade = DatabasePlaylistsUpgrade()
         # Create db schema
@@ -74,6 +99,9 @@ class Playlists(GObject.GObject):
                 with SqlCursor(self, True) as sql:
                     sql.execute(self.__create_playlists)
                     sql.execute(self.__create_tracks)
+                    sql.execute(self.__create_tracks_index)
+                    sql.execute(self.__create_smart_tracks)
+                    sql.execute(self.__create_smart_tracks_index)
                     sql.execute("PRAGMA user_version=%s" % upgrade.version)
             except:
                 pass
@@ -158,6 +186,10 @@ class Playlists(GObject.GObject):
             sql.execute("DELETE FROM tracks\
                         WHERE playlist_id=?",
                         (playlist_id,))
+            sql.execute("DELETE FROM smart_tracks\
+                        WHERE playlist_id=?",
+                        (playlist_id,))
+        self.__smart_deps = None
         emit_signal(self, "playlists-removed", playlist_id)
         App().art.remove_from_cache("playlist_" + name, "ROUNDED")
 
@@ -178,12 +210,7 @@ class Playlists(GObject.GObject):
             @param uri as str
             @param signal as bool
         """
-        if self.exists_track(playlist_id, uri):
-            return
-        with SqlCursor(self, True) as sql:
-            sql.execute("INSERT INTO tracks VALUES (?, ?)", (playlist_id, uri))
-        if signal:
-            emit_signal(self, "playlist-track-added", playlist_id, uri)
+        self.__add_uris(playlist_id, [uri], signal)
 
     def add_uris(self, playlist_id, uris, signal=False):
         """
@@ -192,8 +219,7 @@ class Playlists(GObject.GObject):
             @param uris as [str]
             @param signal as bool
         """
-        for uri in uris:
-            self.add_uri(playlist_id, uri, signal)
+        self.__add_uris(playlist_id, uris, signal)
         self.sync_to_disk(playlist_id)
 
     def add_tracks(self, playlist_id, tracks, signal=False):
@@ -203,9 +229,7 @@ class Playlists(GObject.GObject):
             @param tracks as [Track]
             @param signal as bool
         """
-        for track in tracks:
-            self.add_uri(playlist_id, track.uri, signal)
-        self.sync_to_disk(playlist_id)
+        self.add_uris(playlist_id, [track.uri for track in tracks], signal)
 
     def remove_uri(self, playlist_id, uri, signal=False):
         """
@@ -214,13 +238,7 @@ class Playlists(GObject.GObject):
             @param uri a str
             @param signal as bool
         """
-        if not self.exists_track(playlist_id, uri):
-            return
-        with SqlCursor(self, True) as sql:
-            sql.execute("DELETE FROM tracks WHERE uri=? AND playlist_id=?",
-                        (uri, playlist_id))
-        if signal:
-            emit_signal(self, "playlist-track-removed", playlist_id, uri)
+        self.__remove_uris(playlist_id, [uri], signal)
 
     def remove_uris(self, playlist_id, uris, signal=False):
         """
@@ -229,8 +247,7 @@ class Playlists(GObject.GObject):
             @param uris as [str]
             @param signal as bool
         """
-        for uri in uris:
-            self.remove_uri(playlist_id, uri, signal)
+        self.__remove_uris(playlist_id, uris, signal)
         self.sync_to_disk(playlist_id)
 
     def remove_tracks(self, playlist_id, tracks, signal=False):
@@ -240,9 +257,7 @@ class Playlists(GObject.GObject):
             @param tracks as [Track]
             @param signal as bool
         """
-        for track in tracks:
-            self.remove_uri(playlist_id, track.uri, signal)
-        self.sync_to_disk(playlist_id)
+        self.remove_uris(playlist_id, [track.uri for track in tracks], signal)
 
     def get(self):
         """
@@ -277,23 +292,63 @@ class Playlists(GObject.GObject):
         with SqlCursor(self) as sql:
             result = sql.execute("SELECT uri\
                                   FROM tracks\
-                                  WHERE playlist_id=?", (playlist_id,))
+                                  WHERE playlist_id=?\
+                                  ORDER BY rowid", (playlist_id,))
             return list(itertools.chain(*result))
 
     def get_smart_track_uris(self, playlist_id):
         """
-            Return available track uris for playlist
+            Return available track uris for smart playlist
             @param playlist_id as int
             @return [str]
+            @thread safe
         """
-        request = self.get_smart_sql(playlist_id)
-        # We need to inject skipped/storage_type
-        storage_type = get_default_storage_type()
-        split = request.split("ORDER BY")
-        split[0] += " AND tracks.loved != %s" % Type.NONE
-        split[0] += " AND tracks.storage_type&%s " % storage_type
-        track_ids = App().db.execute("ORDER BY".join(split))
-        return [Track(track_id).uri for track_id in track_ids]
+        self.__update_smart(playlist_id)
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT music.tracks.uri\
+                                  FROM smart_tracks, music.tracks\
+                                  WHERE smart_tracks.playlist_id=?\
+                                  AND music.tracks.rowid=\
+                                  smart_tracks.track_id\
+                                  ORDER BY smart_tracks.position",
+                                 (playlist_id,))
+            uris = list(itertools.chain(*result))
+        self.__on_smart_read(playlist_id)
+        return uris
+
+    def get_smart_track_ids(self, playlist_id):
+        """
+            Return available track ids for smart playlist
+            @param playlist_id as int
+            @return [int]
+            @thread safe
+        """
+        self.__update_smart(playlist_id)
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT track_id\
+                                  FROM smart_tracks\
+                                  WHERE playlist_id=?\
+                                  ORDER BY position",
+                                 (playlist_id,))
+            track_ids = list(itertools.chain(*result))
+        self.__on_smart_read(playlist_id)
+        return track_ids
+
+    def set_smart_dirty(self, dependencies):
+        """
+            Mark smart playlists depending on dependencies as dirty,
+            they are refreshed in background
+            @param dependencies as SmartDependency
+            @thread safe
+        """
+        if not self.__get_smart_dependencies() & dependencies:
+            return
+        with SqlCursor(self, True) as sql:
+            sql.execute("UPDATE playlists\
+                         SET smart_dirty=smart_dirty+1\
+                         WHERE smart_enabled AND smart_deps&?",
+                        (dependencies,))
+        self.__queue_smart_refresh()
 
     def get_track_ids(self, playlist_id):
         """
@@ -330,7 +385,8 @@ class Playlists(GObject.GObject):
                                       FROM tracks, music.tracks\
                                       WHERE tracks.playlist_id=?\
                                       AND music.tracks.uri=\
-                                      main.tracks.uri",
+                                      main.tracks.uri\
+                                      ORDER BY main.tracks.rowid",
                                      (playlist_id,))
                 track_ids = list(itertools.chain(*result))
         return track_ids
@@ -518,9 +574,10 @@ class Playlists(GObject.GObject):
         """
         with SqlCursor(self, True) as sql:
             sql.execute("UPDATE playlists\
-                        SET smart_enabled=?\
+                        SET smart_enabled=?, smart_dirty=smart_dirty+1\
                         WHERE rowid=?",
                         (smart, playlist_id))
+            self.__smart_deps = None
             emit_signal(self, "playlists-updated", playlist_id)
 
     def set_smart_sql(self, playlist_id, request):
@@ -534,9 +591,10 @@ class Playlists(GObject.GObject):
         App().art.remove_from_cache("playlist_" + name, "ROUNDED")
         with SqlCursor(self, True) as sql:
             sql.execute("UPDATE playlists\
-                        SET smart_sql=?\
+                        SET smart_sql=?, smart_dirty=smart_dirty+1\
                         WHERE rowid=?",
                         (request, playlist_id))
+            self.__smart_deps = None
             emit_signal(self, "playlists-updated", playlist_id)
 
     def get_position(self, playlist_id, track_id):
@@ -699,7 +757,8 @@ class Playlists(GObject.GObject):
             Return a new sqlite cursor
         """
         try:
-            sql = sqlite3.connect(self._DB_PATH, 600.0)
+            sql = sqlite3.connect(self._DB_PATH, 600.0,
+                                  cached_statements=256)
             sql.execute('ATTACH DATABASE "%s" AS music' % Database.DB_PATH)
             sql.create_collation("LOCALIZED", LocalizedCollation())
             return sql
@@ -709,6 +768,172 @@ class Playlists(GObject.GObject):
 #######################
 # PRIVATE             #
 #######################
+    def __add_uris(self, playlist_id, uris, signal):
+        """
+            Add uris missing from playlist in one transaction
+            @param playlist_id as int
+            @param uris as [str]
+            @param signal as bool
+        """
+        with SqlCursor(self, True) as sql:
+            added = []
+            for uri in dict.fromkeys(uris):
+                result = sql.execute("SELECT 1\
+                                      FROM tracks\
+                                      WHERE playlist_id=?\
+                                      AND uri=?", (playlist_id, uri))
+                if result.fetchone() is None:
+                    added.append(uri)
+            sql.executemany("INSERT INTO tracks VALUES (?, ?)",
+                            [(playlist_id, uri) for uri in added])
+        if signal:
+            for uri in added:
+                emit_signal(self, "playlist-track-added", playlist_id, uri)
+
+    def __remove_uris(self, playlist_id, uris, signal):
+        """
+            Remove uris from playlist in one transaction
+            @param playlist_id as int
+            @param uris as [str]
+            @param signal as bool
+        """
+        with SqlCursor(self, True) as sql:
+            removed = []
+            for uri in dict.fromkeys(uris):
+                result = sql.execute("SELECT 1\
+                                      FROM tracks\
+                                      WHERE playlist_id=?\
+                                      AND uri=?", (playlist_id, uri))
+                if result.fetchone() is not None:
+                    removed.append(uri)
+            sql.executemany("DELETE FROM tracks\
+                             WHERE playlist_id=? AND uri=?",
+                            [(playlist_id, uri) for uri in removed])
+        if signal:
+            for uri in removed:
+                emit_signal(self, "playlist-track-removed", playlist_id, uri)
+
+    def __get_smart_dependencies(self):
+        """
+            Get dependencies of all smart playlists
+            @return SmartDependency
+        """
+        if self.__smart_deps is None:
+            dependencies = SmartDependency.NONE
+            with SqlCursor(self) as sql:
+                result = sql.execute("SELECT smart_deps\
+                                      FROM playlists\
+                                      WHERE smart_enabled")
+                for (smart_deps,) in result:
+                    dependencies |= smart_deps
+            self.__smart_deps = dependencies
+        return self.__smart_deps
+
+    def __update_smart(self, playlist_id):
+        """
+            Refresh smart playlist result if dirty
+            @param playlist_id as int
+        """
+        storage_type = get_default_storage_type()
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT smart_dirty, smart_storage\
+                                  FROM playlists\
+                                  WHERE rowid=?", (playlist_id,))
+            v = result.fetchone()
+        if v is not None and (v[0] or v[1] != storage_type):
+            self.__refresh_smart(playlist_id, storage_type)
+
+    def __refresh_smart(self, playlist_id, storage_type):
+        """
+            Run smart playlist request and save result
+            @param playlist_id as int
+            @param storage_type as StorageType
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT smart_sql, smart_dirty\
+                                  FROM playlists\
+                                  WHERE rowid=?", (playlist_id,))
+            v = result.fetchone()
+        if v is None:
+            return
+        (request, dirty) = v
+        track_ids = []
+        dependencies = SmartDependency.NONE
+        if request:
+            dependencies = SmartDependency.COLLECTION | SmartDependency.LOVED
+            for (column, dependency) in self.__SMART_COLUMNS.items():
+                if request.find(column) != -1:
+                    dependencies |= dependency
+            # We need to inject skipped/storage_type
+            split = request.split("ORDER BY")
+            split[0] += " AND tracks.loved != %s" % Type.NONE
+            split[0] += " AND tracks.storage_type&%s " % storage_type
+            track_ids = App().db.execute("ORDER BY".join(split))
+        with SqlCursor(self, True) as sql:
+            sql.execute("DELETE FROM smart_tracks WHERE playlist_id=?",
+                        (playlist_id,))
+            sql.executemany("INSERT INTO smart_tracks VALUES (?, ?, ?)",
+                            [(playlist_id, position, track_id)
+                             for (position, track_id) in enumerate(track_ids)])
+            # Still dirty if marked while running request
+            sql.execute("UPDATE playlists\
+                         SET smart_deps=?, smart_storage=?,\
+                         smart_dirty=CASE WHEN smart_dirty=? THEN 0\
+                         ELSE smart_dirty END\
+                         WHERE rowid=?",
+                        (dependencies, storage_type, dirty, playlist_id))
+        self.__smart_deps = None
+
+    def __refresh_dirty_smart(self):
+        """
+            Refresh all dirty smart playlists
+        """
+        try:
+            with SqlCursor(self) as sql:
+                result = sql.execute("SELECT rowid\
+                                      FROM playlists\
+                                      WHERE smart_enabled AND smart_dirty")
+                playlist_ids = list(itertools.chain(*result))
+            storage_type = get_default_storage_type()
+            for playlist_id in playlist_ids:
+                self.__refresh_smart(playlist_id, storage_type)
+            Logger.debug("Playlists::__refresh_dirty_smart(): %s",
+                         playlist_ids)
+        except Exception as e:
+            Logger.error("Playlists::__refresh_dirty_smart(): %s", e)
+
+    def __queue_smart_refresh(self):
+        """
+            Refresh dirty smart playlists in background, when changes end
+        """
+        with self.__smart_lock:
+            if self.__smart_timeout_id is not None:
+                GLib.source_remove(self.__smart_timeout_id)
+            self.__smart_timeout_id = GLib.timeout_add(
+                self.__SMART_REFRESH_DELAY, self.__on_smart_timeout)
+
+    def __on_smart_read(self, playlist_id):
+        """
+            Random smart playlists get a new result for next read
+            @param playlist_id as int
+        """
+        with SqlCursor(self, True) as sql:
+            result = sql.execute("UPDATE playlists\
+                                  SET smart_dirty=smart_dirty+1\
+                                  WHERE rowid=? AND smart_deps&?",
+                                 (playlist_id, SmartDependency.RANDOM))
+            if result.rowcount == 0:
+                return
+        self.__queue_smart_refresh()
+
+    def __on_smart_timeout(self):
+        """
+            Refresh dirty smart playlists
+        """
+        with self.__smart_lock:
+            self.__smart_timeout_id = None
+        App().task_helper.run(self.__refresh_dirty_smart)
+
     def __on_parse_finished(self, parser, result, playlist_id, uris):
         """
             Add tracks to playlists
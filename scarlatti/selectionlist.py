@@ -12,7 +12,7 @@
 
 from gi.repository import Gtk, Gdk, GLib, GObject, Pango
 
-from locale import strcoll
+from bisect import bisect_right, bisect_left
 
 from scarlatti.view_lazyloading import LazyLoadingView
 from scarlatti.helper_gestures import GesturesHelper
@@ -23,6 +23,7 @@ from scarlatti.shown import ShownLists
 from scarlatti.logger import Logger
 from scarlatti.utils import get_icon_name, on_query_tooltip, popup_widget
 from scarlatti.utils import emit_signal
+from scarlatti.localized import get_sort_key
 
 
 class SelectionListRow(Gtk.ListBoxRow):
@@ -259,6 +260,14 @@ class SelectionList(LazyLoadingView, GesturesHelper):
         """
         LazyLoadingView.__init__(self, StorageType.ALL, ViewType.DEFAULT)
         self.__selection_pending_ids = []
+        # Rows by id, sort keys in rows order
+        self.__rows = {}
+        self.__sort_keys = []
+        self.__row_keys = {}
+        # Changes applied on idle: {id: value, None to remove}
+        self.__pending = {}
+        self.__pending_id = None
+        self.__populating = False
         self.__base_mask = base_mask
         self.__mask = SelectionListMask.NONE
         self.__animation_timeout_id = None
@@ -329,11 +338,11 @@ class SelectionList(LazyLoadingView, GesturesHelper):
     def populate(self, values):
         """
             Populate view with values
-            @param [(int, str, optional str)], will be deleted
+            @param [(int, str, optional str)]
         """
-        self._box.set_sort_func(None)
         self.__scrolled.get_vadjustment().set_value(0)
         self.clear()
+        self.__populating = True
         LazyLoadingView.populate(self, values)
 
     def remove_value(self, object_id):
@@ -341,24 +350,14 @@ class SelectionList(LazyLoadingView, GesturesHelper):
             Remove id from list
             @param object_id as int
         """
-        for child in self._box.get_children():
-            if child.id == object_id:
-                child.destroy()
-                break
+        self.__queue_update(object_id, None)
 
     def add_value(self, value):
         """
             Add item to list
             @param value as (int, str, optional str)
         """
-        self._box.set_sort_func(self.__sort_func)
-        ids = [row.id for row in self._box.get_children()]
-        if value[0] not in ids:
-            child = self._get_child(value)
-            child.populate()
-            if self.mask & SelectionListMask.ARTISTS:
-                self.__fastscroll.clear()
-                self.__fastscroll.populate()
+        self.__queue_update(value[0], value)
 
     def update_value(self, object_id, name):
         """
@@ -366,35 +365,24 @@ class SelectionList(LazyLoadingView, GesturesHelper):
             @param object_id as int
             @param name as str
         """
-        found = False
-        for child in self._box.get_children():
-            if child.id == object_id:
-                child.set_label(name)
-                found = True
-                break
-        if not found:
-            if self.__base_mask & SelectionListMask.FASTSCROLL:
-                self.__fastscroll.clear()
+        row = self.__rows.get(object_id)
+        if row is None:
             self.add_value((object_id, name, name))
+        else:
+            row.set_label(name)
 
     def update_values(self, values):
         """
             Update view with values
             @param [(int, str, optional str)]
         """
-        if self.mask & SelectionListMask.FASTSCROLL:
-            self.__fastscroll.clear()
-        # Remove not found items
         value_ids = set([v[0] for v in values])
-        for child in self._box.get_children():
-            if child.id not in value_ids:
-                self.remove_value(child.id)
-        # Add items which are not already in the list
-        item_ids = set([child.id for child in self._box.get_children()])
+        for object_id in list(self.__rows.keys()):
+            if object_id not in value_ids:
+                self.__remove_row(object_id)
         for value in values:
-            if not value[0] in item_ids:
-                row = self._get_child(value)
-                row.populate()
+            if value[0] not in self.__rows:
+                self.__add_row(value).populate()
         if self.mask & SelectionListMask.ARTISTS:
             self.__fastscroll.populate()
 
@@ -405,10 +393,9 @@ class SelectionList(LazyLoadingView, GesturesHelper):
             @param activate as bool
         """
         if ids:
-            rows = []
-            for row in self._box.get_children():
-                if row.id in ids:
-                    rows.append(row)
+            rows = [self.__rows[rowid]
+                    for rowid in ids if rowid in self.__rows]
+            rows.sort(key=lambda row: row.get_index())
             if rows:
                 self._box.unselect_all()
                 for row in rows:
@@ -425,6 +412,13 @@ class SelectionList(LazyLoadingView, GesturesHelper):
         self.stop()
         for child in self._box.get_children():
             child.destroy()
+        self.__rows = {}
+        self.__sort_keys = []
+        self.__row_keys = {}
+        self.__pending = {}
+        if self.__pending_id is not None:
+            GLib.source_remove(self.__pending_id)
+            self.__pending_id = None
         if self.__base_mask & SelectionListMask.FASTSCROLL:
             self.__fastscroll.clear()
             self.__fastscroll.clear_chars()
@@ -512,7 +506,7 @@ class SelectionList(LazyLoadingView, GesturesHelper):
             Get items count in list
             @return int
         """
-        return len(self._box.get_children())
+        return len(self.__rows)
 
     @property
     def selected_ids(self):
@@ -548,15 +542,7 @@ class SelectionList(LazyLoadingView, GesturesHelper):
             @param value as [(int, str, optional str)]
             @return row as SelectionListRow
         """
-        (rowid, name, sortname) = value
-        if rowid > 0 and self.mask & SelectionListMask.ARTISTS:
-            used = sortname if sortname else name
-            self.__fastscroll.add_char(used[0])
-        row = SelectionListRow(rowid, name, sortname,
-                               self.mask, self.__height)
-        row.show()
-        self._box.add(row)
-        return row
+        return self.__add_row(value)
 
     def _scroll_to_child(self, row):
         """
@@ -611,33 +597,84 @@ class SelectionList(LazyLoadingView, GesturesHelper):
         for row in self._box.get_children():
             row.set_mask(mask)
 
-    def __sort_func(self, row_a, row_b):
-        """
-            Sort rows
-            @param row_a as SelectionListRow
-            @param row_b as SelectionListRow
-        """
-        a_index = row_a.id
-        b_index = row_b.id
-
-        # Static vs static
-        if a_index < 0 and b_index < 0:
-            return a_index < b_index
-        # Static entries always on top
-        elif b_index < 0:
-            return True
-        # Static entries always on top
-        if a_index < 0:
-            return False
-        # String comparaison for non static
+    def __get_sort_key(self, rowid, name, sortname):
+        """
+            Get row sort key: static entries on top, by type, then names
+            @param rowid as int
+            @param name as str
+            @param sortname as str
+            @return (int, bytes, int)
+        """
+        if rowid < 0:
+            return (0, b"", -rowid)
+        if self.mask & SelectionListMask.ARTISTS and sortname:
+            name = sortname
+        return (1, get_sort_key(name or ""), rowid)
+
+    def __add_row(self, value):
+        """
+            Add a row for value at its sorted position
+            @param value as [(int, str, optional str)]
+            @return row as SelectionListRow
+        """
+        (rowid, name, sortname) = value
+        if rowid > 0 and self.mask & SelectionListMask.ARTISTS:
+            used = sortname if sortname else name
+            self.__fastscroll.add_char(used[0])
+        row = SelectionListRow(rowid, name, sortname,
+                               self.mask, self.__height)
+        row.show()
+        key = self.__get_sort_key(rowid, name, sortname)
+        # Values are usually sorted by database, append
+        if not self.__sort_keys or key > self.__sort_keys[-1]:
+            self.__sort_keys.append(key)
+            self._box.add(row)
         else:
-            if self.mask & SelectionListMask.ARTISTS:
-                a = row_a.sortname
-                b = row_b.sortname
-            else:
-                a = row_a.name
-                b = row_b.name
-            return strcoll(a, b)
+            position = bisect_right(self.__sort_keys, key)
+            self.__sort_keys.insert(position, key)
+            self._box.insert(row, position)
+        self.__rows[rowid] = row
+        self.__row_keys[rowid] = key
+        return row
+
+    def __remove_row(self, rowid):
+        """
+            Remove row for id
+            @param rowid as int
+        """
+        row = self.__rows.pop(rowid, None)
+        if row is None:
+            return
+        key = self.__row_keys.pop(rowid)
+        position = bisect_left(self.__sort_keys, key)
+        if position < len(self.__sort_keys) and\
+                self.__sort_keys[position] == key:
+            del self.__sort_keys[position]
+        row.destroy()
+
+    def __queue_update(self, rowid, value):
+        """
+            Add or remove row on idle, many updates are applied at once
+            @param rowid as int
+            @param value as [(int, str, optional str)]/None
+        """
+        self.__pending[rowid] = value
+        if self.__pending_id is None and not self.__populating:
+            self.__pending_id = GLib.idle_add(self.__apply_pending)
+
+    def __apply_pending(self):
+        """
+            Apply queued updates
+        """
+        self.__pending_id = None
+        (pending, self.__pending) = (self.__pending, {})
+        for (rowid, value) in pending.items():
+            if value is None:
+                self.__remove_row(rowid)
+            elif rowid not in self.__rows:
+                self.__add_row(value).populate()
+        if self.mask & SelectionListMask.ARTISTS:
+            self.__fastscroll.populate()
 
     def __popup_menu(self, y=None, relative=None):
         """
@@ -698,6 +735,9 @@ class SelectionList(LazyLoadingView, GesturesHelper):
             Update fastscroll
             @param selectionlist as SelectionList
         """
+        self.__populating = False
+        if self.__pending and self.__pending_id is None:
+            self.__pending_id = GLib.idle_add(self.__apply_pending)
         if self.mask & SelectionListMask.ARTISTS:
             self.__fastscroll.populate()
         # Scroll to first selected item
@@ -11,7 +11,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from threading import current_thread
+from threading import current_thread, main_thread, local
+from time import time, perf_counter
 
 from scarlatti.define import App
 
@@ -19,13 +20,27 @@ from scarlatti.define import App
 class SqlCursor:
     """
         Context manager to get the SQL cursor
+        Connections are pooled per thread and per database: sqlite
+        connections can't be shared between threads and reusing them keeps
+        collations, functions and statement cache
+        Without commit and thread cursor, a read only connection is used if
+        database supports it (get_read_cursor())
     """
+
+    # Max idle connections per thread and per database
+    __POOL_SIZE = 4
+    # Max connection lifetime in seconds
+    __POOL_LIFETIME = 600
+    __pool = local()
+    # Main thread read queries: [count, total time, max time]
+    __reads = [0, 0, 0]
+
     def add(obj):
         """
             Add cursor to thread list
         """
         name = current_thread().getName() + obj.__class__.__name__
-        App().cursors[name] = obj.get_cursor()
+        App().cursors[name] = SqlCursor.__get(obj, False)
 
     def remove(obj):
         """
@@ -36,7 +51,7 @@ class SqlCursor:
             obj.thread_lock.acquire()
             App().cursors[name].commit()
             obj.thread_lock.release()
-            App().cursors[name].close()
+            SqlCursor.__put(obj, App().cursors[name], False)
             del App().cursors[name]
 
     def commit(obj):
@@ -58,6 +73,8 @@ class SqlCursor:
         self.__obj = obj
         self.__commit = commit
         self.__cursor = None
+        self.__readonly = False
+        self.__start_time = 0
 
     def __enter__(self):
         """
@@ -68,7 +85,11 @@ class SqlCursor:
             cursor = App().cursors[name]
             return cursor
         else:
-            self.__cursor = self.__obj.get_cursor()
+            self.__readonly = not self.__commit and\
+                hasattr(self.__obj, "get_read_cursor")
+            if self.__readonly and current_thread() is main_thread():
+                self.__start_time = perf_counter()
+            self.__cursor = SqlCursor.__get(self.__obj, self.__readonly)
             return self.__cursor
 
     def __exit__(self, type, value, traceback):
@@ -80,5 +101,108 @@ class SqlCursor:
                 self.__obj.thread_lock.acquire()
                 self.__cursor.commit()
                 self.__obj.thread_lock.release()
-            self.__cursor.close()
+            SqlCursor.__put(self.__obj, self.__cursor, self.__readonly)
+            if self.__start_time:
+                elapsed = perf_counter() - self.__start_time
+                SqlCursor.__reads[0] += 1
+                SqlCursor.__reads[1] += elapsed
+                SqlCursor.__reads[2] = max(SqlCursor.__reads[2], elapsed)
+                self.__start_time = 0
         self.__cursor = None
+
+    def reset_read_stats():
+        """
+            Reset main thread read queries stats
+        """
+        SqlCursor.__reads = [0, 0, 0]
+
+    def get_read_stats():
+        """
+            Get main thread read queries stats
+            @return (count as int, average as float, max as float) in seconds
+        """
+        (count, total, maximum) = SqlCursor.__reads
+        return (count, total / max(count, 1), maximum)
+
+    def clear():
+        """
+            Close pooled connections for current thread
+        """
+        pool = SqlCursor.__get_pool()
+        for connections in pool.connections.values():
+            for connection in connections:
+                connection.close()
+        pool.connections.clear()
+        pool.ctimes.clear()
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_pool():
+        """
+            Get current thread pool
+            @return threading.local
+        """
+        pool = SqlCursor.__pool
+        if not hasattr(pool, "connections"):
+            # Class name => [sqlite3.Connection]
+            pool.connections = {}
+            # id(sqlite3.Connection) => creation time
+            pool.ctimes = {}
+        return pool
+
+    def __get_key(obj, readonly):
+        """
+            Get pool key for obj
+            @param obj as Database/Playlists/Radios
+            @param readonly as bool
+            @return str
+        """
+        if readonly:
+            return obj.__class__.__name__ + ":ro"
+        return obj.__class__.__name__
+
+    def __get(obj, readonly):
+        """
+            Get a connection from current thread pool or a new one
+            @param obj as Database/Playlists/Radios
+            @param readonly as bool
+            @return sqlite3.Connection
+        """
+        pool = SqlCursor.__get_pool()
+        connections = pool.connections.setdefault(
+            SqlCursor.__get_key(obj, readonly), [])
+        while connections:
+            connection = connections.pop()
+            if time() - pool.ctimes[id(connection)] < \
+                    SqlCursor.__POOL_LIFETIME:
+                return connection
+            del pool.ctimes[id(connection)]
+            connection.close()
+        if readonly:
+            connection = obj.get_read_cursor()
+        else:
+            connection = obj.get_cursor()
+        pool.ctimes[id(connection)] = time()
+        return connection
+
+    def __put(obj, connection, readonly):
+        """
+            Give back connection to current thread pool
+            Uncommitted changes are dropped, like on close()
+            @param obj as Database/Playlists/Radios
+            @param connection as sqlite3.Connection
+            @param readonly as bool
+        """
+        pool = SqlCursor.__get_pool()
+        connections = pool.connections.setdefault(
+            SqlCursor.__get_key(obj, readonly), [])
+        if connection.in_transaction:
+            connection.rollback()
+        ctime = pool.ctimes.get(id(connection), 0)
+        if len(connections) < SqlCursor.__POOL_SIZE and\
+                time() - ctime < SqlCursor.__POOL_LIFETIME:
+            connections.append(connection)
+        else:
+            pool.ctimes.pop(id(connection), None)
+            connection.close()
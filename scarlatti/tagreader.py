@@ -13,6 +13,7 @@
 from gi.repository import Gst, GstPbutils, GLib, Gio
 
 from re import match
+from time import perf_counter
 from gettext import gettext as _
 
 from scarlatti.define import App
@@ -21,30 +22,87 @@ from scarlatti.utils_file import decodeUnicode, splitUnicode
 from scarlatti.utils import format_artist_name, get_iso_date_from_string
 from scarlatti.tag_frame_text import FrameTextTag
 from scarlatti.tag_frame_lang import FrameLangTag
+from scarlatti.tagreader_native import NativeTagReader, NativeInfo
+from scarlatti.tagreader_native import UnsupportedFile
 
 
 class Discoverer:
     """
         Discover tags
+        With native, common files are read without GStreamer
     """
 
-    def __init__(self):
+    def __init__(self, native=False, check=False):
         """
             Init tag reader
+            @param native as bool: try native reader first
+            @param check as bool: compare native reader with GStreamer
         """
 
         self._discoverer = GstPbutils.Discoverer.new(10 * Gst.SECOND)
+        self.__native = NativeTagReader() if native else None
+        self.__check = native and check
+        # Reads count and time spent per reader
+        self.__stats = {"native": [0, 0.0],
+                        "gstreamer": [0, 0.0],
+                        "fallback": [0, 0.0]}
 
     def get_info(self, uri):
         """
             Return information for file at uri
             @param uri as str
             @Exception GLib.Error
+            @return GstPbutils.DiscovererInfo/NativeInfo
+        """
+        if self.__native is not None:
+            start = perf_counter()
+            try:
+                info = self.__native.get_info(uri)
+                self.__add_stat("native", start)
+                return info
+            except UnsupportedFile:
+                self.__add_stat("fallback", start)
+        return self.get_gst_info(uri)
+
+    def get_gst_info(self, uri):
+        """
+            Return information for file at uri using GStreamer
+            @param uri as str
+            @Exception GLib.Error
             @return GstPbutils.DiscovererInfo
         """
+        start = perf_counter()
         info = self._discoverer.discover_uri(uri)
+        self.__add_stat("gstreamer", start)
         return info
 
+    def get_stats(self):
+        """
+            Get reads count and time spent per reader
+            @return {str: (int, float)}
+        """
+        return {key: tuple(value) for (key, value) in self.__stats.items()}
+
+    @property
+    def check(self):
+        """
+            True if native reader should be checked against GStreamer
+            @return bool
+        """
+        return self.__check
+
+#######################
+# PRIVATE             #
+#######################
+    def __add_stat(self, key, start):
+        """
+            Count a read
+            @param key as str
+            @param start as float
+        """
+        self.__stats[key][0] += 1
+        self.__stats[key][1] += perf_counter() - start
+
 
 class TagReader:
     """
@@ -59,6 +117,13 @@ class TagReader:
                 "album", "genre", "lyrics", "publisher"]
     __INT = ["album-disc-number", "track-number"]
     __DOUBLE = ["beats-per-minute"]
+    # read_tags() result fields
+    FIELDS = ["name", "duration", "title", "artists", "genres",
+              "a_sortnames", "aa_sortnames", "album_artists", "album_name",
+              "discname", "discnumber", "year", "timestamp",
+              "original_year", "original_timestamp", "mb_album_id",
+              "mb_track_id", "mb_artist_id", "mb_album_artist_id",
+              "tracknumber", "popm", "bpm", "compilation"]
 
     def __init__(self):
         """
@@ -66,6 +131,39 @@ class TagReader:
         """
         pass
 
+    def read_tags(self, discoverer, uri, disable_compilations,
+                  advanced_artist_tags):
+        """
+            Read tags for uri, does not access database
+            Safe to call from a worker process
+            @param discoverer as Discoverer
+            @param uri as str
+            @param disable_compilations as bool
+            @param advanced_artist_tags as bool
+            @return (name, duration, title, artists, genres, a_sortnames,
+                     aa_sortnames, album_artists, album_name, discname,
+                     discnumber, year, timestamp, original_year,
+                     original_timestamp, mb_album_id, mb_track_id,
+                     mb_artist_id, mb_album_artist_id, tracknumber,
+                     popm, bpm, compilation)
+        """
+        info = discoverer.get_info(uri)
+        values = self.__read_info(info, uri, disable_compilations,
+                                  advanced_artist_tags)
+        if discoverer.check and isinstance(info, NativeInfo):
+            gst_info = discoverer.get_gst_info(uri)
+            gst_values = self.__read_info(gst_info, uri,
+                                          disable_compilations,
+                                          advanced_artist_tags)
+            for (field, value, gst_value) in zip(self.FIELDS,
+                                                 values, gst_values):
+                if value != gst_value:
+                    Logger.warning("TagReader::read_tags(): %s: %s, "
+                                   "native %r != GStreamer %r",
+                                   uri, field, value, gst_value)
+            values = gst_values
+        return values
+
     def get_title(self, tags, filepath):
         """
             Return title for tags
@@ -595,10 +693,10 @@ class TagReader:
         if album_id is not None:
             current_storage_type = App().albums.get_storage_type(album_id)
             if current_storage_type != storage_type:
+                # Do not clean artists, they may not be linked to tracks yet
                 App().tracks.remove_album(album_id)
-                App().tracks.clean(False)
-                App().albums.clean(False)
-                App().artists.clean(False)
+                App().tracks.clean()
+                App().albums.clean()
                 album_id = None
         if album_id is None:
             added = True
@@ -613,6 +711,72 @@ class TagReader:
 #######################
 # PRIVATE             #
 #######################
+    def __read_info(self, info, uri, disable_compilations,
+                    advanced_artist_tags):
+        """
+            Read tags from info
+            @param info as GstPbutils.DiscovererInfo/NativeInfo
+            @param uri as str
+            @param disable_compilations as bool
+            @param advanced_artist_tags as bool
+            @return see read_tags()
+        """
+        f = Gio.File.new_for_uri(uri)
+        tags = info.get_tags()
+        name = f.get_basename()
+        duration = int(info.get_duration() / 1000000)
+        title = self.get_title(tags, name)
+        version = self.get_version(tags)
+        if version != "":
+            title += " (%s)" % version
+        artists = self.get_artists(tags)
+        a_sortnames = self.get_artist_sortnames(tags)
+        aa_sortnames = self.get_album_artist_sortnames(tags)
+        album_artists = self.get_album_artists(tags)
+        album_name = self.get_album_name(tags)
+        mb_album_id = self.get_mb_album_id(tags)
+        mb_track_id = self.get_mb_track_id(tags)
+        mb_artist_id = self.get_mb_artist_id(tags)
+        mb_album_artist_id = self.get_mb_album_artist_id(tags)
+        genres = self.get_genres(tags)
+        discnumber = self.get_discnumber(tags)
+        discname = self.get_discname(tags)
+        tracknumber = self.get_tracknumber(tags, name)
+        popm = self.get_popm(tags)
+        bpm = self.get_bpm(tags)
+        compilation = not disable_compilations and\
+            self.get_compilation(tags)
+        (original_year, original_timestamp) = self.get_original_year(tags)
+        (year, timestamp) = self.get_year(tags)
+        if year is None:
+            (year, timestamp) = (original_year, original_timestamp)
+        elif original_year is None:
+            (original_year, original_timestamp) = (year, timestamp)
+        # If no artists tag, use album artist
+        if artists == "":
+            artists = album_artists
+        if advanced_artist_tags:
+            composers = self.get_composers(tags)
+            conductors = self.get_conductors(tags)
+            performers = self.get_performers(tags)
+            remixers = self.get_remixers(tags)
+            artists += ";%s" % performers if performers != "" else ""
+            artists += ";%s" % conductors if conductors != "" else ""
+            artists += ";%s" % composers if composers != "" else ""
+            artists += ";%s" % remixers if remixers != "" else ""
+        if artists == "":
+            artists = _("Unknown")
+        # Reset album tags if we found a compilation
+        if compilation:
+            album_artists = ""
+            mb_album_artist_id = ""
+            aa_sortnames = ""
+        return (name, duration, title, artists, genres, a_sortnames,
+                aa_sortnames, album_artists, album_name, discname,
+                discnumber, year, timestamp, original_year,
+                original_timestamp, mb_album_id, mb_track_id, mb_artist_id,
+                mb_album_artist_id, tracknumber, popm, bpm, compilation)
+
     def __get_extended(self, tags, keys):
         """
             Return tag from tags following keys
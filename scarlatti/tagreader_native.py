@@ -0,0 +1,767 @@
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from mmap import mmap, ACCESS_READ
+from struct import unpack_from, error as StructError
+from urllib.parse import unquote, urlparse
+from re import match
+
+
+class UnsupportedFile(Exception):
+    """
+        File not handled by native reader, use GStreamer
+    """
+    pass
+
+
+class NativeDateTime:
+    """
+        Partial date, same API as Gst.DateTime
+    """
+
+    def __init__(self, year, month, day):
+        """
+            Init date
+            @param year as int
+            @param month as int/None
+            @param day as int/None
+        """
+        self.__year = year
+        self.__month = month
+        self.__day = day
+
+    def has_year(self):
+        return True
+
+    def has_month(self):
+        return self.__month is not None
+
+    def has_day(self):
+        return self.__day is not None
+
+    def get_year(self):
+        return self.__year
+
+    def get_month(self):
+        return self.__month
+
+    def get_day(self):
+        return self.__day
+
+    def __eq__(self, other):
+        if not isinstance(other, NativeDateTime):
+            return NotImplemented
+        return (self.__year, self.__month, self.__day) ==\
+            (other.__year, other.__month, other.__day)
+
+    def __repr__(self):
+        return "%s-%s-%s" % (self.__year, self.__month, self.__day)
+
+
+class NativeSample:
+    """
+        Raw ID3v2 frame, same API as Gst.Sample/Gst.Buffer/Gst.MapInfo
+    """
+
+    def __init__(self, data):
+        """
+            Init sample
+            @param data as bytes
+        """
+        self.data = data
+
+    def get_buffer(self):
+        return self
+
+    def map(self, flags):
+        return (True, self)
+
+
+class NativeTagList:
+    """
+        Tags read by NativeTagReader, same API as Gst.TagList for the
+        getters used by TagReader
+    """
+
+    def __init__(self):
+        """
+            Init tag list
+        """
+        self.__tags = {}
+
+    def add(self, key, value):
+        """
+            Append value for key
+            @param key as str: a GStreamer tag name
+            @param value as str/int/float/NativeDateTime/NativeSample
+        """
+        self.__tags.setdefault(key, []).append(value)
+
+    def get_tag_size(self, key):
+        return len(self.__tags.get(key, []))
+
+    def get_string_index(self, key, index):
+        return self.__get_index(key, index)
+
+    def get_uint_index(self, key, index):
+        return self.__get_index(key, index)
+
+    def get_double_index(self, key, index):
+        return self.__get_index(key, index)
+
+    def get_date_index(self, key, index):
+        return self.__get_index(key, index)
+
+    def get_date_time_index(self, key, index):
+        return self.__get_index(key, index)
+
+    def get_sample_index(self, key, index):
+        return self.__get_index(key, index)
+
+    def __get_index(self, key, index):
+        """
+            Get value for key at index
+            @param key as str
+            @param index as int
+            @return (bool, value)
+        """
+        values = self.__tags.get(key, [])
+        if index < len(values):
+            return (True, values[index])
+        return (False, None)
+
+
+class NativeInfo:
+    """
+        Result of NativeTagReader, same API as GstPbutils.DiscovererInfo
+    """
+
+    def __init__(self, tags, duration):
+        """
+            Init info
+            @param tags as NativeTagList
+            @param duration as int: nanoseconds
+        """
+        self.__tags = tags
+        self.__duration = duration
+
+    def get_tags(self):
+        return self.__tags
+
+    def get_duration(self):
+        return self.__duration
+
+
+class NativeTagReader:
+    """
+        Read tags and duration from file headers without GStreamer
+        Handles FLAC, Ogg Vorbis/Opus, MP3 with ID3v2.3/2.4 and MP4
+        Tags are named and typed as GStreamer does, anything unusual
+        raises UnsupportedFile
+    """
+
+    # Vorbis comments, see gst-plugins-base/gst-libs/gst/tag/vorbistag.c
+    __VORBIS = {
+        "TITLE": "title",
+        "VERSION": "version",
+        "ALBUM": "album",
+        "ARTIST": "artist",
+        "ALBUMARTIST": "album-artist",
+        "ALBUM ARTIST": "album-artist",
+        "ARTISTSORT": "artist-sortname",
+        "ALBUMARTISTSORT": "album-artist-sortname",
+        "ALBUMSORT": "album-sortname",
+        "TITLESORT": "title-sortname",
+        "PERFORMER": "performer",
+        "COMPOSER": "composer",
+        "CONDUCTOR": "conductor",
+        "GENRE": "genre",
+        "LYRICS": "lyrics",
+        "ISRC": "isrc",
+        "COPYRIGHT": "copyright",
+        "LICENSE": "license",
+        "ORGANIZATION": "organization",
+        "DESCRIPTION": "description",
+        "COMMENT": "comment",
+        "MUSICBRAINZ_TRACKID": "musicbrainz-trackid",
+        "MUSICBRAINZ_ARTISTID": "musicbrainz-artistid",
+        "MUSICBRAINZ_ALBUMID": "musicbrainz-albumid",
+        "MUSICBRAINZ_ALBUMARTISTID": "musicbrainz-albumartistid",
+        "MUSICBRAINZ_RELEASEGROUPID": "musicbrainz-releasegroupid",
+    }
+    __VORBIS_UINT = {
+        "TRACKNUMBER": "track-number",
+        "TRACKTOTAL": "track-count",
+        "TOTALTRACKS": "track-count",
+        "DISCNUMBER": "album-disc-number",
+        "DISCTOTAL": "album-disc-count",
+        "TOTALDISCS": "album-disc-count",
+    }
+    # Not tags, images are not needed when scanning
+    __VORBIS_SKIP = ["METADATA_BLOCK_PICTURE", "COVERART", "COVERARTMIME",
+                     "REPLAYGAIN_TRACK_GAIN", "REPLAYGAIN_TRACK_PEAK",
+                     "REPLAYGAIN_ALBUM_GAIN", "REPLAYGAIN_ALBUM_PEAK",
+                     "REPLAYGAIN_REFERENCE_LOUDNESS"]
+
+    # ID3v2 text frames, see gst-plugins-base/gst-libs/gst/tag/id3v2.c
+    __ID3 = {
+        "TIT2": "title",
+        "TALB": "album",
+        "TPE1": "artist",
+        "TPE2": "album-artist",
+        "TPE3": "conductor",
+        "TPE4": "interpreted-by",
+        "TCOM": "composer",
+        "TCON": "genre",
+        "TSOP": "artist-sortname",
+        "TSO2": "album-artist-sortname",
+        "TSOA": "album-sortname",
+        "TSOT": "title-sortname",
+        "TCOP": "copyright",
+        "TSRC": "isrc",
+        "TIT1": "grouping",
+        "USLT": "lyrics",
+    }
+    __ID3_TXXX = {
+        "MusicBrainz Artist Id": "musicbrainz-artistid",
+        "MusicBrainz Album Id": "musicbrainz-albumid",
+        "MusicBrainz Album Artist Id": "musicbrainz-albumartistid",
+        "MusicBrainz Release Group Id": "musicbrainz-releasegroupid",
+        "MusicBrainz TRM Id": "musicbrainz-trmid",
+    }
+    __ID3_ENCODINGS = ["latin-1", "utf-16", "utf-16-be", "utf-8"]
+
+    # MP4 items, see gst-plugins-good/gst/isomp4/qtdemux_dump.c
+    __MP4 = {
+        b"\xa9nam": "title",
+        b"\xa9ART": "artist",
+        b"aART": "album-artist",
+        b"\xa9alb": "album",
+        b"\xa9gen": "genre",
+        b"\xa9wrt": "composer",
+        b"\xa9lyr": "lyrics",
+        b"soar": "artist-sortname",
+        b"soaa": "album-artist-sortname",
+        b"soal": "album-sortname",
+        b"sonm": "title-sortname",
+        b"cprt": "copyright",
+    }
+    __MP4_FREEFORM = {
+        "MusicBrainz Track Id": "musicbrainz-trackid",
+        "MusicBrainz Artist Id": "musicbrainz-artistid",
+        "MusicBrainz Album Id": "musicbrainz-albumid",
+        "MusicBrainz Album Artist Id": "musicbrainz-albumartistid",
+        "MusicBrainz Release Group Id": "musicbrainz-releasegroupid",
+    }
+
+    # MPEG audio layer III, index by MPEG version: 1 or 2/2.5
+    __MP3_BITRATES = [
+        [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+        [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]]
+    __MP3_RATES = [44100, 48000, 32000]
+
+    def get_info(self, uri):
+        """
+            Read tags and duration for uri
+            @param uri as str
+            @return NativeInfo
+            @raise UnsupportedFile
+        """
+        parsed = urlparse(uri)
+        if parsed.scheme != "file" or parsed.netloc not in ["", "localhost"]:
+            raise UnsupportedFile("not a local file")
+        try:
+            with open(unquote(parsed.path), "rb") as f:
+                with mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+                    if data[0:4] == b"fLaC":
+                        return self.__read_flac(data)
+                    elif data[0:4] == b"OggS":
+                        return self.__read_ogg(data)
+                    elif data[0:3] == b"ID3":
+                        return self.__read_mp3(data)
+                    elif data[4:8] == b"ftyp":
+                        return self.__read_mp4(data)
+        except (StructError, IndexError, ValueError, OSError) as e:
+            raise UnsupportedFile("%s: %s" % (type(e).__name__, e))
+        raise UnsupportedFile("unknown format")
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_datetime(self, string):
+        """
+            Parse an ISO 8601 date as GStreamer does
+            @param string as str
+            @return NativeDateTime/None
+        """
+        m = match(r"\s*(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?", string)
+        if m is None:
+            return None
+        (year, month, day) = m.groups()
+        month = int(month) if month is not None else None
+        day = int(day) if day is not None else None
+        if month is not None and not 1 <= month <= 12:
+            return None
+        if day is not None and not 1 <= day <= 31:
+            return None
+        return NativeDateTime(int(year), month, day)
+
+    def __get_uint(self, string):
+        """
+            Parse "3" or "3/12"
+            @param string as str
+            @return int/None
+        """
+        m = match(r"\s*(\d+)", string)
+        return None if m is None else int(m.group(1))
+
+    def __add_vorbis_comments(self, tags, data, pos):
+        """
+            Add vorbis comments at pos to tags
+            @param tags as NativeTagList
+            @param data as mmap/bytes
+            @param pos as int
+        """
+        (vendor_length,) = unpack_from("<I", data, pos)
+        pos += 4 + vendor_length
+        (count,) = unpack_from("<I", data, pos)
+        pos += 4
+        for i in range(count):
+            (length,) = unpack_from("<I", data, pos)
+            pos += 4
+            comment = bytes(data[pos:pos + length]).decode("utf-8",
+                                                           "replace")
+            if len(comment) != length and pos + length > len(data):
+                raise UnsupportedFile("truncated comment")
+            pos += length
+            (key, sep, value) = comment.partition("=")
+            if not sep:
+                continue
+            upper = key.upper()
+            if upper in self.__VORBIS:
+                if value:
+                    tags.add(self.__VORBIS[upper], value)
+            elif upper in self.__VORBIS_UINT:
+                number = self.__get_uint(value)
+                if number is not None:
+                    tags.add(self.__VORBIS_UINT[upper], number)
+            elif upper == "DATE":
+                datetime = self.__get_datetime(value)
+                if datetime is not None:
+                    tags.add("datetime", datetime)
+            elif upper == "BPM":
+                try:
+                    tags.add("beats-per-minute", float(value))
+                except ValueError:
+                    pass
+            elif upper not in self.__VORBIS_SKIP:
+                tags.add("extended-comment", comment)
+
+    def __read_flac(self, data):
+        """
+            Read FLAC metadata blocks
+            @param data as mmap
+            @return NativeInfo
+        """
+        tags = NativeTagList()
+        duration = None
+        pos = 4
+        last = False
+        while not last:
+            header = data[pos]
+            last = header & 0x80
+            block_type = header & 0x7F
+            length = int.from_bytes(data[pos + 1:pos + 4], "big")
+            pos += 4
+            if pos + length > len(data):
+                raise UnsupportedFile("truncated FLAC block")
+            # STREAMINFO
+            if block_type == 0:
+                b = data[pos:pos + 18]
+                rate = (b[10] << 12) | (b[11] << 4) | (b[12] >> 4)
+                samples = ((b[13] & 0x0F) << 32) |\
+                    int.from_bytes(b[14:18], "big")
+                if rate and samples:
+                    duration = samples * 1000000000 // rate
+            # VORBIS_COMMENT
+            elif block_type == 4:
+                self.__add_vorbis_comments(tags, data, pos)
+            pos += length
+        if duration is None:
+            raise UnsupportedFile("FLAC without length")
+        return NativeInfo(tags, duration)
+
+    def __read_ogg_packets(self, data, count):
+        """
+            Read first packets of first Ogg logical stream
+            @param data as mmap
+            @param count as int
+            @return ([bytes], serial as int)
+        """
+        packets = []
+        packet = b""
+        serial = None
+        pos = 0
+        while len(packets) < count:
+            if data[pos:pos + 4] != b"OggS":
+                raise UnsupportedFile("bad Ogg page")
+            (page_serial,) = unpack_from("<I", data, pos + 14)
+            segments = data[pos + 26]
+            table = data[pos + 27:pos + 27 + segments]
+            pos += 27 + segments
+            if serial is None:
+                serial = page_serial
+            elif page_serial != serial:
+                raise UnsupportedFile("multiplexed Ogg")
+            for size in table:
+                packet += data[pos:pos + size]
+                pos += size
+                if size < 255:
+                    packets.append(packet)
+                    packet = b""
+        return (packets[:count], serial)
+
+    def __get_ogg_granule(self, data, serial):
+        """
+            Get granule position of last Ogg page
+            @param data as mmap
+            @param serial as int
+            @return int
+        """
+        pos = data.rfind(b"OggS")
+        while pos != -1:
+            (granule, page_serial) = unpack_from("<qI", data, pos + 6)
+            if page_serial != serial:
+                raise UnsupportedFile("chained Ogg")
+            if granule >= 0:
+                return granule
+            pos = data.rfind(b"OggS", 0, pos)
+        raise UnsupportedFile("Ogg without length")
+
+    def __read_ogg(self, data):
+        """
+            Read Ogg Vorbis/Opus headers
+            @param data as mmap
+            @return NativeInfo
+        """
+        tags = NativeTagList()
+        ((head, comment), serial) = self.__read_ogg_packets(data, 2)
+        granule = self.__get_ogg_granule(data, serial)
+        if head[0:7] == b"\x01vorbis" and comment[0:7] == b"\x03vorbis":
+            (rate,) = unpack_from("<I", head, 12)
+            self.__add_vorbis_comments(tags, comment, 7)
+        elif head[0:8] == b"OpusHead" and comment[0:8] == b"OpusTags":
+            # Granule is always at 48kHz, pre-skip samples are not played
+            (pre_skip,) = unpack_from("<H", head, 10)
+            granule = max(0, granule - pre_skip)
+            rate = 48000
+            self.__add_vorbis_comments(tags, comment, 8)
+        else:
+            raise UnsupportedFile("unknown Ogg codec")
+        if not rate:
+            raise UnsupportedFile("Ogg without rate")
+        return NativeInfo(tags, granule * 1000000000 // rate)
+
+    def __get_id3_strings(self, frame):
+        """
+            Decode text frame values
+            @param frame as bytes: frame content, after header
+            @return [str]
+        """
+        encoding = frame[0]
+        if encoding > 3:
+            raise UnsupportedFile("bad ID3 encoding")
+        text = frame[1:]
+        if encoding in [1, 2]:
+            # Keep UTF-16 code units aligned when splitting
+            values = []
+            start = 0
+            for i in range(0, len(text) - 1, 2):
+                if text[i:i + 2] == b"\x00\x00":
+                    values.append(text[start:i])
+                    start = i + 2
+            values.append(text[start:])
+        else:
+            values = text.split(b"\x00")
+        strings = []
+        for value in values:
+            if not value:
+                continue
+            string = value.decode(self.__ID3_ENCODINGS[encoding], "replace")
+            string = string.lstrip("﻿")
+            if string:
+                strings.append(string)
+        return strings
+
+    def __read_id3(self, data, tags):
+        """
+            Read ID3v2.3/2.4 tag at file start
+            @param data as mmap
+            @param tags as NativeTagList
+            @return tag size as int
+        """
+        version = data[3]
+        flags = data[5]
+        size = self.__get_syncsafe(data[6:10]) + 10
+        if version not in [3, 4]:
+            raise UnsupportedFile("ID3v2.%s" % version)
+        # Unsynchronisation, extended header, experimental
+        if flags & 0xE0:
+            raise UnsupportedFile("ID3 flags %s" % flags)
+        if flags & 0x10:
+            size += 10
+        year = date = None
+        pos = 10
+        end = min(size, len(data))
+        while pos + 10 <= end:
+            key = bytes(data[pos:pos + 4])
+            if key[0] == 0:
+                break
+            if version == 4:
+                length = self.__get_syncsafe(data[pos + 4:pos + 8])
+            else:
+                (length,) = unpack_from(">I", data, pos + 4)
+            format_flags = data[pos + 9]
+            raw = bytes(data[pos:pos + 10 + length])
+            frame = raw[10:]
+            pos += 10 + length
+            if pos > end:
+                raise UnsupportedFile("truncated ID3 frame")
+            # Compression, encryption, unsynchronisation, grouping
+            if (version == 4 and format_flags & 0x4E) or\
+                    (version == 3 and format_flags & 0xE0):
+                raise UnsupportedFile("ID3 frame flags")
+            if version == 4 and format_flags & 0x01:
+                frame = frame[4:]
+            key = key.decode("latin-1")
+            if key == "APIC" or not frame:
+                continue
+            tags.add("private-id3v2-frame", NativeSample(raw))
+            if key in self.__ID3 and key != "USLT":
+                for string in self.__get_id3_strings(frame):
+                    # Numeric genres need ID3v1 table
+                    if key == "TCON" and match(r"^\(?\d+\)?", string):
+                        raise UnsupportedFile("ID3v1 genre")
+                    tags.add(self.__ID3[key], string)
+            elif key in ["TRCK", "TPOS"]:
+                strings = self.__get_id3_strings(frame)
+                number = self.__get_uint(strings[0]) if strings else None
+                if number is not None:
+                    tags.add("track-number" if key == "TRCK"
+                             else "album-disc-number", number)
+            elif key == "TBPM":
+                for string in self.__get_id3_strings(frame):
+                    try:
+                        tags.add("beats-per-minute", float(string))
+                    except ValueError:
+                        pass
+                    break
+            elif key == "TDRC" or key == "TYER":
+                strings = self.__get_id3_strings(frame)
+                year = strings[0] if strings else None
+            elif key == "TDAT":
+                strings = self.__get_id3_strings(frame)
+                date = strings[0] if strings else None
+            elif key == "TXXX":
+                strings = self.__get_id3_strings(frame)
+                if len(strings) > 1 and strings[0] in self.__ID3_TXXX:
+                    for string in strings[1:]:
+                        tags.add(self.__ID3_TXXX[strings[0]], string)
+            elif key == "UFID":
+                (owner, sep, value) = frame.partition(b"\x00")
+                if owner == b"http://musicbrainz.org" and value:
+                    tags.add("musicbrainz-trackid",
+                             value.decode("latin-1"))
+        if year is not None:
+            # ID3v2.3 date is DDMM
+            if date is not None and match(r"^\d{4}$", date) and\
+                    match(r"^\d{4}$", year):
+                year = "%s-%s-%s" % (year, date[2:4], date[0:2])
+            datetime = self.__get_datetime(year)
+            if datetime is not None:
+                tags.add("datetime", datetime)
+        return size
+
+    def __read_mp3(self, data):
+        """
+            Read MP3 file with an ID3v2 tag
+            @param data as mmap
+            @return NativeInfo
+        """
+        tags = NativeTagList()
+        start = self.__read_id3(data, tags)
+        # Skip padding written after tag
+        while start < len(data) and data[start] == 0:
+            start += 1
+        (header,) = unpack_from(">I", data, start)
+        if header & 0xFFE00000 != 0xFFE00000:
+            raise UnsupportedFile("no MPEG frame after ID3")
+        version = (header >> 19) & 3
+        layer = (header >> 17) & 3
+        bitrate_index = (header >> 12) & 15
+        rate_index = (header >> 10) & 3
+        mono = (header >> 6) & 3 == 3
+        # Layer III only, no reserved version/free bitrate
+        if layer != 1 or version == 1 or bitrate_index in [0, 15] or\
+                rate_index == 3:
+            raise UnsupportedFile("not MPEG layer III")
+        mpeg1 = version == 3
+        rate = self.__MP3_RATES[rate_index]
+        if not mpeg1:
+            rate //= 2 if version == 2 else 4
+        samples = 1152 if mpeg1 else 576
+        # Xing/Info/VBRI header frames count
+        side = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        frames = None
+        xing = start + 4 + side
+        if data[xing:xing + 4] in [b"Xing", b"Info"]:
+            (flags,) = unpack_from(">I", data, xing + 4)
+            if flags & 1:
+                (frames,) = unpack_from(">I", data, xing + 8)
+        elif data[start + 36:start + 40] == b"VBRI":
+            (frames,) = unpack_from(">I", data, start + 50)
+        if frames:
+            duration = frames * samples * 1000000000 // rate
+        else:
+            # Constant bitrate
+            bitrate = self.__MP3_BITRATES[0 if mpeg1 else 1][bitrate_index]
+            end = len(data)
+            if data[end - 128:end - 125] == b"TAG":
+                end -= 128
+            duration = (end - start) * 8 * 1000000 // bitrate
+        return NativeInfo(tags, duration)
+
+    def __get_mp4_atoms(self, data, start, end):
+        """
+            Iterate over atoms
+            @param data as mmap
+            @param start as int
+            @param end as int
+            @return generator of (name as bytes, start as int, end as int)
+        """
+        pos = start
+        while pos + 8 <= end:
+            (size, name) = unpack_from(">I4s", data, pos)
+            header = 8
+            if size == 1:
+                (size,) = unpack_from(">Q", data, pos + 8)
+                header = 16
+            elif size == 0:
+                size = end - pos
+            if size < header or pos + size > end:
+                raise UnsupportedFile("bad MP4 atom")
+            yield (name, pos + header, pos + size)
+            pos += size
+
+    def __get_mp4_atom(self, data, start, end, path):
+        """
+            Get atom at path
+            @param data as mmap
+            @param start as int
+            @param end as int
+            @param path as [bytes]
+            @return (start as int, end as int)/None
+        """
+        for (name, atom_start, atom_end) in self.__get_mp4_atoms(data,
+                                                                 start, end):
+            if name == path[0]:
+                if len(path) == 1:
+                    return (atom_start, atom_end)
+                # meta is a full atom: version and flags first
+                if name == b"meta":
+                    atom_start += 4
+                return self.__get_mp4_atom(data, atom_start, atom_end,
+                                           path[1:])
+        return None
+
+    def __read_mp4(self, data):
+        """
+            Read MP4 moov atom
+            @param data as mmap
+            @return NativeInfo
+        """
+        tags = NativeTagList()
+        moov = self.__get_mp4_atom(data, 0, len(data), [b"moov"])
+        if moov is None:
+            raise UnsupportedFile("MP4 without moov")
+        mvhd = self.__get_mp4_atom(data, moov[0], moov[1], [b"mvhd"])
+        if mvhd is None:
+            raise UnsupportedFile("MP4 without mvhd")
+        if data[mvhd[0]] == 1:
+            (timescale, length) = unpack_from(">IQ", data, mvhd[0] + 20)
+        else:
+            (timescale, length) = unpack_from(">II", data, mvhd[0] + 12)
+        if not timescale:
+            raise UnsupportedFile("MP4 without timescale")
+        ilst = self.__get_mp4_atom(data, moov[0], moov[1],
+                                   [b"udta", b"meta", b"ilst"])
+        if ilst is not None:
+            for (name, start, end) in self.__get_mp4_atoms(data, *ilst):
+                self.__add_mp4_item(tags, data, name, start, end)
+        return NativeInfo(tags, length * 1000000000 // timescale)
+
+    def __add_mp4_item(self, tags, data, name, start, end):
+        """
+            Add ilst item to tags
+            @param tags as NativeTagList
+            @param data as mmap
+            @param name as bytes
+            @param start as int
+            @param end as int
+        """
+        mean = key = None
+        for (child, child_start, child_end) in self.__get_mp4_atoms(
+                data, start, end):
+            if child == b"mean":
+                mean = bytes(data[child_start + 4:child_end])
+                continue
+            elif child == b"name":
+                key = bytes(data[child_start + 4:child_end]).decode(
+                    "utf-8", "replace")
+                continue
+            elif child != b"data":
+                continue
+            # Type, locale then value
+            (data_type,) = unpack_from(">I", data, child_start)
+            value = bytes(data[child_start + 8:child_end])
+            if name == b"----":
+                if mean == b"com.apple.iTunes" and\
+                        key in self.__MP4_FREEFORM and data_type == 1:
+                    tags.add(self.__MP4_FREEFORM[key],
+                             value.decode("utf-8", "replace"))
+            elif name in self.__MP4 and data_type == 1:
+                string = value.decode("utf-8", "replace")
+                if string:
+                    tags.add(self.__MP4[name], string)
+            elif name in [b"trkn", b"disk"] and len(value) >= 4:
+                (number,) = unpack_from(">H", value, 2)
+                if number:
+                    tags.add("track-number" if name == b"trkn"
+                             else "album-disc-number", number)
+            elif name == b"tmpo" and value:
+                tags.add("beats-per-minute",
+                         float(int.from_bytes(value, "big")))
+            elif name == b"\xa9day" and data_type == 1:
+                datetime = self.__get_datetime(value.decode("utf-8",
+                                                            "replace"))
+                if datetime is not None:
+                    tags.add("datetime", datetime)
+            elif name == b"gnre":
+                raise UnsupportedFile("ID3v1 genre")
+
+    def __get_syncsafe(self, b):
+        """
+            Decode an ID3 syncsafe integer
+            @param b as bytes
+            @return int
+        """
+        return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
@@ -0,0 +1,119 @@
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import gi
+gi.require_version("Gst", "1.0")
+gi.require_version("GstPbutils", "1.0")
+from gi.repository import Gst, GstPbutils
+
+import gettext
+from multiprocessing import get_context, TimeoutError
+
+from scarlatti.tagreader import TagReader, Discoverer
+from scarlatti.logger import Logger
+
+
+# Per worker process state, set by _init_worker()
+_worker = {}
+
+
+def _init_worker(domain, localedir, disable_compilations,
+                 advanced_artist_tags, native, check):
+    """
+        Init a tag reader worker process
+        @param domain as str
+        @param localedir as str
+        @param disable_compilations as bool
+        @param advanced_artist_tags as bool
+        @param native as bool: see Discoverer
+        @param check as bool: see Discoverer
+    """
+    # Needed for _("Unknown") in TagReader
+    gettext.bindtextdomain(domain, localedir)
+    gettext.textdomain(domain)
+    Gst.init(None)
+    GstPbutils.pb_utils_init()
+    _worker["reader"] = TagReader()
+    _worker["discoverer"] = Discoverer(native, check)
+    _worker["options"] = (disable_compilations, advanced_artist_tags)
+
+
+def _read_tags(item):
+    """
+        Read tags for item in a worker process
+        @param item as (int, str)
+        @return (uri as str, mtime as int, tags as () or None, error as str)
+    """
+    (mtime, uri) = item
+    try:
+        tags = _worker["reader"].read_tags(_worker["discoverer"], uri,
+                                           *_worker["options"])
+        return (uri, mtime, tags, "")
+    except Exception as e:
+        return (uri, mtime, None, str(e))
+
+
+class TagReaderPool:
+    """
+        Read tags in a pool of worker processes
+        Workers do not access database, they only return plain tuples
+    """
+
+    # Seconds between two cancel checks
+    __POLL = 0.5
+
+    def __init__(self, workers):
+        """
+            Init pool
+            @param workers as int
+        """
+        self.__workers = workers
+
+    def read(self, files, disable_compilations, advanced_artist_tags,
+             native, check, cancelled):
+        """
+            Read tags for files, results are yielded in completion order
+            @param files as [(int, str)]
+            @param disable_compilations as bool
+            @param advanced_artist_tags as bool
+            @param native as bool: use native tag reader
+            @param check as bool: check native tag reader
+            @param cancelled as function returning bool
+            @return generator of (uri, mtime, tags, error)
+        """
+        if not files:
+            return
+        # Do not fork a process with GLib threads running
+        context = get_context("spawn")
+        domain = gettext.textdomain()
+        pool = context.Pool(self.__workers, _init_worker,
+                            (domain, gettext.bindtextdomain(domain),
+                             disable_compilations, advanced_artist_tags,
+                             native, check))
+        try:
+            # Batch results to limit IPC round-trips
+            chunksize = max(1, min(64, len(files) // (self.__workers * 4)))
+            iterator = pool.imap_unordered(_read_tags, files, chunksize)
+            while True:
+                if cancelled():
+                    Logger.info("TagReaderPool::read(): cancelled")
+                    break
+                try:
+                    yield iterator.next(self.__POLL)
+                except TimeoutError:
+                    continue
+                except StopIteration:
+                    break
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
@@ -21,6 +21,15 @@ from scarlatti.define import App, FileType
 import os
 
 
+def get_uri_basename(uri):
+    """
+        Get file name for uri, as used to identify moved tracks
+        @param uri as str
+        @return str
+    """
+    return Gio.File.new_for_uri(uri).get_basename()
+
+
 def get_file_type(uri):
     """
         Get file type from file extension
@@ -33,16 +33,25 @@ class AlbumsBoxView(FlowBoxView, SignalsHelper):
         Show albums in a box
     """
 
+    # Album attributes used by widgets and artwork, see Album.prefetch()
+    _ALBUM_FIELDS = ["name", "artists", "year", "uri", "storage_type",
+                     "lp_album_id", "loved"]
+
     @signals_map
-    def __init__(self, genre_ids, artist_ids, storage_type, view_type):
+    def __init__(self, genre_ids, artist_ids, storage_type, view_type,
+                 virtual=False):
         """
             Init album view
             @param genre_ids as [int]
             @param artist_ids as [int]
             @param storage_type as StorageType
             @param view_type as ViewType
+            @param virtual as bool: values are album ids, see FlowBoxView
         """
-        FlowBoxView.__init__(self, storage_type, view_type)
+        FlowBoxView.__init__(self, storage_type, view_type, virtual)
+        self.__virtual = virtual
+        # Albums bound to children in virtual mode
+        self.__albums = {}
         self.__time = time() + 10
         self._genre_ids = genre_ids
         self._artist_ids = artist_ids
@@ -92,12 +101,11 @@ class AlbumsBoxView(FlowBoxView, SignalsHelper):
                 skipped = True
             album_ids = get_album_ids_for(self._genre_ids, self._artist_ids,
                                           self.storage_type, skipped)
-            albums = []
-            for album_id in album_ids:
-                album = Album(album_id, self._genre_ids,
-                              self._artist_ids, True)
-                album.set_storage_type(self.storage_type)
-                albums.append(album)
+            # Albums are loaded for visible children only
+            if self.__virtual:
+                return album_ids
+            albums = [self.__get_album(album_id) for album_id in album_ids]
+            Album.prefetch(albums, self._ALBUM_FIELDS)
             return albums
 
         if albums:
@@ -113,13 +121,6 @@ class AlbumsBoxView(FlowBoxView, SignalsHelper):
         self.show_placeholder(False)
         FlowBoxView.add_value_unsorted(self, album)
 
-    def clear(self):
-        """
-            Clear view
-        """
-        for child in self._box.get_children():
-            child.destroy()
-
     @property
     def args(self):
         """
@@ -149,6 +150,61 @@ class AlbumsBoxView(FlowBoxView, SignalsHelper):
         widget.show()
         return widget
 
+    def _load_values(self, values):
+        """
+            Get albums for values
+            @param values as [int/Album]
+            @return [Album]
+        """
+        albums = []
+        loaded = {}
+        new_albums = []
+        for value in values:
+            if isinstance(value, Album):
+                albums.append(value)
+                continue
+            album = self.__albums.get(value)
+            if album is None:
+                album = self.__get_album(value)
+                new_albums.append(album)
+            loaded[value] = album
+            albums.append(album)
+        Album.prefetch(new_albums, self._ALBUM_FIELDS)
+        self.__albums = loaded
+        return albums
+
+    def _bind_child(self, child, album):
+        """
+            Show album in a recycled child
+            @param child as AlbumSimpleWidget
+            @param album as Album
+        """
+        if child.artwork is not None:
+            child.artwork.get_style_context().remove_class("load-animation")
+        child.set_album(album)
+
+    def _get_names(self, values):
+        """
+            Get names used by type ahead, see AlbumSimpleWidget.name
+            @param values as [int/Album]
+            @return [str]
+        """
+        album_ids = [value for value in values if not isinstance(value, Album)]
+        fields = App().albums.get_fields(album_ids, ["name", "artists"])
+        names = []
+        for value in values:
+            if isinstance(value, Album):
+                (name, artists) = (value.name, value.artists)
+            else:
+                field = fields.get(value, {})
+                (name, artists) = (field.get("name", ""),
+                                   field.get("artists", []))
+            if self.view_type & (ViewType.ALBUM | ViewType.ARTIST):
+                names.append(name)
+            else:
+                names.append("%s %s" % (name, artists))
+        return names
+
     def _get_menu_widget(self, child):
         """
             Get menu widget
@@ -194,9 +250,10 @@ class AlbumsBoxView(FlowBoxView, SignalsHelper):
                     [_("Refresh")],
                     [App().window.container.reload_view])
         elif scan_update == ScanUpdate.REMOVED:
-            for child in self.children:
-                if child.data.id == item.album_id:
-                    child.destroy()
+            for value in self.values:
+                album_id = value.id if isinstance(value, Album) else value
+                if album_id == item.album_id:
+                    self.remove_value(value)
                     break
 
     def _on_artwork_changed(self, artwork, album_id):
@@ -274,6 +331,36 @@ class AlbumsBoxView(FlowBoxView, SignalsHelper):
                                   cancellable,
                                   callback=(play_album, child))
 
+    def _get_albums(self):
+        """
+            Get all view albums
+            @return [Album]
+        """
+        albums = []
+        new_albums = []
+        for value in self.values:
+            if isinstance(value, Album):
+                albums.append(value)
+            else:
+                album = self.__get_album(value)
+                new_albums.append(album)
+                albums.append(album)
+        Album.prefetch(new_albums, self._ALBUM_FIELDS)
+        return albums
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_album(self, album_id):
+        """
+            Get album for id
+            @param album_id as int
+            @return Album
+        """
+        album = Album(album_id, self._genre_ids, self._artist_ids, True)
+        album.set_storage_type(self.storage_type)
+        return album
+
 
 class AlbumsForGenresBoxView(AlbumsBoxView):
     """
@@ -289,7 +376,7 @@ class AlbumsForGenresBoxView(AlbumsBoxView):
             @param view_type as ViewType
         """
         AlbumsBoxView.__init__(self, genre_ids, artist_ids, storage_type,
-                               view_type | ViewType.OVERLAY)
+                               view_type | ViewType.OVERLAY, True)
         from scarlatti.widgets_banner_flowbox import FlowboxBannerWidget
         self.__banner = FlowboxBannerWidget(genre_ids, artist_ids,
                                             view_type, True)
@@ -319,7 +406,7 @@ class AlbumsForGenresBoxView(AlbumsBoxView):
             @param banner as AlbumsBannerWidget
             @param random as bool
         """
-        albums = [c.data.clone(False) for c in self._box.get_children()]
+        albums = [album.clone(False) for album in self._get_albums()]
         if not albums:
             return
         if random:
@@ -336,10 +423,8 @@ class AlbumsForGenresBoxView(AlbumsBoxView):
         """
         from scarlatti.menu_objects import AlbumsMenu
         from scarlatti.widgets_menu import MenuBuilder
-        albums = []
-        for child in self._box.get_children():
-            if child.data.storage_type & StorageType.COLLECTION:
-                albums.append(child.data)
+        albums = [album for album in self._get_albums()
+                  if album.storage_type & StorageType.COLLECTION]
         title = get_title_for_genres_artists(self._genre_ids, self._artist_ids)
         menu = AlbumsMenu(title, albums, self.view_type)
         menu_widget = MenuBuilder(menu)
@@ -385,6 +470,7 @@ class AlbumsForYearsBoxView(AlbumsForGenresBoxView):
                     year, self.storage_type, True)
                 albums += [get_album(item[0], item[1], item[2], item[3], year)
                            for item in items]
+            Album.prefetch(albums, self._ALBUM_FIELDS)
             return albums
 
         App().task_helper.run(load, callback=(on_load,))
@@ -402,7 +488,8 @@ class AlbumsDeviceBoxView(AlbumsBoxView):
             @param view_type as ViewType
             @param index as int
         """
-        AlbumsBoxView.__init__(self, [], [], StorageType.COLLECTION, view_type)
+        AlbumsBoxView.__init__(self, [], [], StorageType.COLLECTION,
+                               view_type, True)
         self.add_widget(self._box)
         self.__index = index
 
@@ -416,7 +503,9 @@ class AlbumsDeviceBoxView(AlbumsBoxView):
         def load():
             album_ids = App().albums.get_synced_ids(0)
             album_ids += App().albums.get_synced_ids(self.__index)
-            return [Album(album_id) for album_id in album_ids]
+            albums = [Album(album_id) for album_id in album_ids]
+            Album.prefetch(albums, self._ALBUM_FIELDS)
+            return albums
 
         App().task_helper.run(load, callback=(on_load,))
 
@@ -16,6 +16,7 @@ from scarlatti.utils import popup_widget
 from scarlatti.view_lazyloading import LazyLoadingView
 from scarlatti.define import App, ViewType, MARGIN, StorageType
 from scarlatti.widgets_row_album import AlbumRow
+from scarlatti.objects_album import Album
 from scarlatti.widgets_listbox import ListBox
 from scarlatti.helper_gestures import GesturesHelper
 from scarlatti.helper_signals import SignalsHelper, signals_map
@@ -26,6 +27,10 @@ class AlbumsListView(LazyLoadingView, SignalsHelper, GesturesHelper):
         View showing albums
     """
 
+    # Album attributes used by rows and artwork, see Album.prefetch()
+    _ALBUM_FIELDS = ["name", "artists", "year", "uri", "storage_type",
+                     "lp_album_id", "loved"]
+
     @signals_map
     def __init__(self, genre_ids, artist_ids, view_type):
         """
@@ -98,6 +103,7 @@ class AlbumsListView(LazyLoadingView, SignalsHelper, GesturesHelper):
         """
         for child in self._box.get_children():
             self._box.remove(child)
+        Album.prefetch(albums, self._ALBUM_FIELDS)
         LazyLoadingView.populate(self, albums)
 
     def clear(self):
@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 
 from locale import strcoll
 
@@ -18,23 +18,44 @@ from scarlatti.view_lazyloading import LazyLoadingView
 from scarlatti.helper_gestures import GesturesHelper
 from scarlatti.define import ViewType, App
 from scarlatti.utils import get_font_height, popup_widget, set_cursor_type
+from scarlatti.utils import noaccents2
 
 
 class FlowBoxView(LazyLoadingView, GesturesHelper):
     """
         Lazy loading FlowBox
+        In virtual mode, only children for visible rows exist: they are
+        bound to other values on scroll, spacers replace other rows
     """
 
-    def __init__(self, storage_type, view_type=ViewType.SCROLLED):
+    # Rows bound above and below visible rows
+    __MARGIN_ROWS = 2
+    # Children bound before rows are measured
+    __INITIAL_CHILDREN = 48
+    # Values searched per names request
+    __SEARCH_CHUNK = 500
+
+    def __init__(self, storage_type, view_type=ViewType.SCROLLED,
+                 virtual=False):
         """
             Init flowbox view
             @param storage_type as StorageType
             @param view_type as ViewType
+            @param virtual as bool: recycle children, needs a scrolled view
         """
         LazyLoadingView.__init__(self, storage_type, view_type)
         self._items = []
         self.__hovered_child = None
         self.__font_height = get_font_height()
+        self.__values = []
+        self.__bound = 0
+        self.__start = 0
+        self.__columns = 0
+        self.__row_height = 0
+        self.__typeahead_index = None
+        self.__update_id = None
+        self.__update_force = False
+        self.__virtual = None
         self._box = Gtk.FlowBox()
         self._box.get_style_context().add_class("small_padding")
         # Allow lazy loading to not jump up and down
@@ -48,13 +69,41 @@ class FlowBoxView(LazyLoadingView, GesturesHelper):
             self.__event_controller = Gtk.EventControllerMotion.new(self._box)
             self.__event_controller.connect("motion", self.__on_box_motion)
         GesturesHelper.__init__(self, self._box)
+        if virtual and view_type & ViewType.SCROLLED:
+            self.__top_spacer = Gtk.Box.new(Gtk.Orientation.VERTICAL, 0)
+            self.__bottom_spacer = Gtk.Box.new(Gtk.Orientation.VERTICAL, 0)
+            self.__virtual = Gtk.Box.new(Gtk.Orientation.VERTICAL, 0)
+            self.__virtual.add(self.__top_spacer)
+            self.__virtual.add(self._box)
+            self.__virtual.add(self.__bottom_spacer)
+            self.__virtual.show_all()
+            self._box.connect("size-allocate", self.__on_box_size_allocate)
+            self.scrolled.connect("size-allocate",
+                                  self.__on_scrolled_size_allocate)
+
+    def add_widget(self, widget, banner=None):
+        """
+            Add widget to view, flowbox is added with its spacers in
+            virtual mode
+            @param widget as Gtk.Widget
+            @param banner as Gtk.Widget
+        """
+        if widget == self._box and self.__virtual is not None:
+            widget = self.__virtual
+        LazyLoadingView.add_widget(self, widget, banner)
 
     def populate(self, items):
         """
             Populate items
             @param items
         """
-        LazyLoadingView.populate(self, items)
+        if self.__virtual is None:
+            LazyLoadingView.populate(self, items)
+        else:
+            self.__values = items
+            self.__typeahead_index = None
+            self.__update_window(True)
+            LazyLoadingView.populate(self, [])
 
     def add_value(self, value):
         """
@@ -69,25 +118,70 @@ class FlowBoxView(LazyLoadingView, GesturesHelper):
             Add value unsorted
             @param value as object
         """
-        child = self._get_child(value)
-        child.populate()
+        if self.__virtual is None:
+            child = self._get_child(value)
+            child.populate()
+        else:
+            self.__values.append(value)
+            self.__update_window(True)
 
     def remove_value(self, value):
         """
             Remove value
             @param value as object
         """
-        for child in self._box.get_children():
-            if child.data == value:
-                child.destroy()
-                break
+        if self.__virtual is None:
+            for child in self._box.get_children():
+                if child.data == value:
+                    child.destroy()
+                    break
+        elif value in self.__values:
+            self.__values.remove(value)
+            self.__update_window(True)
 
     def clear(self):
         """
             Clear flowbox
         """
-        for child in self._box.get_children():
-            child.destroy()
+        if self.__virtual is None:
+            for child in self._box.get_children():
+                child.destroy()
+        else:
+            self.__values = []
+            self.__update_window(True)
+
+    def search_for_child(self, text):
+        """
+            Search child and scroll, search values in virtual mode
+            @param text as str
+        """
+        if self.__virtual is None:
+            LazyLoadingView.search_for_child(self, text)
+            return
+        self.__typeahead_index = None
+        if text:
+            self.__search(text, 0, 1)
+        self.__update_typeahead()
+
+    def search_prev(self, text):
+        """
+            Search previous child and scroll
+            @param text as str
+        """
+        if self.__virtual is None:
+            LazyLoadingView.search_prev(self, text)
+        elif self.__typeahead_index is not None:
+            self.__search(text, self.__typeahead_index - 1, -1)
+
+    def search_next(self, text):
+        """
+            Search next child and scroll
+            @param text as str
+        """
+        if self.__virtual is None:
+            LazyLoadingView.search_next(self, text)
+        elif self.__typeahead_index is not None:
+            self.__search(text, self.__typeahead_index + 1, 1)
 
     def destroy(self):
         """
@@ -108,10 +202,24 @@ class FlowBoxView(LazyLoadingView, GesturesHelper):
     @property
     def children(self):
         """
-            Get box children
+            Get box children, only bound ones in virtual mode
             @return [Gtk.Widget]
         """
-        return self._box.get_children()
+        if self.__virtual is None:
+            return self._box.get_children()
+        else:
+            return self._box.get_children()[:self.__bound]
+
+    @property
+    def values(self):
+        """
+            Get view values
+            @return [object]
+        """
+        if self.__virtual is None:
+            return [child.data for child in self._box.get_children()]
+        else:
+            return list(self.__values)
 
 #######################
 # PROTECTED           #
@@ -124,6 +232,30 @@ class FlowBoxView(LazyLoadingView, GesturesHelper):
         """
         return None
 
+    def _load_values(self, values):
+        """
+            Get objects to bind to children in virtual mode
+            @param values as [object]
+            @return [object]
+        """
+        return values
+
+    def _bind_child(self, child, value):
+        """
+            Show value in a recycled child
+            @param child as Gtk.FlowBoxChild
+            @param value as object
+        """
+        pass
+
+    def _get_names(self, values):
+        """
+            Get names used by type ahead in virtual mode
+            @param values as [object]
+            @return [str]
+        """
+        return [value.name for value in values]
+
     def _get_label_height(self):
         """
             Get wanted label height
@@ -142,6 +274,15 @@ class FlowBoxView(LazyLoadingView, GesturesHelper):
     def _on_child_activated(self, flowbox, child):
         pass
 
+    def _on_value_changed(self, adj):
+        """
+            Bind children to visible values
+            @param adj as Gtk.Adjustment
+        """
+        LazyLoadingView._on_value_changed(self, adj)
+        if self.__virtual is not None:
+            self.__update_window(False)
+
     def _on_container_folded(self, leaflet, folded):
         """
             Handle libhandy folded status
@@ -149,6 +290,12 @@ class FlowBoxView(LazyLoadingView, GesturesHelper):
             @param folded as Gparam
         """
         LazyLoadingView._on_container_folded(self, leaflet, folded)
+        # Rows are measured again on next allocation
+        if self.__virtual is not None:
+            for child in self.children:
+                child.reset_artwork()
+                child.set_artwork()
+            return
         self.pause()
         children = self._box.get_children()
         for child in children:
@@ -190,10 +337,161 @@ class FlowBoxView(LazyLoadingView, GesturesHelper):
         """
         LazyLoadingView._on_destroy(self, widget)
         self.__event_controller = None
+        if self.__update_id is not None:
+            GLib.source_remove(self.__update_id)
+            self.__update_id = None
 
 #######################
 # PRIVATE             #
 #######################
+    def __update_window(self, force):
+        """
+            Bind children to values in visible rows
+            @param force as bool: bind even if rows did not change
+        """
+        count = len(self.__values)
+        if self.__columns == 0:
+            first_row = 0
+            wanted = min(count, self.__INITIAL_CHILDREN)
+            (top, bottom) = (0, 0)
+        else:
+            rows = (count + self.__columns - 1) // self.__columns
+            window_rows = self.scrolled.get_allocated_height() //\
+                self.__row_height + 2 + 2 * self.__MARGIN_ROWS
+            coordinates = self.scrolled.translate_coordinates(
+                self.__virtual, 0, 0)
+            y = 0 if coordinates is None else max(0, coordinates[1])
+            first_row = y // self.__row_height - self.__MARGIN_ROWS
+            first_row = max(0, min(first_row, rows - window_rows))
+            wanted = min(count - first_row * self.__columns,
+                         window_rows * self.__columns)
+            top = first_row * self.__row_height
+            bottom = max(0, rows - first_row - window_rows) *\
+                self.__row_height
+        start = first_row * self.__columns
+        if not force and start == self.__start and wanted == self.__bound:
+            return
+        self.__start = start
+        self.__top_spacer.set_size_request(-1, top)
+        self.__bottom_spacer.set_size_request(-1, bottom)
+        values = self._load_values(self.__values[start:start + wanted])
+        children = self._box.get_children()
+        for (i, value) in enumerate(values):
+            if i < len(children):
+                self._bind_child(children[i], value)
+                children[i].show()
+            else:
+                child = self._get_child(value)
+                if child is not None:
+                    child.populate()
+        for child in children[len(values):]:
+            child.hide()
+        self.__bound = len(values)
+        self.__update_typeahead()
+
+    def __update_typeahead(self):
+        """
+            Highlight child bound to type ahead value
+        """
+        for (i, child) in enumerate(self.children):
+            style_context = child.get_style_context()
+            if self.__start + i == self.__typeahead_index:
+                style_context.add_class("typeahead")
+            else:
+                style_context.remove_class("typeahead")
+
+    def __search(self, text, position, step):
+        """
+            Search values for text and scroll to first match
+            @param text as str
+            @param position as int: first value to search
+            @param step as int: 1 forward, -1 backward
+        """
+        text = noaccents2(text)
+        while 0 <= position < len(self.__values):
+            if step > 0:
+                start = position
+                end = min(position + self.__SEARCH_CHUNK, len(self.__values))
+                position = end
+            else:
+                start = max(0, position - self.__SEARCH_CHUNK + 1)
+                end = position + 1
+                position = start - 1
+            names = self._get_names(self.__values[start:end])
+            indexes = range(start, end)
+            if step < 0:
+                indexes = reversed(indexes)
+            for index in indexes:
+                if noaccents2(names[index - start]).find(text) != -1:
+                    self.__typeahead_index = index
+                    self.__scroll_to_index(index)
+                    self.__update_typeahead()
+                    return
+
+    def __scroll_to_index(self, index):
+        """
+            Scroll to value at index
+            @param index as int
+        """
+        if self.__columns == 0:
+            return
+        view_widget = self.scrolled.get_child()
+        if isinstance(view_widget, Gtk.Viewport):
+            view_widget = view_widget.get_child()
+        y = index // self.__columns * self.__row_height
+        coordinates = self.__virtual.translate_coordinates(
+            view_widget, 0, y - self.scroll_shift)
+        if coordinates:
+            self.scrolled.get_vadjustment().set_value(coordinates[1])
+
+    def __on_box_size_allocate(self, box, allocation):
+        """
+            Measure rows, children share their size
+            @param box as Gtk.FlowBox
+            @param allocation as Gdk.Rectangle
+        """
+        children = self.children
+        if not children:
+            return
+        first = children[0].get_allocation()
+        columns = 0
+        for child in children:
+            if child.get_allocation().y != first.y:
+                break
+            columns += 1
+        if columns < len(children):
+            row_height = children[columns].get_allocation().y - first.y
+        else:
+            row_height = first.height + box.get_row_spacing() +\
+                children[0].get_margin_top() +\
+                children[0].get_margin_bottom()
+        if row_height <= 0 or\
+                (columns, row_height) == (self.__columns, self.__row_height):
+            return
+        self.__columns = columns
+        self.__row_height = row_height
+        self.__update_force = True
+        # Do not resize spacers while allocating
+        if self.__update_id is None:
+            self.__update_id = GLib.idle_add(self.__on_update_idle)
+
+    def __on_scrolled_size_allocate(self, scrolled, allocation):
+        """
+            Bind more children if needed
+            @param scrolled as Gtk.ScrolledWindow
+            @param allocation as Gdk.Rectangle
+        """
+        if self.__columns != 0 and self.__update_id is None:
+            self.__update_id = GLib.idle_add(self.__on_update_idle)
+
+    def __on_update_idle(self):
+        """
+            Update bound children
+        """
+        self.__update_id = None
+        self.__update_window(self.__update_force)
+        self.__update_force = False
+
     def __popup_menu(self, child):
         """
             Popup album menu at position
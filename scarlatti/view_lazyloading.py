@@ -25,6 +25,9 @@ class LazyLoadingView(View):
         Lazy loading for view
     """
 
+    # Seconds spent creating widgets per main loop iteration
+    __ADD_BUDGET = 0.01
+
     __gsignals__ = {
         # View has been populated/depopulated, children are not populated
         "initialized": (GObject.SignalFlags.RUN_FIRST, None, ()),
@@ -41,6 +44,10 @@ class LazyLoadingView(View):
         View.__init__(self, storage_type, view_type)
         self.__loading_state = LoadingState.NONE
         self.__lazy_queue = []
+        # Queue head, popping from a list start is O(n)
+        self.__lazy_index = 0
+        # Widgets loaded from priority queue, skipped in lazy queue
+        self.__lazy_loaded = set()
         self.__priority_queue = []
         self.__scroll_timeout_id = None
         self.__start_time = time()
@@ -50,7 +57,7 @@ class LazyLoadingView(View):
             Populate view with values
             @param values as [object]
         """
-        self.__add_values(values)
+        self.__add_values(values, 0)
 
     def pause(self):
         """
@@ -71,6 +78,8 @@ class LazyLoadingView(View):
             GLib.source_remove(self.__scroll_timeout_id)
             self.__scroll_timeout_id = None
         self.__lazy_queue = []
+        self.__lazy_index = 0
+        self.__lazy_loaded = set()
         self.__priority_queue = []
         View.stop(self)
 
@@ -122,7 +131,8 @@ class LazyLoadingView(View):
             @param widget as Gtk.Widget
         """
         View._on_map(self, widget)
-        if self.__loading_state == LoadingState.ABORTED and self.__lazy_queue:
+        if self.__loading_state == LoadingState.ABORTED and\
+                self.__lazy_index < len(self.__lazy_queue):
             self.lazy_loading()
 
     def _on_value_changed(self, adj):
@@ -131,7 +141,7 @@ class LazyLoadingView(View):
             @param adj as Gtk.Adjustment
         """
         View._on_value_changed(self, adj)
-        if not self.__lazy_queue:
+        if self.__lazy_index >= len(self.__lazy_queue):
             return False
         if self.__scroll_timeout_id is not None:
             GLib.source_remove(self.__scroll_timeout_id)
@@ -158,13 +168,7 @@ class LazyLoadingView(View):
         """
             Load the view in a lazy way
         """
-        widget = None
-        if self.__priority_queue:
-            widget = self.__priority_queue.pop(0)
-            self.__lazy_queue.remove(widget)
-        elif self.__lazy_queue:
-            widget = self.__lazy_queue.pop(0)
-
+        widget = self.__pop_lazy()
         if widget is not None:
             widget.connect("populated", self._on_populated)
             widget.populate()
@@ -182,43 +186,83 @@ class LazyLoadingView(View):
             Logger.debug("LazyLoadingView::lazy_loading(): %s",
                          time() - self.__start_time)
 
-    def __add_values(self, values):
+    def __pop_lazy(self):
         """
-            Add widget from values
+            Get next widget to load, visible ones first
+            @return Gtk.Widget/None
+        """
+        if self.__priority_queue:
+            widget = self.__priority_queue.pop(0)
+            self.__lazy_loaded.add(widget)
+            return widget
+        while self.__lazy_index < len(self.__lazy_queue):
+            widget = self.__lazy_queue[self.__lazy_index]
+            self.__lazy_index += 1
+            if widget in self.__lazy_loaded:
+                self.__lazy_loaded.remove(widget)
+            else:
+                return widget
+        self.__lazy_queue = []
+        self.__lazy_index = 0
+        self.__lazy_loaded = set()
+        return None
+
+    def __add_values(self, values, position):
+        """
+            Add widgets from values, many per main loop iteration
             @param values as []
+            @param position as int: first value to add
         """
-        if values:
-            value = values.pop(0)
-            child = self._get_child(value)
+        start = time()
+        while position < len(values):
+            child = self._get_child(values[position])
+            position += 1
             if child is not None:
                 self.__lazy_queue.append(child)
-            GLib.idle_add(self.__add_values, values)
-        elif self.__loading_state != LoadingState.RUNNING:
+            if time() - start > self.__ADD_BUDGET:
+                GLib.idle_add(self.__add_values, values, position)
+                return
+        if self.__loading_state != LoadingState.RUNNING:
             self.__loading_state = LoadingState.RUNNING
             emit_signal(self, "initialized")
             self.__lazy_loading()
 
-    def __is_visible(self, widget):
+    def __get_y(self, widget):
         """
-            Is widget visible in scrolled
+            Get widget position in scrolled
             @param widget as Gtk.Widget
+            @return int/None
         """
-        widget_alloc = widget.get_allocation()
-        scrolled_alloc = self.scrolled.get_allocation()
-        try:
-            (x, y) = widget.translate_coordinates(self.scrolled, 0, 0)
-            return (y > -widget_alloc.height or y >= 0) and\
-                y < scrolled_alloc.height
-        except:
-            return True
+        coordinates = widget.translate_coordinates(self.scrolled, 0, 0)
+        if coordinates is None:
+            return None
+        return coordinates[1]
 
     def __lazy_or_not(self):
         """
             Add visible widgets to lazy queue
+            Queue is in widget order: look for the first visible widget
+            with a binary search, then stop at the first hidden one
         """
         self.__scroll_timeout_id = None
-        if self.__loading_state == LoadingState.RUNNING:
-            self.__priority_queue = []
-            for child in self.__lazy_queue:
-                if self.__is_visible(child):
-                    self.__priority_queue.append(child)
+        if self.__loading_state != LoadingState.RUNNING:
+            return
+        self.__priority_queue = []
+        height = self.scrolled.get_allocated_height()
+        low = self.__lazy_index
+        high = len(self.__lazy_queue)
+        while low < high:
+            middle = (low + high) // 2
+            widget = self.__lazy_queue[middle]
+            y = self.__get_y(widget)
+            if y is not None and y + widget.get_allocated_height() < 0:
+                low = middle + 1
+            else:
+                high = middle
+        for index in range(low, len(self.__lazy_queue)):
+            widget = self.__lazy_queue[index]
+            y = self.__get_y(widget)
+            if y is None or y >= height:
+                break
+            if widget not in self.__lazy_loaded:
+                self.__priority_queue.append(widget)
@@ -131,9 +131,7 @@ class PlaylistsManagerView(FlowBoxView, SignalsHelper):
             return
         track_ids = []
         if child.data > 0 and App().playlists.get_smart(child.data):
-            request = App().playlists.get_smart_sql(child.data)
-            if request is not None:
-                track_ids = App().db.execute(request)
+            track_ids = App().playlists.get_smart_track_ids(child.data)
         else:
             track_ids = App().playlists.get_track_ids(child.data)
         tracks = [Track(track_id) for track_id in track_ids]
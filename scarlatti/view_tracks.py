@@ -17,6 +17,7 @@ from scarlatti.widgets_tracks import TracksWidget
 from scarlatti.helper_signals import SignalsHelper, signals_map
 from scarlatti.define import App, ViewType, IndicatorType
 from scarlatti.define import Size
+from scarlatti.objects_track import Track
 from scarlatti.utils import emit_signal
 from scarlatti.helper_size_allocation import SizeAllocationHelper
 
@@ -35,6 +36,10 @@ class TracksView(Gtk.Bin, SignalsHelper, SizeAllocationHelper):
                           (GObject.TYPE_PYOBJECT,)),
     }
 
+    # Track attributes shown by TrackRow, see Track.prefetch()
+    _TRACK_FIELDS = ["name", "artist_ids", "duration", "number",
+                     "discnumber", "loved", "storage_type"]
+
     @signals_map
     def __init__(self, view_type):
         """
@@ -153,6 +158,13 @@ class TracksView(Gtk.Bin, SignalsHelper, SizeAllocationHelper):
         """
         pass
 
+    def _prefetch_tracks(self, tracks):
+        """
+            Load attributes needed by rows with one query
+            @param tracks as [Track]
+        """
+        Track.prefetch(tracks, self._TRACK_FIELDS)
+
     def _set_orientation(self, orientation):
         """
             Set columns orientation
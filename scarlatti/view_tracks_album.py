@@ -51,6 +51,7 @@ class AlbumTracksView(TracksView):
             disc = self.__discs_to_load.pop(0)
             disc_number = disc.number
             tracks = disc.tracks
+            self._prefetch_tracks(tracks)
             items = []
             if self.view_type & ViewType.SINGLE_COLUMN:
                 items.append((self._tracks_widget_left[0], tracks))
@@ -95,6 +96,7 @@ class AlbumTracksView(TracksView):
         self._init()
         if not self.is_populated:
             self.populate()
+        self._prefetch_tracks(tracks)
         self.__album.append_tracks(tracks)
         for key in self._tracks_widget_left.keys():
             self._add_tracks(self._tracks_widget_left[key], tracks)
@@ -86,6 +86,7 @@ class SearchTracksView(TracksView, SignalsHelper):
             @param widget as Gtk.ListBox
             @param tracks as [Track]
         """
+        self._prefetch_tracks(tracks)
         for track in tracks:
             track.set_number(position + 1)
             row = TrackRow(track, [], self.view_type)
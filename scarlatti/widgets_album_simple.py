@@ -76,23 +76,7 @@ class AlbumSimpleWidget(Gtk.FlowBoxChild):
             style_context = self.__label.get_style_context()
             if self.__view_type & ViewType.SMALL:
                 style_context.add_class("text-small")
-            album_name = GLib.markup_escape_text(self.__album.name)
-            if self.__view_type & ViewType.ALBUM:
-                self.__label.set_markup(album_name)
-            elif self.__view_type & ViewType.ARTIST:
-                if self.__album.year and\
-                        App().settings.get_value("show-year-below-name"):
-                    self.__label.set_markup(
-                        "<b>%s</b>\n<span alpha='25000'>%s</span>" % (
-                            album_name, self.__album.year))
-                else:
-                    self.__label.set_markup("<b>%s</b>" % album_name)
-            else:
-                artist_name = GLib.markup_escape_text(", ".join(
-                                                      self.__album.artists))
-                self.__label.set_markup(
-                    "<b>%s</b>\n<span alpha='50000'>%s</span>" % (album_name,
-                                                                  artist_name))
+            self.__set_label()
             self.__artwork = Gtk.Image.new()
             grid.add(self.__artwork)
             grid.add(self.__label)
@@ -103,6 +87,21 @@ class AlbumSimpleWidget(Gtk.FlowBoxChild):
         else:
             self.set_artwork()
 
+    def set_album(self, album):
+        """
+            Show another album, widget is recycled
+            @param album as Album
+        """
+        if album is self.__album:
+            return
+        self.__album = album
+        if self.__artwork is None:
+            return
+        self.__set_label()
+        self.__artwork.set_from_surface(None)
+        self.set_artwork()
+        self.set_selection()
+
     def update_art_size(self):
         """
             Update art size based on current window state
@@ -144,7 +143,8 @@ class AlbumSimpleWidget(Gtk.FlowBoxChild):
                                            self.__artwork.get_scale_factor(),
                                            ArtBehaviour.CACHE |
                                            ArtBehaviour.CROP_SQUARE,
-                                           self.__on_album_artwork)
+                                           self.__on_album_artwork,
+                                           self.__album)
 
     def set_selection(self):
         """
@@ -194,12 +194,36 @@ class AlbumSimpleWidget(Gtk.FlowBoxChild):
 #######################
 # PRIVATE             #
 #######################
-    def __on_album_artwork(self, surface):
+    def __set_label(self):
+        """
+            Set label for album
+        """
+        album_name = GLib.markup_escape_text(self.__album.name)
+        if self.__view_type & ViewType.ALBUM:
+            self.__label.set_markup(album_name)
+        elif self.__view_type & ViewType.ARTIST:
+            if self.__album.year and\
+                    App().settings.get_value("show-year-below-name"):
+                self.__label.set_markup(
+                    "<b>%s</b>\n<span alpha='25000'>%s</span>" % (
+                        album_name, self.__album.year))
+            else:
+                self.__label.set_markup("<b>%s</b>" % album_name)
+        else:
+            artist_name = GLib.markup_escape_text(
+                ", ".join(self.__album.artists))
+            self.__label.set_markup(
+                "<b>%s</b>\n<span alpha='50000'>%s</span>" % (album_name,
+                                                              artist_name))
+
+    def __on_album_artwork(self, surface, album):
         """
             Set album artwork
             @param surface as str
+            @param album as Album
         """
-        if self.__artwork is None:
+        # Widget recycled while loading
+        if self.__artwork is None or album is not self.__album:
             return
         if surface is None:
             if self.__art_size == ArtSize.BIG:
@@ -218,4 +242,5 @@ class AlbumSimpleWidget(Gtk.FlowBoxChild):
             Destroyed widget
             @param widget as Gtk.Widget
         """
+        App().art_helper.cancel(self)
         self.__artwork = None
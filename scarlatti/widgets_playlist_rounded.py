@@ -75,9 +75,7 @@ class PlaylistRoundedWidget(RoundedAlbumsWidget, SignalsHelper):
         """
         album_ids = []
         if self._data > 0 and App().playlists.get_smart(self._data):
-            request = App().playlists.get_smart_sql(self._data)
-            if request is not None:
-                self._track_ids = App().db.execute(request)
+            self._track_ids = App().playlists.get_smart_track_ids(self._data)
         else:
             self._track_ids = App().playlists.get_track_ids(self._data)
         sample(self._track_ids, len(self._track_ids))
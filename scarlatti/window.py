@@ -201,7 +201,12 @@ class Window(Handy.ApplicationWindow, SignalsHelper):
         """
         self.__setup_size_and_position()
         if App().settings.get_value("auto-update") or App().tracks.is_empty():
-            App().scanner.update(ScanType.FULL)
+            App().scanner.update(ScanType.FULL, prune=True)
+        # Resume interrupted scan, saved tracks are skipped
+        else:
+            uris = list(App().settings.get_value("scan-checkpoint"))
+            if uris:
+                App().scanner.update(ScanType.NEW_FILES, uris)
 
     def __on_button_release_event(self, window, event):
         """
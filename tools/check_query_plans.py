@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Check hot lookups do not scan a whole table
+    A collection database is created by scarlatti Database class in a
+    temporary directory and filled with synthetic tracks. Each lookup
+    calls the real TracksDatabase/AlbumsDatabase/ArtistsDatabase/
+    GenresDatabase method, requests are captured with a trace callback
+    then checked with EXPLAIN QUERY PLAN
+    Usage: tools/check_query_plans.py [tracks count, default 500000]
+"""
+
+import gi
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gio
+
+import os
+import sys
+from tempfile import TemporaryDirectory
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+from scarlatti.database import Database
+from scarlatti.database_albums import AlbumsDatabase
+from scarlatti.database_artists import ArtistsDatabase
+from scarlatti.database_genres import GenresDatabase
+from scarlatti.database_tracks import TracksDatabase
+from scarlatti.define import StorageType
+
+
+class CheckApplication(Gio.Application):
+    """
+        What SqlCursor needs from App()
+    """
+
+    def __init__(self):
+        """
+            Init application, set it as default
+        """
+        Gio.Application.__init__(self,
+                                 application_id="org.scarlatti.QueryPlans")
+        self.cursors = {}
+        self.set_default()
+
+
+class CheckDatabase(Database):
+    """
+        Database in a temporary directory, requests are recorded
+    """
+
+    DB_PATH = ""
+
+    def __init__(self, path):
+        """
+            Create database at path
+            @param path as str
+        """
+        self.requests = None
+        CheckDatabase.DB_PATH = path
+        Database.__init__(self)
+
+    def get_cursor(self):
+        """
+            Return a new traced sqlite cursor
+        """
+        c = Database.get_cursor(self)
+        c.set_trace_callback(self.__on_request)
+        return c
+
+    def get_read_cursor(self):
+        """
+            Return a new traced read only sqlite cursor
+        """
+        c = Database.get_read_cursor(self)
+        c.set_trace_callback(self.__on_request)
+        return c
+
+    def __on_request(self, request):
+        """
+            Record request
+            @param request as str
+        """
+        if self.requests is not None:
+            self.requests.append(request)
+
+
+def fill(db, count):
+    """
+        Add synthetic collection: 10 tracks per album, 50 tracks per artist
+        @param db as CheckDatabase
+        @param count as int: tracks count
+    """
+    albums = max(1, count // 10)
+    artists = max(1, count // 50)
+    c = db.get_cursor()
+    c.executemany("INSERT INTO artists (rowid, name, sortname, escaped_name,\
+                   noaccents_name) VALUES (?, ?, ?, ?, ?)",
+                  [(i, "artist%s" % i, "artist%s" % i, "artist%s" % i,
+                    "artist%s" % i) for i in range(1, artists + 1)])
+    c.executemany("INSERT INTO genres (rowid, name, escaped_name)\
+                   VALUES (?, ?, ?)",
+                  [(i, "genre%s" % i, "genre%s" % i) for i in range(1, 51)])
+    c.executemany("INSERT INTO albums (rowid, name, no_album_artist, uri,\
+                   popularity, rate, loved, mtime, storage_type, synced,\
+                   escaped_name, noaccents_name, lp_album_id)\
+                   VALUES (?, ?, 0, ?, 0, 0, 0, 0, ?, 0, ?, ?, ?)",
+                  [(i, "album%s" % i, "file:///music/%s" % i,
+                    StorageType.COLLECTION, "album%s" % i, "album%s" % i,
+                    str(i)) for i in range(1, albums + 1)])
+    c.executemany("INSERT INTO album_artists VALUES (?, ?)",
+                  [(i, i % artists + 1) for i in range(1, albums + 1)])
+    c.executemany("INSERT INTO album_genres VALUES (?, ?)",
+                  [(i, i % 50 + 1) for i in range(1, albums + 1)])
+    c.executemany("INSERT INTO tracks (rowid, name, uri, duration,\
+                   tracknumber, discnumber, album_id, popularity, rate,\
+                   ltime, mtime, storage_type, lp_track_id, noaccents_name,\
+                   basename)\
+                   VALUES (?, ?, ?, ?, ?, 1, ?, 0, 0, 0, 0, ?, ?, ?, ?)",
+                  [(i, "track%s" % i,
+                    "file:///music/%s/%s.flac" % (i % albums + 1, i),
+                    i % 300, i % 10, i % albums + 1,
+                    StorageType.COLLECTION, str(i), "track%s" % i,
+                    "%s.flac" % i) for i in range(1, count + 1)])
+    c.executemany("INSERT INTO track_artists VALUES (?, ?)",
+                  [(i, i % artists + 1) for i in range(1, count + 1)])
+    c.executemany("INSERT INTO track_genres VALUES (?, ?)",
+                  [(i, i % 50 + 1) for i in range(1, count + 1)])
+    c.commit()
+    c.execute("ANALYZE")
+    c.close()
+
+
+def get_lookups(db):
+    """
+        Get lookups done per track, album or artist
+        @param db as CheckDatabase
+        @return [(str, function)]
+    """
+    tracks = TracksDatabase(db)
+    albums = AlbumsDatabase(db)
+    artists = ArtistsDatabase(db)
+    genres = GenresDatabase(db)
+    storage_type = StorageType.COLLECTION
+    return [
+        ("tracks.get_id_by_uri",
+         lambda: tracks.get_id_by_uri("file:///music/2/1.flac")),
+        ("tracks.get_ids_by_uri_prefix",
+         lambda: tracks.get_ids_by_uri_prefix("file:///music/2")),
+        ("tracks.get_id_by_basename_duration",
+         lambda: tracks.get_id_by_basename_duration("1.flac", 1)),
+        ("tracks.get_ids_by_basename_duration",
+         lambda: tracks.get_ids_by_basename_duration([("1.flac", 1),
+                                                      ("2.flac", 2)])),
+        ("tracks.get_id_for_lp_track_id",
+         lambda: tracks.get_id_for_lp_track_id("1")),
+        ("tracks.get_album_id", lambda: tracks.get_album_id(1)),
+        ("tracks.get_artist_ids", lambda: tracks.get_artist_ids(1)),
+        ("tracks.get_genre_ids", lambda: tracks.get_genre_ids(1)),
+        ("tracks.get_mtime", lambda: tracks.get_mtime(1)),
+        ("tracks.get_stats", lambda: tracks.get_stats([1, 2])),
+        ("albums.get_id",
+         lambda: albums.get_id("album1", None, [2])),
+        ("albums.get_id(mb_album_id)",
+         lambda: albums.get_id("album1", "mbid", [2])),
+        ("albums.get_id_for_escaped_string",
+         lambda: albums.get_id_for_escaped_string("album1", [2])),
+        ("albums.get_id_for_lp_album_id",
+         lambda: albums.get_id_for_lp_album_id("1")),
+        ("albums.get_id_by_uri",
+         lambda: albums.get_id_by_uri("file:///music/1")),
+        ("albums.get_ids_by_uri_prefix",
+         lambda: albums.get_ids_by_uri_prefix("file:///music/1")),
+        ("albums.get_uri", lambda: albums.get_uri(1)),
+        ("albums.get_artist_ids", lambda: albums.get_artist_ids(1)),
+        ("albums.get_genre_ids", lambda: albums.get_genre_ids(1)),
+        ("albums.get_disc_track_ids",
+         lambda: albums.get_disc_track_ids(1, [], [], 1, storage_type,
+                                           False)),
+        ("albums.get_disc_track_ids(genres, artists)",
+         lambda: albums.get_disc_track_ids(1, [2], [2], 1, storage_type,
+                                           True)),
+        ("albums.get_tracks_count",
+         lambda: albums.get_tracks_count(1, [], [])),
+        ("albums.get_tracks_count(genres, artists)",
+         lambda: albums.get_tracks_count(1, [2], [2])),
+        ("artists.get_id", lambda: artists.get_id("artist1")),
+        ("artists.get_id(mb_artist_id)",
+         lambda: artists.get_id("artist1", "mbid")),
+        ("artists.get_id_for_escaped_string",
+         lambda: artists.get_id_for_escaped_string("artist1")),
+        ("genres.get_id", lambda: genres.get_id("genre1")),
+    ]
+
+
+def get_plan(db, request):
+    """
+        Get query plan for a captured request
+        @param db as CheckDatabase
+        @param request as str
+        @return [str]
+    """
+    c = db.get_read_cursor()
+    try:
+        # Older Python: trace callback gets unexpanded requests
+        params = [None] * request.count("?")
+        return [row[3] for row in c.execute("EXPLAIN QUERY PLAN " + request,
+                                            params)]
+    finally:
+        c.close()
+
+
+def main():
+    """
+        Check plans, exit with 1 on full table scans
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    CheckApplication()
+    with TemporaryDirectory() as tmp:
+        start = time()
+        db = CheckDatabase(os.path.join(tmp, "scarlatti.db"))
+        fill(db, count)
+        print("%s tracks created in %.1fs" % (count, time() - start))
+        failed = 0
+        lookups = get_lookups(db)
+        for (name, lookup) in lookups:
+            db.requests = []
+            lookup()
+            requests = [request for request in db.requests
+                        if request.lstrip().upper().startswith("SELECT")]
+            db.requests = None
+            if not requests:
+                failed += 1
+                print("FAIL %s: no request captured" % name)
+                continue
+            plan = []
+            for request in requests:
+                plan += get_plan(db, request)
+            scans = [detail for detail in plan if detail.startswith("SCAN")]
+            if scans:
+                failed += 1
+                print("FAIL %s: %s" % (name, "; ".join(scans)))
+            else:
+                print("ok   %s: %s" % (name, "; ".join(plan)))
+        print("%s/%s lookups use indexes" % (len(lookups) - failed,
+                                             len(lookups)))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
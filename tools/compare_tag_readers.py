@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Compare native tag reader with GStreamer on a fixture directory
+    Each file is read by both readers, fields that differ are reported
+    with time spent per reader
+    Usage: tools/compare_tag_readers.py [--advanced] [--no-compilations]
+                                        fixtures_dir
+"""
+
+import gi
+gi.require_version("Gst", "1.0")
+gi.require_version("GstPbutils", "1.0")
+from gi.repository import Gst, GstPbutils, Gio
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+from scarlatti.tagreader import TagReader, Discoverer
+
+
+def get_uris(path):
+    """
+        Get uris for files in path
+        @param path as str
+        @return [str]
+    """
+    uris = []
+    for (root, dirs, files) in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            uris.append(
+                Gio.File.new_for_path(os.path.join(root, name)).get_uri())
+    return uris
+
+
+def main():
+    """
+        Compare readers, exit with 1 on mismatches
+    """
+    args = sys.argv[1:]
+    advanced_artist_tags = "--advanced" in args
+    disable_compilations = "--no-compilations" in args
+    paths = [arg for arg in args if not arg.startswith("--")]
+    if len(paths) != 1:
+        print(__doc__)
+        sys.exit(2)
+    Gst.init(None)
+    GstPbutils.pb_utils_init()
+    reader = TagReader()
+    native = Discoverer(True)
+    gstreamer = Discoverer()
+    mismatches = 0
+    for uri in get_uris(paths[0]):
+        fallbacks = native.get_stats()["fallback"][0]
+        try:
+            values = reader.read_tags(native, uri, disable_compilations,
+                                      advanced_artist_tags)
+            gst_values = reader.read_tags(gstreamer, uri,
+                                          disable_compilations,
+                                          advanced_artist_tags)
+        except Exception as e:
+            print("ERROR %s: %s" % (uri, e))
+            continue
+        if native.get_stats()["fallback"][0] != fallbacks:
+            print("GST   %s" % uri)
+            continue
+        diffs = [(field, value, gst_value)
+                 for (field, value, gst_value) in zip(reader.FIELDS,
+                                                      values, gst_values)
+                 if value != gst_value]
+        if diffs:
+            mismatches += 1
+            print("DIFF  %s" % uri)
+            for (field, value, gst_value) in diffs:
+                print("      %s: native %r != GStreamer %r" %
+                      (field, value, gst_value))
+        else:
+            print("ok    %s" % uri)
+    for (key, (count, spent)) in native.get_stats().items():
+        if key == "gstreamer":
+            (count, spent) = gstreamer.get_stats()[key]
+        if count:
+            print("%s: %s files, %.1f ms/file" %
+                  (key, count, spent * 1000 / count))
+    print("%s files with mismatches" % mismatches)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()